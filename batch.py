@@ -0,0 +1,222 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from spine_core.analysis import AnalysisRequest, make_record, parse_response, run_analysis
+from spine_core.backends import create_backend
+from spine_core.config import (API_KEY, MODEL_NAME, MODEL_BACKEND, RESILIENCE_CONFIG, DB_FILE,
+                               RESPONSE_CACHE_FILE, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_SEC,
+                               IMAGE_CACHE_DIR, IMAGE_CONFIG, IMAGE_STORE_DIR, THUMB_SIZE,
+                               TRACE_FILE)
+from spine_core.image_store import ImageStore
+from spine_core.imaging import ImagePreprocessor
+from spine_core.repository import PatientRepository
+from spine_core.resilience import ResilientBackend
+from spine_core.response_cache import ResponseCache
+from spine_core.telemetry import METRICS
+
+# ─── ПАКЕТНЫЙ АНАЛИЗ АРХИВА МРТ ────────────────────────────────────
+# Запуск без окна: обходит папку со снимками или манифест, отправляет
+# запросы параллельно (с ограничением частоты) и пишет результаты в историю
+# пациентов. Прогресс сохраняется в файл-чекпоинт, поэтому прерванный
+# прогон можно продолжить той же командой.
+#
+#   python batch.py archive/ --concurrency 4 --rate 30
+#   python batch.py studies.jsonl --checkpoint night.ckpt.json
+#
+# Папка: каждый снимок — отдельное исследование, имя подпапки первого
+# уровня — имя пациента. Манифест (JSON Lines): по строке на исследование,
+#   {"image": "a/b.png", "patient": "Иванов И.", "symptoms": "...", "pain_level": 6}
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+DEFAULT_SYMPTOMS = "Архивное исследование, жалобы не указаны"
+
+
+class Study:
+    def __init__(self, image, patient, symptoms="", pain_level=0):
+        self.image      = image
+        self.patient    = patient
+        self.symptoms   = symptoms or DEFAULT_SYMPTOMS
+        self.pain_level = pain_level or 0
+
+    @property
+    def key(self):
+        raw = f"{self.patient}\0{os.path.abspath(self.image)}\0{self.symptoms}\0{self.pain_level}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def collect_studies(source, default_patient=None):
+    if os.path.isdir(source):
+        studies = []
+        for root, _, files in os.walk(source):
+            rel = os.path.relpath(root, source)
+            patient = default_patient or (rel.split(os.sep)[0] if rel != "." else "Архив")
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    studies.append(Study(os.path.join(root, name), patient))
+        return sorted(studies, key=lambda s: s.image)
+
+    base = os.path.dirname(os.path.abspath(source))
+    studies = []
+    with open(source, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            item  = json.loads(line)
+            image = item.get("image")
+            if image and not os.path.isabs(image):
+                image = os.path.join(base, image)
+            studies.append(Study(image, item.get("patient") or default_patient or "Архив",
+                                 item.get("symptoms", ""), item.get("pain_level", 0)))
+    return studies
+
+
+class RateLimiter:
+    # Не чаще rate запросов в минуту (равномерно), общий для всех потоков
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0
+        self._next    = 0.0
+        self._lock    = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now  = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Checkpoint:
+    def __init__(self, path):
+        self.path  = path
+        self.done  = set()
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.done = set(json.load(f).get("done", []))
+
+    def mark(self, key):
+        with self._lock:
+            self.done.add(key)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"done": sorted(self.done)}, f)
+            os.replace(tmp, self.path)
+
+
+class BatchRunner:
+    def __init__(self, repo, model, cache=None, preprocessor=None,
+                 concurrency=4, rate_per_minute=30, checkpoint=None, log=print, images=None):
+        self.repo         = repo
+        self.model        = model
+        self.cache        = cache
+        self.preprocessor = preprocessor
+        self.images       = images
+        self.concurrency  = concurrency
+        self.limiter      = RateLimiter(rate_per_minute)
+        self.checkpoint   = checkpoint
+        self.log          = log
+        self._patients    = {}
+        self._lock        = threading.Lock()
+
+    def patient_history(self, name):
+        with self._lock:
+            if name not in self._patients:
+                pid = next((p for p, n in self.repo.list_patients() if n == name), None)
+                if pid is None:
+                    pid = self.repo.create_patient({"name": name})
+                self._patients[name] = (pid, self.repo.get_profile(pid))
+            pid, profile = self._patients[name]
+        return self.repo.history(pid), profile
+
+    def process(self, study):
+        history, profile = self.patient_history(study.patient)
+        request = AnalysisRequest(study.symptoms, study.pain_level, profile, study.image, history)
+        with METRICS.tracing(study.key):
+            with METRICS.span("batch.wait"):
+                self.limiter.acquire()
+            raw = run_analysis(request, self.model, self.cache, self.preprocessor,
+                               images=self.images)
+            with METRICS.span("batch.persist"):
+                record = make_record(parse_response(raw), request)
+                history.append(record)
+        return record
+
+    def run(self, studies):
+        todo = [s for s in studies if not self.checkpoint or s.key not in self.checkpoint.done]
+        skipped = len(studies) - len(todo)
+        done, failed = 0, 0
+        started = time.monotonic()
+        self.log(f"Исследований: {len(studies)}, уже обработано: {skipped}, к запуску: {len(todo)}")
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = {pool.submit(self.process, s): s for s in todo}
+            for future in as_completed(futures):
+                study = futures[future]
+                try:
+                    record = future.result()
+                except Exception as e:
+                    failed += 1
+                    self.log(f"✖ {study.image}: {e}")
+                    continue
+                done += 1
+                if self.checkpoint:
+                    self.checkpoint.mark(study.key)
+                self.log(f"✔ [{done + failed}/{len(todo)}] {study.patient}: "
+                         f"{os.path.basename(study.image)} — риск {record.risk}")
+
+        elapsed = time.monotonic() - started
+        self.log(f"Готово за {elapsed:.1f} с: успешно {done}, ошибок {failed}, пропущено {skipped}")
+        return done, failed, skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетный анализ архива МРТ без окна приложения")
+    parser.add_argument("source", help="папка со снимками или манифест .jsonl")
+    parser.add_argument("--patient", help="записать все исследования этому пациенту (по имени)")
+    parser.add_argument("--db", default=DB_FILE, help="база пациентов (по умолчанию %(default)s)")
+    parser.add_argument("--concurrency", type=int, default=4, help="параллельных запросов")
+    parser.add_argument("--rate", type=float, default=30, help="запросов в минуту, 0 — без ограничения")
+    parser.add_argument("--checkpoint", help="файл прогресса (по умолчанию <source>.checkpoint.json)")
+    parser.add_argument("--no-cache", action="store_true", help="не использовать кэш ответов")
+    parser.add_argument("--backend", choices=("gemini", "fake"), default=MODEL_BACKEND,
+                        help="бэкенд модели (по умолчанию %(default)s)")
+    parser.add_argument("--trace", default=TRACE_FILE,
+                        help="сохранить замеры этапов в файл Trace Event JSON при выходе")
+    args = parser.parse_args(argv)
+
+    studies = collect_studies(args.source, args.patient)
+    if not studies:
+        print("Снимки не найдены")
+        return 1
+
+    checkpoint = Checkpoint(args.checkpoint or args.source.rstrip("/\\") + ".checkpoint.json")
+    repo  = PatientRepository(args.db)
+    cache = None if args.no_cache else ResponseCache(RESPONSE_CACHE_FILE, RESPONSE_CACHE_SIZE,
+                                                     RESPONSE_CACHE_TTL_SEC)
+    preprocessor = ImagePreprocessor(IMAGE_CACHE_DIR, IMAGE_CONFIG, workers=args.concurrency)
+    backend = ResilientBackend(create_backend(args.backend, API_KEY, MODEL_NAME), RESILIENCE_CONFIG)
+    runner = BatchRunner(repo, backend, cache, preprocessor,
+                         concurrency=args.concurrency, rate_per_minute=args.rate,
+                         checkpoint=checkpoint, images=ImageStore(IMAGE_STORE_DIR, THUMB_SIZE))
+    try:
+        _, failed, _ = runner.run(studies)
+    finally:
+        preprocessor.shutdown()
+        repo.close()
+        if args.trace:
+            METRICS.dump_trace(args.trace)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from spine_core.analysis import (AnalysisRequest, build_prompt, call_model, make_record,
+                                 parse_response)
+from spine_core.backends import FAKE_RESPONSE, FakeBackend
+from spine_core.records import AnalysisResult
+from spine_core.repository import PatientRepository
+from spine_core.resilience import ResilienceConfig, ResilientBackend
+from spine_core.telemetry import percentile
+
+# ─── БЕНЧМАРК КОНВЕЙЕРА АНАЛИЗА ────────────────────────────────────
+# Прогоняет полный путь одного анализа — сборка промпта, вызов модели,
+# разбор ответа, запись в базу — на локальном FakeBackend, без ключа и сети.
+# Печатает пропускную способность и p50/p99 по каждому этапу.
+#
+#   python bench.py --requests 500 --concurrency 8 --latency 0.05 --jitter 0.02
+#   python bench.py --stream --error-rate 0.05 --retries 4
+#
+# База создается во временной папке, если не задан --db.
+
+STAGES = ("build", "call", "parse", "persist", "total")
+
+
+class Timings:
+    def __init__(self):
+        self.samples = {stage: [] for stage in STAGES}
+        self.errors  = 0
+        self._lock   = threading.Lock()
+
+    def add(self, sample):
+        with self._lock:
+            for stage, value in sample.items():
+                self.samples[stage].append(value)
+
+    def error(self):
+        with self._lock:
+            self.errors += 1
+
+
+def seed_patients(repo, patients, visits):
+    # История нужна, чтобы сборка промпта читала прошлые визиты, как в жизни
+    histories = []
+    request = AnalysisRequest("Боль в пояснице", 5, {}, None, None)
+    result  = AnalysisResult.from_dict(FAKE_RESPONSE)
+    for i in range(patients):
+        pid = repo.create_patient({"name": f"Пациент {i + 1}", "age": "40",
+                                   "height": "175", "weight": "80", "gender": "Мужской"})
+        history = repo.history(pid)
+        for _ in range(visits):
+            history.append(make_record(result, request))
+        histories.append((history, repo.get_profile(pid)))
+    return histories
+
+
+def run_one(n, histories, backend, stream, timings):
+    history, profile = histories[n % len(histories)]
+    request = AnalysisRequest(f"Ноющая боль в пояснице, визит {n}", n % 10 + 1,
+                              profile, None, history)
+    on_field = (lambda key, value: None) if stream else None
+    sample = {}
+    try:
+        t0 = time.perf_counter()
+        prompt = build_prompt(request)
+        t1 = time.perf_counter()
+        raw = call_model(backend, prompt, on_field)
+        t2 = time.perf_counter()
+        record = make_record(parse_response(raw), request)
+        t3 = time.perf_counter()
+        history.append(record)
+        t4 = time.perf_counter()
+    except Exception:
+        timings.error()
+        return
+    sample["build"], sample["call"]     = t1 - t0, t2 - t1
+    sample["parse"], sample["persist"]  = t3 - t2, t4 - t3
+    sample["total"] = t4 - t0
+    timings.add(sample)
+
+
+def run_bench(repo, backend, requests, concurrency, patients=4, visits=20, stream=False):
+    histories = seed_patients(repo, patients, visits)
+    timings = Timings()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for n in range(requests):
+            pool.submit(run_one, n, histories, backend, stream, timings)
+    elapsed = time.perf_counter() - started
+    return timings, elapsed
+
+
+def format_report(timings, elapsed, requests, concurrency):
+    ok = len(timings.samples["total"])
+    lines = [f"Запросов: {requests}, потоков: {concurrency}, успешно: {ok}, "
+             f"ошибок: {timings.errors}",
+             f"Время: {elapsed:.2f} с, пропускная способность: {ok / elapsed:.1f} анализов/с",
+             "",
+             f"{'этап':<9}{'p50, мс':>10}{'p99, мс':>10}{'макс, мс':>10}"]
+    for stage in STAGES:
+        values = timings.samples[stage]
+        lines.append(f"{stage:<9}{percentile(values, 50) * 1000:>10.2f}"
+                     f"{percentile(values, 99) * 1000:>10.2f}"
+                     f"{max(values, default=0) * 1000:>10.2f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк конвейера анализа на локальном бэкенде")
+    parser.add_argument("--requests", type=int, default=200, help="сколько анализов прогнать")
+    parser.add_argument("--concurrency", type=int, default=4, help="параллельных потоков")
+    parser.add_argument("--latency", type=float, default=0.02, help="задержка ответа модели, с")
+    parser.add_argument("--jitter", type=float, default=0.0, help="разброс задержки ±, с")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов с ошибкой")
+    parser.add_argument("--stream", action="store_true", help="читать ответ потоком")
+    parser.add_argument("--patients", type=int, default=4, help="пациентов в тестовой базе")
+    parser.add_argument("--visits", type=int, default=20, help="визитов в истории у каждого")
+    parser.add_argument("--db", help="файл базы (по умолчанию — временный)")
+    parser.add_argument("--retries", type=int, default=0,
+                        help="попыток на запрос через ResilientBackend, 0 — без обертки")
+    parser.add_argument("--seed", type=int, default=1, help="зерно генератора задержек и ошибок")
+    args = parser.parse_args(argv)
+
+    backend = FakeBackend(latency=args.latency, jitter=args.jitter,
+                          error_rate=args.error_rate, seed=args.seed)
+    if args.retries:
+        # Квоты не ограничиваем — меряем сам конвейер; паузы повторов короткие
+        backend = ResilientBackend(backend, ResilienceConfig(
+            attempts=args.retries, base_delay=args.latency or 0.01, max_delay=1.0,
+            requests_per_minute=0, tokens_per_minute=0, breaker_threshold=0), seed=args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = PatientRepository(args.db or os.path.join(tmp, "bench.db"))
+        try:
+            timings, elapsed = run_bench(repo, backend, args.requests, args.concurrency,
+                                         args.patients, args.visits, args.stream)
+        finally:
+            repo.close()
+    print(format_report(timings, elapsed, args.requests, args.concurrency))
+    if args.retries:
+        print("\nResilientBackend:", backend.metrics())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+# Проверка наличия matplotlib для графиков
+try:
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+    from matplotlib.figure import Figure
+    # Настройка шрифтов для кириллицы в графиках (зависит от ОС, но попробуем стандарт)
+    plt.rcParams['font.family'] = 'DejaVu Sans'
+    MATPLOTLIB_OK = True
+except ImportError:
+    MATPLOTLIB_OK = False
+
+# ─── ГРАФИК ДИНАМИКИ ───────────────────────────────────────────────
+# Figure и холст создаются один раз. Данные берутся из VisitSeries
+# (timeseries.py) — массивы уже разобраны, время в днях matplotlib.
+# Линии обновляются через set_data. Если оси не изменились — перерисовываются
+# только линии поверх сохраненного фона (blit), иначе — одна полная отрисовка.
+
+ROLLING_WINDOW = 3
+
+
+class DynamicsChart:
+    def __init__(self, master):
+        self._background = None
+        self._drawn      = (None, 0)     # какой ряд и какой длины уже нарисован
+
+        self.fig = Figure(figsize=(9, 4.5), facecolor="#21253a")
+        self.fig.subplots_adjust(hspace=0.5, left=0.1, right=0.95, top=0.9, bottom=0.15)
+
+        # График 1: Угол
+        self.ax1 = self.fig.add_subplot(2, 1, 1)
+        self.angle_line, = self.ax1.plot([], [], color="#00b4d8", linewidth=2.5, marker="o",
+                                         markersize=6, animated=True)
+        self._style_axis(self.ax1, "Угол (°)", "Динамика искривления")
+
+        # График 2: Боль
+        self.ax2 = self.fig.add_subplot(2, 1, 2)
+        self.pain_line, = self.ax2.plot([], [], color="#ff5722", linewidth=2.5, marker="s",
+                                        markersize=6, animated=True)
+        self.pain_avg_line, = self.ax2.plot([], [], color="#ffc107", linewidth=1.5,
+                                            linestyle="--", animated=True,
+                                            label=f"Среднее за {ROLLING_WINDOW} визита")
+        self.ax2.legend(loc="upper right", fontsize=7, facecolor="#21253a",
+                        edgecolor="#2b304a", labelcolor="#b0bec5")
+        self._style_axis(self.ax2, "Боль (1-10)", "Уровень боли")
+        self.ax2.set_ylim(0, 10.5)
+
+        self.angle_fill = None
+        self.pain_fill  = None
+
+        self.canvas = FigureCanvasTkAgg(self.fig, master=master)
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+
+    def _style_axis(self, ax, ylabel, title):
+        ax.set_facecolor("#1a1c29")
+        ax.set_ylabel(ylabel, color="white", fontsize=9)
+        ax.tick_params(colors="#b0bec5", labelsize=8)
+        ax.xaxis.set_major_formatter(mdates.DateFormatter("%d.%m"))
+        ax.grid(color="#2b304a", linestyle="--", alpha=0.5)
+        ax.set_title(title, color="white", fontsize=11, pad=5)
+        for spine in ax.spines.values(): spine.set_edgecolor("#2b304a")
+
+    def widget(self):
+        return self.canvas.get_tk_widget()
+
+    def reset(self):
+        self._drawn = (None, 0)
+
+    # ─── Отрисовка ─────────────────────────────────────────────────
+    def update(self, series):
+        # Повторный показ без новых точек ничего не перерисовывает
+        if len(series) < 2 or (self._drawn[0] is series and self._drawn[1] == len(series)):
+            return
+        self._drawn = (series, len(series))
+        t, angle, pain = series.t, series.angle, series.pain
+        self.angle_line.set_data(t, angle)
+        self.pain_line.set_data(t, pain)
+        self.pain_avg_line.set_data(t, series.rolling_mean(pain, ROLLING_WINDOW))
+
+        # Заливка под линией — коллекция, ее проще пересоздать
+        if self.angle_fill: self.angle_fill.remove()
+        if self.pain_fill:  self.pain_fill.remove()
+        self.angle_fill = self.ax1.fill_between(t, angle, alpha=0.15,
+                                                color="#00b4d8", animated=True)
+        self.pain_fill  = self.ax2.fill_between(t, pain, alpha=0.15,
+                                                color="#ff5722", animated=True)
+
+        old_limits = (self.ax1.get_xlim(), self.ax1.get_ylim())
+        self.ax1.relim(); self.ax1.autoscale_view()
+        self.ax2.relim(); self.ax2.autoscale_view(scaley=False)
+        limits_changed = old_limits != (self.ax1.get_xlim(), self.ax1.get_ylim())
+
+        if limits_changed or self._background is None:
+            self.canvas.draw_idle()
+        else:
+            self.canvas.restore_region(self._background)
+            self._draw_animated()
+            self.canvas.blit(self.fig.bbox)
+
+    def _on_draw(self, event):
+        # После полной отрисовки запоминаем фон (оси, сетка) без линий
+        self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_animated()
+
+    def _draw_animated(self):
+        for artist in (self.angle_fill, self.pain_fill, self.angle_line,
+                       self.pain_line, self.pain_avg_line):
+            if artist is not None:
+                self.fig.draw_artist(artist)
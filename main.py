@@ -1,32 +1,78 @@
+import time
+_STARTED = time.perf_counter()   # точка отсчета для замера холодного старта
+
 import customtkinter as ctk
-import google.generativeai as genai
-from PIL import Image
 from tkinter import filedialog, messagebox
-import threading
-import json
 import os
-import re
+import math
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-# Проверка наличия matplotlib для графиков
-try:
-    import matplotlib.pyplot as plt
-    import matplotlib.dates as mdates
-    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-    from matplotlib.figure import Figure
-    # Настройка шрифтов для кириллицы в графиках (зависит от ОС, но попробуем стандарт)
-    plt.rcParams['font.family'] = 'DejaVu Sans' 
-    MATPLOTLIB_OK = True
-except ImportError:
-    MATPLOTLIB_OK = False
+from spine_core.analysis import (AnalysisRequest, calculate_bmi, make_record, parse_response,
+                                 run_analysis)
+from spine_core.backends import create_backend
+from spine_core.config import (API_KEY, MODEL_NAME, MODEL_BACKEND, RESILIENCE_CONFIG, DB_FILE,
+                               PROFILE_FILE, HISTORY_FILE, HISTORY_LOG, RESPONSE_CACHE_FILE,
+                               RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_SEC, IMAGE_CACHE_DIR,
+                               IMAGE_CONFIG, STREAM_RESPONSES, PDF_FONT, IMAGE_STORE_DIR,
+                               THUMB_SIZE, THUMB_CACHE_BYTES, TRACE_FILE)
+from spine_core.export import (ExportRequest, ExportTask, bulk_tasks, process_umask,
+                               run_export)
+from spine_core.history_store import HistoryStore
+from spine_core.image_store import ImageStore, MemoryLRU
+from spine_core.persistence import WriteBehind
+from spine_core.presentation import (COLOR_DANGER, COLOR_SUCCESS, COLOR_WARNING, PAIN_COLORS,
+                                     PAIN_LABELS, record_view, result_text)
+from spine_core.imaging import ImagePreprocessor, format_bytes
+from spine_core.repository import PatientRepository, chart_point
+from spine_core.records import RecordError, VisitRecord
+from spine_core.resilience import ResilientBackend
+from spine_core.response_cache import ResponseCache
+from spine_core.scheduler import (AnalysisScheduler, QueueFullError,
+                                  PENDING, RUNNING, DONE, FAILED, CANCELLED)
+from spine_core.telemetry import METRICS
+from widgets import PagedSource, VirtualList
+
+_IMPORTED = time.perf_counter()
 
 # ─── КОНФИГУРАЦИЯ ──────────────────────────────────────────────────
-API_KEY = "YOUR-GEMINI-AI API KEY" # Замените на свой ключ, если этот не работает
-genai.configure(api_key=API_KEY)
-model = genai.GenerativeModel("gemini-3-flash-preview") # Используем актуальную модель
-
-PROFILE_FILE = "profile.json"
-HISTORY_FILE = "history.json"
+# Клиент модели создается при первом анализе, matplotlib и numpy —
+# при первом открытии экрана «Динамика»
+model = ResilientBackend(create_backend(MODEL_BACKEND, API_KEY, MODEL_NAME), RESILIENCE_CONFIG)
+
+HISTORY_PAGE_SIZE     = 50
+HISTORY_ROW_HEIGHT    = 130
+HISTORY_THUMB_IMAGES  = 200    # готовых CTkImage миниатюр в памяти окна
+TREND_WINDOW          = 5      # окно скользящего среднего на экране динамики
+
+# Поиск по истории: сколько лучших совпадений показывать и пауза после ввода
+HISTORY_SEARCH_LIMIT    = 500
+HISTORY_SEARCH_DELAY_MS = 250
+RISK_FILTERS = {"Любой риск": None, "Низкий": "низк", "Средний": "средн", "Высокий": "высок"}
+ZONE_FILTERS = {"Любой отдел": None, "Шейный": "шейн", "Грудной": "грудн",
+                "Поясничный": "поясничн"}
+
+# Очередь анализов
+ANALYSIS_WORKERS   = 2
+ANALYSIS_MAX_QUEUE = 20
+QUEUE_VISIBLE_JOBS = 6
+SCHEDULER_POLL_MS  = 100
+WRITE_POLL_MS      = 50        # проверка завершения отложенной записи
+CLOSE_WAIT_SEC     = 10        # столько ждем записи при выходе, прежде чем предупредить
+
+# Экспорт отчетов — в своем пуле, чтобы не занимать очередь анализов
+EXPORT_WORKERS   = 2
+EXPORT_MAX_QUEUE = 10
+EXPORT_FILETYPES = [("PDF документ", "*.pdf"), ("HTML файл", "*.html")]
+
+# Панель «Замеры» (F12): как часто обновлять таблицу этапов
+METRICS_REFRESH_MS = 1000
+
+# Пока ответ модели идет потоком, еще не пришедшие поля показываются так
+STREAM_PENDING  = "…"
+STREAMED_FIELDS = ("ugol_iskrivleniya", "zona_davleniya", "rekomenduemaya_zhostkost",
+                   "stepen_riska", "srochno_k_vrachu", "kommentariy", "preduprezhdenie")
 
 # Цветовая схема
 COLOR_BG           = "#1a1a2e"
@@ -37,42 +83,27 @@ COLOR_ACCENT_HOVER = "#0096c7"
 COLOR_TEXT_MAIN    = "#ffffff"
 COLOR_TEXT_SUB     = "#b0bec5"
 COLOR_INPUT        = "#2b304a"
-COLOR_DANGER       = "#ef5350"
-COLOR_SUCCESS      = "#4caf50"
-COLOR_WARNING      = "#ff9800"
-
-# Цвета для шкалы боли (от зеленого к красному)
-PAIN_COLORS = {
-    1: "#4caf50", 2: "#66bb6a", 3: "#8bc34a",
-    4: "#cddc39", 5: "#ffeb3b", 6: "#ffc107",
-    7: "#ff9800", 8: "#ff5722", 9: "#f44336", 10: "#b71c1c"
-}
+# Цвета состояния, риска и шкалы боли — в spine_core/presentation.py
 
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
 
+EMPTY_RECORD = VisitRecord("--")   # заглушка для строки, чья запись еще не подгружена
+
 # ─── ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ───────────────────────────────────────
-def load_json(filename, default):
-    if os.path.exists(filename):
-        try:
-            with open(filename, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except:
-            return default
-    return default
+def selection_key(record):
+    # Записи истории подгружаются заново при прокрутке — отметку храним по содержимому
+    return record.date, record.symptoms, record.comment
 
-def save_json(filename, data):
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
 
-def calculate_bmi(height_cm, weight_kg):
+def parse_filter_date(text, end_of_day=False):
+    # "05.03.2026" -> datetime; пустое или недописанное поле — без фильтра
     try:
-        h_m = float(height_cm) / 100
-        w = float(weight_kg)
-        bmi = w / (h_m ** 2)
-        return round(bmi, 1)
-    except (ValueError, ZeroDivisionError, TypeError):
+        value = datetime.strptime(text.strip(), "%d.%m.%Y")
+    except ValueError:
         return None
+    return value.replace(hour=23, minute=59) if end_of_day else value
+
 
 # ─── ОСНОВНОЙ КЛАСС ПРИЛОЖЕНИЯ ─────────────────────────────────────
 class SpineApp(ctk.CTk):
@@ -84,15 +115,149 @@ class SpineApp(ctk.CTk):
         
         # Состояние приложения
         self.image_path    = None
-        self.profile       = load_json(PROFILE_FILE, {})
-        self.history       = load_json(HISTORY_FILE, [])
+        self.repo          = None      # база открывается в фоне, см. finish_loading
+        self.writer        = None      # отложенная запись в базу (persistence.py)
+        self.patient_id    = None
+        self.profile       = {}
+        self.history       = None
+        self.patient_labels = {}
         self.current_frame = None
+        self.current_screen = None
+        self.drawn         = {}        # экран -> (пациент, ревизия истории, фильтры) при отрисовке
+        self.refresh_idle  = None      # отложенная до простоя перерисовка текущего экрана
         self.pain_level    = 0
-        self.last_data     = None
-        self.canvas_widget = None
+        self.last_record   = None      # последний визит — для экспорта отчета
+        self.last_profile  = None      # анкета пациента этого визита
+        self.display_job   = None      # задача, чьи поля сейчас показываются в результате
+        self.partial_data  = {}
+        self.queue_notice  = ""        # итог анализа, который уже не на экране
+        self.chart         = None
+        self.charts        = None      # модуль charts, загружается лениво
+        self.series        = None
+        
+        self.cache         = ResponseCache(RESPONSE_CACHE_FILE, RESPONSE_CACHE_SIZE,
+                                           RESPONSE_CACHE_TTL_SEC)
+        self.preprocessor  = ImagePreprocessor(IMAGE_CACHE_DIR, IMAGE_CONFIG)
+        self.images        = ImageStore(IMAGE_STORE_DIR, THUMB_SIZE, THUMB_CACHE_BYTES)
+        self.thumb_images  = MemoryLRU(HISTORY_THUMB_IMAGES)
+        self.thumb_ready   = queue.Queue()   # (хэш, future) загруженных в фоне миниатюр
+        self.thumb_failed  = set()
+        self.write_errors  = queue.Queue()   # ошибки отложенной записи (из потока write-behind)
+        self.cache_stats   = {"hits": 0, "misses": 0, "entries": 0}   # обновляет рабочий поток
+        self.scheduler     = AnalysisScheduler(self.run_job,
+                                               max_workers=ANALYSIS_WORKERS,
+                                               max_pending=ANALYSIS_MAX_QUEUE)
+        self.exporter      = AnalysisScheduler(run_export, max_workers=EXPORT_WORKERS,
+                                               max_pending=EXPORT_MAX_QUEUE, name="export")
+        self.selected      = {}        # выбранные в истории визиты для пакетного экспорта
+        self.metrics_window = None     # панель «Замеры», открывается по F12
         
+        # Окно появляется сразу, база и история пациента читаются в фоне
+        loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="startup")
+        self.loading = loader.submit(self.load_repository)
+        loader.shutdown(wait=False)
+
         self.build_layout()
         self.select_frame("analysis")
+        self._built = time.perf_counter()
+        self.after(WRITE_POLL_MS, self.finish_loading)
+        self.after(SCHEDULER_POLL_MS, self.poll_scheduler)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.bind("<F12>", lambda e: self.open_metrics_panel())
+        self.after_idle(self.report_startup)
+
+    def run_job(self, request, report):
+        # Работа пула анализа. Счетчики кэша — запрос к SQLite — снимаются
+        # здесь же, а GUI-поток при опросе только читает готовый словарь
+        try:
+            return run_analysis(
+                request, model, self.cache, self.preprocessor,
+                on_field=(lambda key, value: report((key, value))) if STREAM_RESPONSES else None,
+                images=self.images)
+        finally:
+            self.cache_stats = self.cache.stats()
+
+    def report_startup(self):
+        # Окно отрисовано и готово к вводу — фиксируем время холодного старта
+        ready = time.perf_counter()
+        self.startup_times = {
+            "imports": _IMPORTED - _STARTED,
+            "window":  self._built - _IMPORTED,
+            "ready":   ready - _STARTED,
+        }
+        print("Холодный старт: импорт {imports:.3f} с, окно {window:.3f} с, "
+              "готово через {ready:.3f} с".format(**self.startup_times))
+        self.version_info.configure(
+            text=f"v3.1.0 RU\nAI Powered\nЗапуск: {self.startup_times['ready']:.2f} с")
+
+    def on_close(self):
+        # Все отложенные записи — на диск до выхода; медленный диск — повод
+        # предупредить, но не бросить очередь
+        if self.writer and not self.writer.close(CLOSE_WAIT_SEC):
+            messagebox.showwarning("Запись на диск",
+                                   "Изменения еще записываются на диск.\n"
+                                   "Окно закроется, когда все будет сохранено.")
+            self.writer.close()
+        self.poll_write_errors()
+        self.scheduler.shutdown()
+        self.exporter.shutdown()       # начатые файлы дописываются, ожидающие снимаются
+        self.preprocessor.shutdown()
+        self.images.shutdown()
+        if TRACE_FILE:
+            METRICS.dump_trace(TRACE_FILE)
+        self.destroy()
+
+    def open_repository(self):
+        repo = PatientRepository(DB_FILE)
+        if repo.is_empty():
+            repo.migrate_from_json(PROFILE_FILE, HistoryStore(HISTORY_LOG, legacy_path=HISTORY_FILE))
+        if repo.is_empty():
+            repo.create_patient({})
+        return repo
+
+    def load_repository(self):
+        # Фоновый поток: открытие (и миграция) базы и первая страница истории,
+        # чтобы к показу экрана она уже была в кэше SQLite
+        repo = self.open_repository()
+        ids  = [pid for pid, _ in repo.list_patients()]
+        last = repo.get_meta("last_patient")
+        patient_id = int(last) if last and last.isdigit() and int(last) in ids else ids[0]
+        repo.history(patient_id).page(0, HISTORY_PAGE_SIZE)
+        return repo, patient_id
+
+    def finish_loading(self):
+        if not self.loading.done():
+            self.after(WRITE_POLL_MS, self.finish_loading)
+            return
+        try:
+            self.repo, patient_id = self.loading.result()
+        except Exception as e:
+            messagebox.showerror("База данных", f"Не удалось открыть базу пациентов:\n{e}")
+            return
+        self.writer = WriteBehind(self.repo.batch, savepoint=self.repo.savepoint,
+                                  on_error=self.write_errors.put)
+        self.switch_patient(patient_id)
+
+    def after_write(self, future, callback=None):
+        # Колбэк в GUI-потоке, когда отложенная запись дошла до диска; о неудачной
+        # записи сообщает poll_write_errors
+        if not future.done():
+            self.after(WRITE_POLL_MS, lambda: self.after_write(future, callback))
+            return
+        if future.exception() is None and callback:
+            callback()
+
+    def poll_write_errors(self):
+        # Каждая несохраненная операция (визит, профиль, выбор пациента) — одно сообщение
+        errors = []
+        while True:
+            try:
+                errors.append(str(self.write_errors.get_nowait()))
+            except queue.Empty:
+                break
+        if errors:
+            messagebox.showerror("Запись на диск",
+                                 "Изменения не сохранены:\n" + "\n".join(dict.fromkeys(errors)))
 
     def build_layout(self):
         self.grid_columnconfigure(1, weight=1)
@@ -112,9 +277,43 @@ class SpineApp(ctk.CTk):
         self.btn_history  = self.create_nav_button("🗂  История",          3, "history")
         self.btn_profile  = self.create_nav_button("👤  Профиль",          4, "profile")
 
-        version_info = ctk.CTkLabel(self.sidebar, text="v3.1.0 RU\nAI Powered",
+        # Выбор пациента
+        patient_frame = ctk.CTkFrame(self.sidebar, fg_color="transparent")
+        patient_frame.grid(row=5, column=0, sticky="ew", padx=10, pady=(20, 4))
+        ctk.CTkLabel(patient_frame, text="Пациент:", text_color=COLOR_TEXT_SUB,
+            font=("Roboto", 12)).pack(anchor="w", padx=5)
+        self.patient_menu = ctk.CTkOptionMenu(patient_frame, values=[""],
+            command=self.on_patient_selected, fg_color=COLOR_INPUT,
+            button_color=COLOR_CARD, button_hover_color=COLOR_ACCENT_HOVER)
+        self.patient_menu.pack(fill="x", pady=(2, 6))
+        ctk.CTkButton(patient_frame, text="➕ Новый пациент", command=self.new_patient,
+            fg_color="transparent", border_width=1, border_color=COLOR_INPUT,
+            text_color=COLOR_TEXT_SUB, hover_color=COLOR_CARD, height=30).pack(fill="x")
+
+        self.version_info = ctk.CTkLabel(self.sidebar, text="v3.1.0 RU\nAI Powered",
             text_color="gray50", font=("Arial", 11))
-        version_info.grid(row=7, column=0, padx=20, pady=20)
+        self.version_info.grid(row=7, column=0, padx=20, pady=20)
+
+        self.cache_label = ctk.CTkLabel(self.sidebar, text="",
+            text_color="gray50", font=("Arial", 10))
+        self.cache_label.grid(row=8, column=0, padx=20, pady=(0, 2))
+
+        self.api_label = ctk.CTkLabel(self.sidebar, text="",
+            text_color="gray50", font=("Arial", 10))
+        self.api_label.grid(row=9, column=0, padx=20, pady=(0, 10))
+
+        # Прогресс экспорта отчетов (виден с любого экрана)
+        self.export_frame = ctk.CTkFrame(self.sidebar, fg_color="transparent")
+        self.export_frame.grid(row=10, column=0, sticky="ew", padx=20, pady=(0, 10))
+        self.export_label = ctk.CTkLabel(self.export_frame, text="",
+            text_color="gray50", font=("Arial", 10), wraplength=200)
+        self.export_label.pack(fill="x")
+        self.export_bar = ctk.CTkProgressBar(self.export_frame, height=6,
+            progress_color=COLOR_ACCENT)
+
+        ctk.CTkButton(self.sidebar, text="⏱ Замеры (F12)", command=self.open_metrics_panel,
+            fg_color="transparent", text_color="gray50", hover_color=COLOR_CARD,
+            font=("Arial", 10), height=22).grid(row=11, column=0, padx=20, pady=(0, 10))
 
         # === ОСНОВНОЙ КОНТЕЙНЕР ===
         self.main_container = ctk.CTkFrame(self, fg_color=COLOR_BG, corner_radius=0)
@@ -161,14 +360,69 @@ class SpineApp(ctk.CTk):
         frame, btn = mapping[name]
         btn.configure(fg_color=COLOR_CARD, text_color=COLOR_ACCENT)
         
-        self.current_frame = frame
+        self.current_frame  = frame
+        self.current_screen = name
         self.current_frame.grid(row=0, column=0, sticky="nsew", padx=30, pady=30)
         
-        # Обновление данных при переключении
-        if name == "history":
-            self.refresh_history_list()
-        if name == "dynamics":
-            self.refresh_dynamics()
+        self.schedule_refresh()
+
+    def screen_state(self, name):
+        # От чего зависит содержимое экрана; совпадает с отрисованным — перечитывать нечего
+        state = (self.patient_id, self.history.revision())
+        return state + (self.history_filters(),) if name == "history" else state
+
+    def schedule_refresh(self):
+        # Перерисовка — в idle-колбэке: экран показывается сразу, а несколько
+        # поводов подряд (переключение вкладок, запись в базу) дают одну перерисовку
+        if self.refresh_idle is None:
+            self.refresh_idle = self.after_idle(self.refresh_current_screen)
+
+    def refresh_current_screen(self):
+        self.refresh_idle = None
+        if self.history is None:
+            return
+        name = self.current_screen
+        refresh = {"history":  self.refresh_history_list,
+                   "dynamics": self.refresh_dynamics}.get(name)
+        if refresh and self.drawn.get(name) != self.screen_state(name):
+            refresh()
+
+    # ─── ПАЦИЕНТЫ ──────────────────────────────────────────────────
+    def patient_label(self, pid, name):
+        return f"{name or 'Без имени'} (#{pid})"
+
+    def refresh_patient_menu(self):
+        self.patient_labels = {self.patient_label(pid, name): pid
+                               for pid, name in self.repo.list_patients()}
+        self.patient_menu.configure(values=list(self.patient_labels))
+        for label, pid in self.patient_labels.items():
+            if pid == self.patient_id:
+                self.patient_menu.set(label)
+
+    def switch_patient(self, patient_id):
+        self.patient_id = patient_id
+        self.profile    = self.repo.get_profile(patient_id)
+        self.history    = self.repo.history(patient_id)
+        self.writer.submit(("meta", "last_patient"), self.repo.set_meta, "last_patient", patient_id)
+        self.refresh_patient_menu()
+        self.fill_profile_form()
+        self.reset_dynamics_view()
+        self.clear_selection()
+        self.drawn.clear()
+        if self.current_frame:
+            self.schedule_refresh()
+
+    def on_patient_selected(self, label):
+        pid = self.patient_labels.get(label)
+        if pid is not None and pid != self.patient_id:
+            self.switch_patient(pid)
+
+    def new_patient(self):
+        if self.writer is None:
+            return
+        created = self.writer.submit(None, self.repo.create_patient, {})
+        self.after_write(created, lambda: (self.switch_patient(created.result()),
+                                           self.select_frame("profile")))
 
     # ─── ЭКРАН 1: АНАЛИЗ ───────────────────────────────────────────
     def build_analysis_screen(self, parent):
@@ -230,8 +484,11 @@ class SpineApp(ctk.CTk):
         self.progress_bar = ctk.CTkProgressBar(input_card, height=3, progress_color=COLOR_ACCENT)
         self.progress_bar.set(0)
 
+        # Очередь анализов (показывается, когда есть задачи)
+        self.queue_card = ctk.CTkFrame(parent, fg_color=COLOR_CARD, corner_radius=15)
+
         # Карточка результата
-        result_card = ctk.CTkFrame(parent, fg_color=COLOR_CARD, corner_radius=15)
+        self.result_card = result_card = ctk.CTkFrame(parent, fg_color=COLOR_CARD, corner_radius=15)
         result_card.pack(fill="both", expand=True)
         
         res_header = ctk.CTkFrame(result_card, fg_color="transparent")
@@ -254,12 +511,8 @@ class SpineApp(ctk.CTk):
         self.pain_level = value
         for i, btn in self.pain_buttons.items():
             btn.configure(fg_color=PAIN_COLORS[i] if i <= value else COLOR_INPUT)
-            
-        labels = {1:"Нет боли", 2:"Очень слабая", 3:"Слабая", 4:"Умеренная",
-                  5:"Средняя", 6:"Заметная", 7:"Сильная", 8:"Очень сильная",
-                  9:"Нестерпимая", 10:"Максимальная"}
         self.pain_selected_label.configure(
-            text=f"— {labels.get(value, '')}", text_color=PAIN_COLORS[value])
+            text=f"— {PAIN_LABELS.get(value, '')}", text_color=PAIN_COLORS[value])
 
     # ─── ЭКРАН 2: ДИНАМИКА ─────────────────────────────────────────
     def build_dynamics_screen(self, parent):
@@ -279,6 +532,16 @@ class SpineApp(ctk.CTk):
         self.stat_pain    = self._make_stat(self.stats_row, "Боль (текущая)",  "--/10", COLOR_DANGER)
         self.stat_pain_d  = self._make_stat(self.stats_row, "Изм. боли",       "--",    COLOR_SUCCESS)
 
+        # Тренды по всей истории
+        self.trend_row = ctk.CTkFrame(stats_card, fg_color="transparent")
+        self.trend_row.pack(fill="x", padx=20, pady=(0, 15))
+
+        self.stat_pain_avg    = self._make_stat(self.trend_row, f"Боль (ср. {TREND_WINDOW} виз.)", "--", COLOR_DANGER)
+        self.stat_pain_trend  = self._make_stat(self.trend_row, "Тренд боли / нед.", "--", COLOR_TEXT_SUB)
+        self.stat_angle_trend = self._make_stat(self.trend_row, "Тренд угла / нед.", "--", COLOR_TEXT_SUB)
+        self.stat_angle_range = self._make_stat(self.trend_row, "Угол мин–макс",     "--", COLOR_WARNING)
+        self.stat_improve     = self._make_stat(self.trend_row, "Визитов с улучш.",  "--", COLOR_SUCCESS)
+
         # График
         self.chart_card = ctk.CTkFrame(parent, fg_color=COLOR_CARD, corner_radius=15)
         self.chart_card.pack(fill="both", expand=True)
@@ -295,101 +558,98 @@ class SpineApp(ctk.CTk):
         val_label.pack(pady=(0, 10))
         return val_label
 
-    def refresh_dynamics(self):
-        h = self.history
-        self.stat_visits.configure(text=str(len(h)))
-        if not h:
+    def reset_dynamics_view(self):
+        self.series = None
+        for label, text in ((self.stat_angle, "--"), (self.stat_pain, "--/10"),
+                            (self.stat_pain_avg, "--"), (self.stat_pain_trend, "--"),
+                            (self.stat_angle_trend, "--"), (self.stat_angle_range, "--"),
+                            (self.stat_improve, "--")):
+            label.configure(text=text)
+        self.stat_angle_d.configure(text="--", text_color=COLOR_SUCCESS)
+        self.stat_pain_d.configure(text="--", text_color=COLOR_SUCCESS)
+        if self.chart:
+            self.chart.reset()
+            self.show_chart(False)
+
+    def ensure_series(self):
+        # Ряд строится из базы при смене пациента или изменении истории не из
+        # этого окна; свои новые визиты дописываются в history_saved
+        if self.series is None or self.series.key != self.screen_state("dynamics"):
+            from spine_core.timeseries import VisitSeries   # numpy — только для экрана динамики
+            revision, points = self.history.chart_snapshot()
+            self.series = VisitSeries.from_points(points, key=(self.patient_id, revision))
+        return self.series
+
+    def _show_change(self, label, change, unit):
+        if change is None:
+            label.configure(text="--", text_color=COLOR_SUCCESS)
             return
-            
-        last = h[-1]
-        last_angle = last.get("angle")
-        last_pain  = last.get("pain_level")
-        
-        self.stat_angle.configure(text=f"{last_angle}°" if last_angle is not None else "--")
-        self.stat_pain.configure(text=f"{last_pain}/10" if isinstance(last_pain, int) else "--/10")
-        
-        if len(h) >= 2:
-            prev = h[-2]
-            prev_angle = prev.get("angle")
-            prev_pain  = prev.get("pain_level")
-            
-            # Сравнение угла
-            if last_angle is not None and prev_angle is not None:
-                diff = round(float(last_angle) - float(prev_angle), 1)
-                sign = "▼" if diff < 0 else ("▲" if diff > 0 else "=")
-                # Если угол уменьшился - это хорошо (зеленый)
-                color = COLOR_SUCCESS if diff <= 0 else COLOR_DANGER 
-                self.stat_angle_d.configure(text=f"{sign} {abs(diff)}°", text_color=color)
-                
-            # Сравнение боли
-            if isinstance(last_pain, int) and isinstance(prev_pain, int):
-                diff_p = last_pain - prev_pain
-                sign = "▼" if diff_p < 0 else ("▲" if diff_p > 0 else "=")
-                color = COLOR_SUCCESS if diff_p <= 0 else COLOR_DANGER
-                self.stat_pain_d.configure(text=f"{sign} {abs(diff_p)}", text_color=color)
+        diff = round(change, 1)
+        sign = "▼" if diff < 0 else ("▲" if diff > 0 else "=")
+        # Если показатель уменьшился - это хорошо (зеленый)
+        color = COLOR_SUCCESS if diff <= 0 else COLOR_DANGER
+        label.configure(text=f"{sign} {abs(diff):g}{unit}", text_color=color)
+
+    def _show_trend(self, label, slope, unit):
+        if slope is None or math.isnan(slope):
+            label.configure(text="--", text_color=COLOR_TEXT_SUB)
+            return
+        color = COLOR_SUCCESS if slope <= 0 else COLOR_DANGER
+        label.configure(text=f"{slope:+.1f}{unit}", text_color=color)
+
+    def refresh_dynamics(self):
+        self.drawn["dynamics"] = self.screen_state("dynamics")
+        self.stat_visits.configure(text=str(self.history.count()))
+        series = self.ensure_series()
+        angle  = series.summary(series.angle, TREND_WINDOW)
+        pain   = series.summary(series.pain, TREND_WINDOW)
+
+        # Текущие значения и изменение относительно предыдущего измерения
+        if angle:
+            self.stat_angle.configure(text=f"{angle['last']:g}°")
+            self._show_change(self.stat_angle_d, angle["change"], "°")
+            self._show_trend(self.stat_angle_trend, angle["slope"], "°")
+            self.stat_angle_range.configure(text=f"{angle['min']:g}–{angle['max']:g}°")
+        if pain:
+            self.stat_pain.configure(text=f"{pain['last']:g}/10")
+            self._show_change(self.stat_pain_d, pain["change"], "")
+            self._show_trend(self.stat_pain_trend, pain["slope"], "")
+            rolling = pain["rolling"]
+            self.stat_pain_avg.configure(text="—" if math.isnan(rolling) else f"{rolling:.1f}")
+
+        # Доля визитов, где боль (или угол, если боль не указывалась) снизилась
+        main = pain if pain and pain["improvement"] is not None else angle
+        if main and main["improvement"] is not None:
+            self.stat_improve.configure(text=f"{main['improvement'] * 100:.0f}%")
                 
         self.draw_chart()
 
     def draw_chart(self):
-        if not MATPLOTLIB_OK:
+        # matplotlib импортируется при первом открытии экрана
+        if self.charts is None:
+            import charts
+            self.charts = charts
+        if not self.charts.MATPLOTLIB_OK:
             self.chart_placeholder.configure(text="Библиотека matplotlib не установлена")
             return
-            
-        dates, angles, pains = [], [], []
-        for r in self.history:
-            try:
-                dt = datetime.strptime(r["date"], "%d.%m.%Y %H:%M")
-                
-                a = r.get("angle")
-                p = r.get("pain_level")
-                
-                # Добавляем точку только если есть угол или боль
-                if a is not None or (p is not None and isinstance(p, int)):
-                    dates.append(dt)
-                    angles.append(float(a) if a is not None else float("nan"))
-                    pains.append(float(p) if isinstance(p, int) else float("nan"))
-            except Exception:
-                continue
-                
-        if len(dates) < 2:
-            return
-            
-        self.chart_placeholder.pack_forget()
-        if self.canvas_widget:
-            self.canvas_widget.get_tk_widget().destroy()
-            
-        # Построение графиков
-        fig = Figure(figsize=(9, 4.5), facecolor="#21253a")
-        fig.subplots_adjust(hspace=0.5, left=0.1, right=0.95, top=0.9, bottom=0.15)
-
-        # График 1: Угол
-        ax1 = fig.add_subplot(2, 1, 1)
-        ax1.set_facecolor("#1a1c29")
-        ax1.plot(dates, angles, color="#00b4d8", linewidth=2.5, marker="o", markersize=6)
-        ax1.fill_between(dates, angles, alpha=0.15, color="#00b4d8")
-        ax1.set_ylabel("Угол (°)", color="white", fontsize=9)
-        ax1.tick_params(colors="#b0bec5", labelsize=8)
-        ax1.xaxis.set_major_formatter(mdates.DateFormatter("%d.%m"))
-        ax1.grid(color="#2b304a", linestyle="--", alpha=0.5)
-        ax1.set_title("Динамика искривления", color="white", fontsize=11, pad=5)
-        for spine in ax1.spines.values(): spine.set_edgecolor("#2b304a")
-
-        # График 2: Боль
-        ax2 = fig.add_subplot(2, 1, 2)
-        ax2.set_facecolor("#1a1c29")
-        ax2.plot(dates, pains, color="#ff5722", linewidth=2.5, marker="s", markersize=6)
-        ax2.fill_between(dates, pains, alpha=0.15, color="#ff5722")
-        ax2.set_ylabel("Боль (1-10)", color="white", fontsize=9)
-        ax2.set_ylim(0, 10.5)
-        ax2.tick_params(colors="#b0bec5", labelsize=8)
-        ax2.xaxis.set_major_formatter(mdates.DateFormatter("%d.%m"))
-        ax2.grid(color="#2b304a", linestyle="--", alpha=0.5)
-        ax2.set_title("Уровень боли", color="white", fontsize=11, pad=5)
-        for spine in ax2.spines.values(): spine.set_edgecolor("#2b304a")
-
-        self.canvas_widget = FigureCanvasTkAgg(fig, master=self.chart_card)
-        self.canvas_widget.draw()
-        self.canvas_widget.get_tk_widget().pack(fill="both", expand=True, padx=15, pady=15)
+
+        # График создается один раз и перерисовывается только при новых точках
+        with METRICS.span("ui.chart"):
+            if self.chart is None:
+                self.chart = self.charts.DynamicsChart(self.chart_card)
+            series = self.ensure_series()
+            self.chart.update(series)
+            self.show_chart(len(series) >= 2)
+
+    def show_chart(self, visible):
+        widget = self.chart.widget()
+        packed = bool(widget.winfo_manager())
+        if visible and not packed:
+            self.chart_placeholder.pack_forget()
+            widget.pack(fill="both", expand=True, padx=15, pady=15)
+        elif not visible and packed:
+            widget.pack_forget()
+            self.chart_placeholder.pack(expand=True)
 
     # ─── ЭКРАН 3: ИСТОРИЯ ──────────────────────────────────────────
     def build_history_screen(self, parent):
@@ -400,75 +660,237 @@ class SpineApp(ctk.CTk):
             
         ctk.CTkButton(header, text="🗑 Очистить все", command=self.clear_history,
             fg_color=COLOR_DANGER, hover_color="#c62828", height=36, width=150).pack(side="right")
+        ctk.CTkButton(header, text="📄 Отчет", command=self.export_history_report,
+            fg_color=COLOR_CARD, hover_color=COLOR_ACCENT_HOVER, height=36, width=120
+        ).pack(side="right", padx=(0, 10))
+        self.export_selected_btn = ctk.CTkButton(header, text="📦 Экспорт выбранных",
+            command=self.export_selected, fg_color=COLOR_CARD, hover_color=COLOR_ACCENT_HOVER,
+            height=36, width=190)
+        self.export_selected_btn.pack(side="right", padx=(0, 10))
             
+        # Поиск и фильтры
+        filters = ctk.CTkFrame(parent, fg_color="transparent")
+        filters.pack(fill="x", pady=(0, 10))
+        self.search_entry = ctk.CTkEntry(filters, height=36, border_width=0,
+            fg_color=COLOR_INPUT, text_color="white",
+            placeholder_text="🔍 Поиск по жалобам, заключениям, упражнениям...")
+        self.search_entry.pack(side="left", fill="x", expand=True, padx=(0, 8))
+        self.search_entry.bind("<KeyRelease>", lambda e: self.schedule_history_search())
+
+        menu_style = dict(fg_color=COLOR_INPUT, button_color=COLOR_CARD,
+                          button_hover_color=COLOR_ACCENT_HOVER, height=36, width=130,
+                          command=lambda _: self.refresh_history_list())
+        self.risk_filter = ctk.CTkOptionMenu(filters, values=list(RISK_FILTERS), **menu_style)
+        self.risk_filter.pack(side="left", padx=(0, 8))
+        self.zone_filter = ctk.CTkOptionMenu(filters, values=list(ZONE_FILTERS), **menu_style)
+        self.zone_filter.pack(side="left", padx=(0, 8))
+
+        self.date_from_entry = ctk.CTkEntry(filters, height=36, width=110, border_width=0,
+            fg_color=COLOR_INPUT, text_color="white", placeholder_text="с дд.мм.гггг")
+        self.date_from_entry.pack(side="left", padx=(0, 8))
+        self.date_to_entry = ctk.CTkEntry(filters, height=36, width=110, border_width=0,
+            fg_color=COLOR_INPUT, text_color="white", placeholder_text="по дд.мм.гггг")
+        self.date_to_entry.pack(side="left")
+        for entry in (self.date_from_entry, self.date_to_entry):
+            entry.bind("<KeyRelease>", lambda e: self.schedule_history_search())
+
+        self.search_info = ctk.CTkLabel(parent, text="", text_color=COLOR_TEXT_SUB,
+            font=("Roboto", 11), height=16)
+        self.search_info.pack(anchor="w", padx=5)
+        self.search_job = None
+
         list_card = ctk.CTkFrame(parent, fg_color=COLOR_CARD, corner_radius=15)
         list_card.pack(fill="both", expand=True)
         
-        self.history_scroll = ctk.CTkScrollableFrame(list_card, fg_color="transparent")
-        self.history_scroll.pack(fill="both", expand=True, padx=10, pady=10)
+        self.history_list = VirtualList(list_card, row_height=HISTORY_ROW_HEIGHT,
+            make_row=self.make_history_card, bind_row=self.bind_history_card,
+            empty_text="История пуста. Проведите первый анализ!", fg_color="transparent")
+        self.history_list.pack(fill="both", expand=True, padx=10, pady=10)
+
+    def history_filters(self):
+        # (текст, фильтры) или None, если ничего не задано
+        text = self.search_entry.get().strip()
+        options = {"risk": RISK_FILTERS.get(self.risk_filter.get()),
+                   "zone": ZONE_FILTERS.get(self.zone_filter.get()),
+                   "date_from": parse_filter_date(self.date_from_entry.get()),
+                   "date_to": parse_filter_date(self.date_to_entry.get(), end_of_day=True)}
+        if not text and not any(options.values()):
+            return None
+        return text, options
+
+    def schedule_history_search(self):
+        # Поиск запускается после паузы в наборе, а не на каждую клавишу
+        if self.search_job is not None:
+            self.after_cancel(self.search_job)
+        self.search_job = self.after(HISTORY_SEARCH_DELAY_MS, self.refresh_history_list)
 
     def refresh_history_list(self):
-        for w in self.history_scroll.winfo_children():
-            w.destroy()
-            
-        if not self.history:
-            ctk.CTkLabel(self.history_scroll,
-                text="История пуста. Проведите первый анализ!",
-                text_color="gray", font=("Roboto", 14)).pack(pady=40)
+        # Виджеты не пересоздаются: список лишь получает новый источник данных
+        self.search_job = None
+        if self.history is None:
+            return
+        self.drawn["history"] = self.screen_state("history")
+        filters = self.history_filters()
+        if filters is None:
+            self.search_info.configure(text="")
+            self.history_list.set_source(
+                PagedSource(self.history.page, self.history.count(), HISTORY_PAGE_SIZE))
             return
-            
-        for record in reversed(self.history):
-            self.create_history_card(self.history_scroll, record)
 
-    def create_history_card(self, parent, record):
-        card = ctk.CTkFrame(parent, fg_color=COLOR_INPUT, corner_radius=10)
-        card.pack(fill="x", padx=5, pady=5)
+        text, options = filters
+        started = time.perf_counter()
+        results = self.history.search(text, limit=HISTORY_SEARCH_LIMIT, **options)
+        elapsed = time.perf_counter() - started
+        METRICS.observe("ui.search", elapsed, found=len(results))
+        more = "+" if len(results) >= HISTORY_SEARCH_LIMIT else ""
+        self.search_info.configure(
+            text=f"Найдено: {len(results)}{more} · {elapsed * 1000:.0f} мс")
+        self.history_list.set_source(PagedSource(
+            lambda offset, limit: results[offset:offset + limit], len(results), HISTORY_PAGE_SIZE))
+
+    def make_history_card(self, parent):
+        # Карточка создается один раз и затем переиспользуется для разных записей
+        row  = ctk.CTkFrame(parent, fg_color="transparent")
+        card = ctk.CTkFrame(row, fg_color=COLOR_INPUT, corner_radius=10)
+        card.pack(fill="both", expand=True, padx=5, pady=5)
         
+        # Миниатюра снимка слева; показывается только у визитов со снимком
+        row.thumb_label = ctk.CTkLabel(card, text="", width=THUMB_SIZE, height=THUMB_SIZE,
+            fg_color=COLOR_CARD, corner_radius=6, cursor="hand2")
+        row.thumb_label.bind("<Button-1>", lambda e: self.use_study(row.record))
+        row.image_key = None
+        row.record = None
+
         top = ctk.CTkFrame(card, fg_color="transparent")
         top.pack(fill="x", padx=15, pady=(10, 5))
+        row.top = top
         
-        risk = record.get("risk", "--")
-        risk_color = {"низкий": COLOR_SUCCESS, "средний": COLOR_WARNING, "высокий": COLOR_DANGER}.get(risk, "white")
-        
-        # Дата
-        ctk.CTkLabel(top, text=f"{record.get('date','--')}",
-            font=("Roboto", 13, "bold"), text_color="white").pack(side="left")
-            
-        # Показатели
-        metrics = []
-        if isinstance(record.get('pain_level'), int): metrics.append(f"Боль: {record['pain_level']}/10")
-        if record.get('angle') is not None: metrics.append(f"Угол: {record['angle']}°")
-        
-        ctk.CTkLabel(top, text=" | ".join(metrics),
-            font=("Roboto", 12), text_color=COLOR_TEXT_SUB).pack(side="left", padx=15)
+        row.select_var = ctk.BooleanVar(value=False)
+        row.select_box = ctk.CTkCheckBox(top, text="", width=24, variable=row.select_var,
+            checkbox_width=18, checkbox_height=18, border_width=2)
+        row.select_box.pack(side="left", padx=(0, 6))
+        row.date_label = ctk.CTkLabel(top, text="",
+            font=("Roboto", 13, "bold"), text_color="white")
+        row.date_label.pack(side="left")
+        row.metrics_label = ctk.CTkLabel(top, text="",
+            font=("Roboto", 12), text_color=COLOR_TEXT_SUB)
+        row.metrics_label.pack(side="left", padx=15)
+        row.risk_label = ctk.CTkLabel(top, text="",
+            font=("Roboto", 12, "bold"))
+        row.risk_label.pack(side="right")
+
+        row.dyn_label = ctk.CTkLabel(card, text="", font=("Roboto", 11, "bold"), height=18)
+        row.dyn_label.pack(anchor="w", padx=15)
+
+        row.comment_label = ctk.CTkLabel(card, text="",
+            font=("Roboto", 12), text_color="#90caf9",
+            wraplength=700, justify="left", anchor="nw")
+        row.comment_label.pack(fill="both", expand=True, anchor="w", padx=15, pady=(0, 10))
+        # Двойной щелчок — полное заключение визита в панели результата
+        for widget in (card, row.comment_label, row.dyn_label):
+            widget.bind("<Double-Button-1>", lambda e: self.show_record(row.record))
+        return row
+
+    def bind_history_card(self, row, record):
+        record = record or EMPTY_RECORD
+        view = record_view(record)     # строки и цвета карточки — из кэша представлений
+
+        # Миниатюра: из памяти сразу, иначе загрузится в фоне
+        row.record = record
+        row.image_key = record.image or None
+        if record.image:
+            self.show_thumbnail(row, record.image)
+        elif row.thumb_label.winfo_manager():
+            row.thumb_label.pack_forget()
+
+        # Дата и отметка для пакетного экспорта
+        row.date_label.configure(text=record.date)
+        key = selection_key(record)
+        row.select_var.set(key in self.selected)
+        row.select_box.configure(command=lambda: self.toggle_selected(record, row.select_var.get()))
             
-        ctk.CTkLabel(top, text=f"Риск: {risk.upper()}",
-            font=("Roboto", 12, "bold"), text_color=risk_color).pack(side="right")
-
-        # Динамика
-        dyn = record.get("dynamics", "")
-        if dyn and dyn != "pervichnyy_osmotr":
-            dyn_map = {"uluchshenie": "Улучшение", "uhudshenie": "Ухудшение", "bez_izmeneniy": "Без изменений"}
-            dyn_colors = {"uluchshenie": COLOR_SUCCESS, "uhudshenie": COLOR_DANGER, "bez_izmeneniy": COLOR_WARNING}
-            
-            d_text = dyn_map.get(dyn, dyn)
-            d_color = dyn_colors.get(dyn, "white")
-            
-            ctk.CTkLabel(card, text=f"Динамика: {d_text}",
-                font=("Roboto", 11, "bold"), text_color=d_color).pack(anchor="w", padx=15)
+        # Показатели, риск, динамика и комментарий (обрезан под строку фиксированной высоты)
+        row.metrics_label.configure(text=view.metrics)
+        row.risk_label.configure(text=view.risk_text, text_color=view.risk_color)
+        row.dyn_label.configure(text=view.dynamics_text, text_color=view.dynamics_color)
+        row.comment_label.configure(text=view.comment)
+
+    def show_thumbnail(self, row, digest):
+        if not row.thumb_label.winfo_manager():
+            row.thumb_label.pack(side="left", padx=(10, 0), pady=10, before=row.top)
+        image = self.thumb_images.get(digest)
+        if image is None:
+            thumb = self.images.thumbnail(digest)
+            if thumb is not None:
+                image = ctk.CTkImage(light_image=thumb, dark_image=thumb, size=thumb.size)
+                self.thumb_images.put(digest, image)
+        if image is not None:
+            row.thumb_label.configure(image=image, text="")
+        elif digest in self.thumb_failed:
+            row.thumb_label.configure(image=None, text="нет\nснимка", text_color="gray")
+        else:
+            row.thumb_label.configure(image=None, text="🩻", text_color=COLOR_TEXT_SUB)
+            future = self.images.request_thumbnail(digest)
+            future.add_done_callback(lambda f, d=digest: self.thumb_ready.put((d, f)))
+
+    def poll_thumbnails(self):
+        # Миниатюры, загруженные в фоне, — в карточки, которые все еще их показывают
+        ready = set()
+        while True:
+            try:
+                digest, future = self.thumb_ready.get_nowait()
+            except queue.Empty:
+                break
+            if future.exception() is not None:
+                self.thumb_failed.add(digest)
+            ready.add(digest)
+        if ready:
+            for row in self.history_list.pool:
+                if row.image_key in ready:
+                    self.show_thumbnail(row, row.image_key)
+
+    def use_study(self, record):
+        # Снимок прошлого визита — в форму анализа для повторного исследования
+        path = self.images.path(record.image) if record and record.image else None
+        if path is None:
+            return
+        self.image_path = path
+        self.image_label.configure(text=f"📄 Снимок от {record.date} — подготовка...",
+                                   text_color=COLOR_SUCCESS)
+        self.watch_image(path, self.preprocessor.submit(path))
+        self.select_frame("analysis")
+
+    def show_record(self, record):
+        if record is None or record is EMPTY_RECORD:
+            return
+        self.last_record = record      # «Сохранить Отчет» выгрузит именно этот визит
+        self.last_profile = self.profile
+        self.display_job = None
+        self.select_frame("analysis")
+        self.show_result_text(record_view(record).text)
 
-        # Комментарий
-        comment = record.get("comment", "")
-        if comment:
-            ctk.CTkLabel(card, text=f"{comment}",
-                font=("Roboto", 12), text_color="#90caf9",
-                wraplength=700, justify="left").pack(anchor="w", padx=15, pady=(0, 10))
+    def toggle_selected(self, record, selected):
+        if record is EMPTY_RECORD:
+            return
+        if selected:
+            self.selected[selection_key(record)] = record
+        else:
+            self.selected.pop(selection_key(record), None)
+        count = f" ({len(self.selected)})" if self.selected else ""
+        self.export_selected_btn.configure(text=f"📦 Экспорт выбранных{count}")
+
+    def clear_selection(self):
+        self.selected.clear()
+        self.export_selected_btn.configure(text="📦 Экспорт выбранных")
 
     def clear_history(self):
-        if messagebox.askyesno("Подтверждение", "Вы уверены, что хотите удалить всю историю анализов?"):
-            self.history = []
-            save_json(HISTORY_FILE, self.history)
-            self.refresh_history_list()
+        if self.history is not None and messagebox.askyesno("Подтверждение", "Вы уверены, что хотите удалить всю историю анализов?"):
+            # Список очищается сразу, перечитывается — когда удаление дойдет до базы
+            cleared = self.writer.submit(None, self.history.clear)
+            self.history_list.set_source(PagedSource(lambda offset, limit: [], 0))
+            self.reset_dynamics_view()
+            self.clear_selection()
+            self.after_write(cleared, self.schedule_refresh)
 
     # ─── ЭКРАН 4: ПРОФИЛЬ ──────────────────────────────────────────
     def build_profile_screen(self, parent):
@@ -498,9 +920,6 @@ class SpineApp(ctk.CTk):
             ctk.CTkLabel(ff, text=label, text_color=COLOR_TEXT_SUB, font=("Roboto", 14)).pack(anchor="w", pady=(0,5))
             entry = ctk.CTkEntry(ff, height=40, border_width=0, fg_color=COLOR_INPUT, text_color="white")
             entry.pack(fill="x")
-            
-            if key in self.profile:
-                entry.insert(0, self.profile[key])
             self.profile_entries[key] = entry
             
             input_grid.grid_columnconfigure(c, weight=1)
@@ -512,8 +931,6 @@ class SpineApp(ctk.CTk):
         
         self.history_box = ctk.CTkTextbox(hf, height=130, fg_color=COLOR_INPUT, text_color="white", corner_radius=10)
         self.history_box.pack(fill="both", expand=True)
-        if "history" in self.profile:
-            self.history_box.insert("0.0", self.profile["history"])
             
         # Кнопка сохранения
         ctk.CTkButton(card, text="💾 Сохранить Изменения", command=self.save_profile_data,
@@ -523,7 +940,18 @@ class SpineApp(ctk.CTk):
         self.profile_status = ctk.CTkLabel(card, text="", text_color=COLOR_SUCCESS, font=("Roboto", 14))
         self.profile_status.pack(pady=(0, 20))
 
+    def fill_profile_form(self):
+        for key, entry in self.profile_entries.items():
+            entry.delete(0, "end")
+            if key in self.profile:
+                entry.insert(0, self.profile[key])
+        self.history_box.delete("0.0", "end")
+        if "history" in self.profile:
+            self.history_box.insert("0.0", self.profile["history"])
+
     def save_profile_data(self):
+        if self.writer is None:
+            return
         data = {key: entry.get() for key, entry in self.profile_entries.items()}
         data["history"] = self.history_box.get("0.0", "end").strip()
         
@@ -532,7 +960,9 @@ class SpineApp(ctk.CTk):
         bmi_msg = f" (ИМТ: {bmi})" if bmi else ""
         
         self.profile = data
-        save_json(PROFILE_FILE, data)
+        saved = self.writer.submit(("profile", self.patient_id),
+                                   self.repo.save_profile, self.patient_id, data)
+        self.after_write(saved, self.refresh_patient_menu)
         self.profile_status.configure(text=f"Профиль успешно обновлен{bmi_msg}")
         self.after(3000, lambda: self.profile_status.configure(text=""))
 
@@ -542,7 +972,26 @@ class SpineApp(ctk.CTk):
         if path:
             self.image_path = path
             filename = os.path.basename(path)
-            self.image_label.configure(text=f"📄 {filename}", text_color=COLOR_SUCCESS)
+            self.image_label.configure(text=f"📄 {filename} — подготовка...", text_color=COLOR_SUCCESS)
+            # Подготовка снимка идет в фоне, к моменту анализа он обычно уже готов
+            self.watch_image(path, self.preprocessor.submit(path))
+
+    def watch_image(self, path, future):
+        if not future.done():
+            self.after(100, lambda: self.watch_image(path, future))
+            return
+        if path != self.image_path:
+            return
+        filename = os.path.basename(path)
+        try:
+            prepared = future.result()
+        except Exception as e:
+            self.image_label.configure(text=f"📄 {filename} — ошибка: {e}", text_color=COLOR_DANGER)
+            return
+        self.image_label.configure(
+            text=f"📄 {filename} — {format_bytes(prepared.original_bytes)} → "
+                 f"{format_bytes(len(prepared.data))} (−{format_bytes(prepared.bytes_saved)})",
+            text_color=COLOR_SUCCESS)
 
     def analyze(self):
         symptoms = self.symptom_input.get("0.0", "end").strip()
@@ -552,276 +1001,318 @@ class SpineApp(ctk.CTk):
         if not symptoms and not self.image_path:
             self.show_result_text("⚠️ Пожалуйста, опишите симптомы или загрузите снимок МРТ.")
             return
-            
-        self.analyze_btn.configure(state="disabled", text="Обработка...")
-        self.progress_bar.pack(fill="x", padx=20, pady=(0,5))
-        self.progress_bar.start()
-        
-        self.show_result_text("⏳ Анализ данных нейросетью, пожалуйста подождите...")
-        threading.Thread(target=self.run_analysis, args=(symptoms,), daemon=True).start()
-
-    def build_profile_context(self):
-        p = self.profile
-        lines = []
-        if p.get("name"):      lines.append(f"Имя: {p['name']}")
-        if p.get("age"):       lines.append(f"Возраст: {p['age']} лет")
-        if p.get("height"):    lines.append(f"Рост: {p['height']} см")
-        if p.get("weight"):    lines.append(f"Вес: {p['weight']} кг")
-        
-        bmi = calculate_bmi(p.get("height"), p.get("weight"))
-        if bmi: lines.append(f"Индекс массы тела (ИМТ): {bmi}")
-        
-        if p.get("diagnosis"): lines.append(f"Диагноз: {p['diagnosis']}")
-        if p.get("history"):   lines.append(f"История болезни: {p['history']}")
-        return "\n".join(lines)
-
-    def get_previous_analysis_context(self):
-        if not self.history:
-            return ""
-        last = self.history[-1]
-        lines = ["\nПредыдущий анализ (для оценки динамики):"]
-        lines.append(f"  Дата: {last.get('date','--')}")
-        if last.get("angle") is not None:
-            lines.append(f"  Угол искривления: {last['angle']}")
-        if isinstance(last.get("pain_level"), int):
-            lines.append(f"  Уровень боли: {last['pain_level']}/10")
-        lines.append("Сравни с текущими показателями и укажи динамику.")
-        return "\n".join(lines)
-
-    def run_analysis(self, symptoms):
-        try:
-            profile_ctx   = self.build_profile_context()
-            profile_block = f"\nДанные пациента:\n{profile_ctx}\n" if profile_ctx else ""
-            pain_block    = f"\nУровень боли пациента: {self.pain_level}/10\n" if self.pain_level else ""
-            prev_block    = self.get_previous_analysis_context()
-
-            prompt = f"""Ты опытный врач-вертебролог и рентгенолог.
-{profile_block}{pain_block}{prev_block}
-Текущие жалобы/симптомы: {symptoms}
-
-Твоя задача: Проанализировать данные и снимок (если есть).
-Верни ответ СТРОГО в формате JSON. Никакого текста до или после JSON.
-Все значения в JSON должны быть на русском языке.
-
-Формат JSON:
-{{
-  "ugol_iskrivleniya": <число или null, если по фото/тексту невозможно определить>,
-  "zona_davleniya": "<поясничный отдел / грудной отдел / шейный отдел / null>",
-  "rekomenduemaya_zhostkost": "<мягкий / средний / жесткий / не требуется>",
-  "stepen_riska": "<низкий / средний / высокий>",
-  "srochno_k_vrachu": <true или false>,
-  "uprazhneniya": ["название упражнения 1", "название упражнения 2"],
-  "kommentariy": "<подробное описание проблемы для пациента (на русском)>",
-  "dinamika": "<uluchshenie / uhudshenie / bez_izmeneniy / pervichnyy_osmotr>",
-  "dinamika_kommentariy": "<сравнение с прошлым визитом, если есть данные>",
-  "preduprezhdenie": "Важное напоминание о необходимости очного осмотра."
-}}"""
-
-            if self.image_path:
-                image = Image.open(self.image_path)
-                response = model.generate_content([prompt, image])
-            else:
-                response = model.generate_content(prompt)
-
-            # Безопасное обновление UI из потока
-            self.after(0, lambda: self.process_result(response.text, symptoms))
+        if self.history is None:
+            self.show_result_text("⏳ База пациентов еще загружается, повторите через секунду.")
+            return
 
-        except Exception as e:
-            self.after(0, lambda: self.show_result_text(f"Ошибка соединения или API: {str(e)}"))
+        # Снимок формы и истории: пока анализ в очереди, можно переключить пациента
+        request = AnalysisRequest(symptoms, self.pain_level, self.profile,
+                                  self.image_path, self.history)
+        label = self.profile.get("name") or f"Пациент #{self.patient_id}"
+        try:
+            self.display_job  = self.scheduler.submit(label, request).id
+            self.partial_data = {}
+        except QueueFullError as e:
+            self.show_result_text(f"⚠️ Очередь анализов переполнена: {e}. Дождитесь завершения.")
+            return
 
-    def process_result(self, raw_text, symptoms):
-        self.progress_bar.stop()
-        self.progress_bar.pack_forget()
-        self.analyze_btn.configure(state="normal", text="🔍 Запустить Анализ")
-        
+        self.show_result_text("⏳ Анализ поставлен в очередь, результат появится здесь...")
+        self.update_queue_view()
+
+    def poll_scheduler(self):
+        # Единственная точка, где результаты рабочих потоков попадают в GUI
+        changed = self.scheduler.poll()
+        for job, state, update in changed:
+            if update is not None:
+                # Очередное поле потокового ответа — только для последнего анализа
+                if job.id == self.display_job:
+                    key, value = update
+                    self.partial_data[key] = value
+                    self.display_analysis_result(self.partial_data, job.request.pain_level,
+                                                 streaming=True)
+            elif state == DONE:
+                # Этапы в GUI-потоке — в той же трассе, что и работа в пуле.
+                # Экран результата — только у последнего анализа; остальные
+                # сохраняются в историю с уведомлением над очередью
+                notice = None if job.id == self.display_job else f"#{job.id} {job.label}"
+                with METRICS.tracing(job.trace):
+                    self.process_result(job.result, job.request, notice)
+                    METRICS.observe("analysis.total", time.perf_counter() - job.submitted)
+            elif state == FAILED:
+                if job.id == self.display_job:
+                    self.show_result_text(f"Ошибка соединения или API: {str(job.error)}")
+                else:
+                    self.queue_notice = f"✖ #{job.id} {job.label}: ошибка API — {job.error}"
+        if changed:
+            self.scheduler.forget_finished(keep=QUEUE_VISIBLE_JOBS)
+            self.update_queue_view()
+            stats = self.cache_stats
+            self.cache_label.configure(
+                text=f"Кэш: {stats['hits']} попад. / {stats['misses']} пром.")
+            self.update_api_label()
+        self.poll_exports()
+        self.poll_thumbnails()
+        self.poll_write_errors()
+        self.after(SCHEDULER_POLL_MS, self.poll_scheduler)
+
+    def update_api_label(self):
+        m = model.metrics()
+        text = f"API: {m['succeeded']} ок / {m['retries']} повт. / {m['failed']} ош."
+        if m["breaker"] != "closed":
+            text += "\n⛔ API временно недоступен"
+        elif m["throttled_sec"]:
+            text += f"\nОжидание квоты: {m['throttled_sec']:.0f} с"
+        self.api_label.configure(text=text)
+
+    def update_queue_view(self):
+        for w in self.queue_card.winfo_children():
+            w.destroy()
+        jobs = list(self.scheduler.jobs.values())[-QUEUE_VISIBLE_JOBS:]
+        if not jobs:
+            self.queue_card.pack_forget()
+        else:
+            self.queue_card.pack(fill="x", pady=(0, 15), before=self.result_card)
+
+        state_view = {
+            PENDING:   ("⏸ В очереди",  COLOR_TEXT_SUB),
+            RUNNING:   ("⏳ Выполняется", COLOR_ACCENT),
+            DONE:      ("✔ Готово",     COLOR_SUCCESS),
+            FAILED:    ("✖ Ошибка",     COLOR_DANGER),
+            CANCELLED: ("⊘ Отменен",    "gray"),
+        }
+        for job in jobs:
+            row = ctk.CTkFrame(self.queue_card, fg_color="transparent")
+            row.pack(fill="x", padx=15, pady=2)
+            text, color = state_view[job.state]
+            ctk.CTkLabel(row, text=f"#{job.id}  {job.label}",
+                font=("Roboto", 12), text_color="white").pack(side="left")
+            if job.active:
+                ctk.CTkButton(row, text="Отменить", width=80, height=24,
+                    fg_color="#37474f", hover_color="#455a64", font=("Roboto", 11),
+                    command=lambda j=job.id: self.cancel_job(j)).pack(side="right")
+            ctk.CTkLabel(row, text=text, font=("Roboto", 12, "bold"),
+                text_color=color).pack(side="right", padx=10)
+        if jobs and self.queue_notice:
+            ctk.CTkLabel(self.queue_card, text=self.queue_notice, font=("Roboto", 11),
+                text_color=COLOR_TEXT_SUB, anchor="w", justify="left",
+                wraplength=560).pack(fill="x", padx=15, pady=(2, 8))
+
+        if self.scheduler.active_count():
+            if not self.progress_bar.winfo_manager():
+                self.progress_bar.pack(fill="x", padx=20, pady=(0,5))
+                self.progress_bar.start()
+        else:
+            self.progress_bar.stop()
+            self.progress_bar.pack_forget()
+
+    def cancel_job(self, job_id):
+        self.scheduler.cancel(job_id)
+        self.update_queue_view()
+
+    def process_result(self, raw_text, request, notice=None):
+        # notice — подпись анализа, который уже не на экране (после него запущен
+        # другой): визит только сохраняется, экран результата не трогается
+        history = request.history
         try:
-            clean  = re.sub(r"```json|```", "", raw_text).strip()
-            data   = json.loads(clean)
-            self.last_data = raw_text # Сохраняем оригинал для экспорта
+            with METRICS.span("ui.parse"):
+                result = parse_response(raw_text)
+                record = make_record(result, request)
             
-            # Сохранение в историю
-            record = {
-                "date":             datetime.now().strftime("%d.%m.%Y %H:%M"),
-                "symptoms":         symptoms,
-                "pain_level":       self.pain_level if self.pain_level else "--",
-                "risk":             data.get("stepen_riska", "неизвестно"),
-                "angle":            data.get("ugol_iskrivleniya"),
-                "stiffness":        data.get("rekomenduemaya_zhostkost"),
-                "zone":             data.get("zona_davleniya"),
-                "urgent":           data.get("srochno_k_vrachu", False),
-                "exercises":        data.get("uprazhneniya", []),
-                "comment":          data.get("kommentariy", ""),
-                "dynamics":         data.get("dinamika", "pervichnyy_osmotr"),
-                "dynamics_comment": data.get("dinamika_kommentariy", ""),
-            }
-            self.history.append(record)
-            save_json(HISTORY_FILE, self.history)
+            # Сохранение в историю — в фоне; в список запись попадает после записи в базу
+            saved = self.writer.submit(None, history.append, record)
+            drawn = self.drawn.get("history")
+            if history is not self.history or not drawn or drawn[0] != history.patient_id \
+                    or drawn[2] is not None:
+                drawn = None
+            if notice is not None:
+                self.after_write(saved, lambda: self.background_saved(history, record, drawn,
+                                                                      notice))
+                return
+            self.last_record, self.last_profile = record, request.profile
+            self.after_write(saved, lambda: self.history_saved(history, record, drawn))
             
-            self.display_analysis_result(data)
+            with METRICS.span("ui.render"):
+                self.show_result_text(record_view(record).text)
             
-        except json.JSONDecodeError:
-            self.show_result_text(f"Ошибка чтения ответа от ИИ (не JSON):\n{raw_text}")
+        except RecordError as e:
+            METRICS.count("analysis.bad_response")
+            if notice is not None:
+                self.show_queue_notice(f"✖ {notice}: ошибка чтения ответа от ИИ — {e}")
+            else:
+                self.show_result_text(f"Ошибка чтения ответа от ИИ: {e}\n\n{raw_text}")
         except Exception as e:
-            self.show_result_text(f"Ошибка обработки: {str(e)}")
-
-    def display_analysis_result(self, data):
-        self.result_box.configure(state="normal")
-        self.result_box.delete("0.0", "end")
-        
-        lines = []
-        
-        # Динамика
-        dyn = data.get("dinamika", "pervichnyy_osmotr")
-        if dyn != "pervichnyy_osmotr":
-            dyn_map = {"uluchshenie": "ПОЛОЖИТЕЛЬНАЯ (Улучшение)", 
-                       "uhudshenie": "ОТРИЦАТЕЛЬНАЯ (Ухудшение)", 
-                       "bez_izmeneniy": "БЕЗ ИЗМЕНЕНИЙ"}
-            lines.append("📊 ДИНАМИКА:")
-            lines.append(f"   {dyn_map.get(dyn, dyn)}")
-            if data.get("dinamika_kommentariy"):
-                lines.append(f"   {data.get('dinamika_kommentariy')}")
-            lines.append("-" * 40)
-
-        # Основные данные
-        angle = data.get('ugol_iskrivleniya')
-        angle_str = f"{angle}°" if angle is not None else "Не определен"
-        
-        lines.append(f"📐 Угол искривления:  {angle_str}")
-        lines.append(f"📍 Зона проблемы:     {data.get('zona_davleniya', '—')}")
-        lines.append(f"⚙️ Корсет/Жесткость:  {data.get('rekomenduemaya_zhostkost', '—')}")
-        lines.append(f"⚠️ Степень риска:     {data.get('stepen_riska', '—')}")
-        
-        urgent = data.get('srochno_k_vrachu')
-        urg_str = "🚨 ДА, НУЖЕН ВРАЧ!" if urgent else "Нет, плановый осмотр"
-        lines.append(f"🚑 Срочно к врачу:    {urg_str}")
-        
-        if self.pain_level:
-            lines.append(f"⚡ Уровень боли:      {self.pain_level}/10")
-
-        lines.append("\n" + "─"*30 + "\n")
-        
-        lines.append("🏃 Рекомендуемые упражнения:")
-        for ex in data.get("uprazhneniya", []):
-            lines.append(f"   • {ex}")
-            
-        lines.append("\n💬 Заключение ИИ:")
-        lines.append(data.get('kommentariy', ''))
-        
-        lines.append(f"\nℹ️ ВАЖНО: {data.get('preduprezhdenie', '')}")
-
-        self.result_box.insert("0.0", "\n".join(lines))
-        self.result_box.configure(state="disabled")
+            if notice is not None:
+                self.show_queue_notice(f"✖ {notice}: ошибка обработки — {e}")
+            else:
+                self.show_result_text(f"Ошибка обработки: {str(e)}")
+
+    def background_saved(self, history, record, drawn, notice):
+        self.history_saved(history, record, drawn)
+        self.show_queue_notice(f"✔ {notice}: результат сохранен в историю пациента")
+
+    def show_queue_notice(self, text):
+        self.queue_notice = text
+        self.update_queue_view()
+
+    def history_saved(self, history, record, drawn):
+        # Визит дошел до базы. Если с отрисовки списка без фильтров (и с построения
+        # ряда динамики) других изменений не было, запись встает первой, а точка
+        # дописывается в ряд без перечитывания; иначе экраны перестроятся по ревизии
+        revision = history.revision()
+        if drawn is not None and self.drawn.get("history") == drawn and revision == drawn[1] + 1:
+            self.history_list.insert_front(record)
+            self.drawn["history"] = self.screen_state("history")
+        series = self.series
+        if series is not None and series.key == (history.patient_id, revision - 1):
+            point = chart_point(record)
+            if point:
+                series.append(*point)
+            series.key = (history.patient_id, revision)
+        self.schedule_refresh()
+
+    def display_analysis_result(self, data, pain_level, streaming=False):
+        if streaming:
+            # Поля, которые еще не пришли, показываем многоточием
+            data = {**dict.fromkeys(STREAMED_FIELDS, STREAM_PENDING), **data}
+        self.show_result_text(result_text(data, pain_level, STREAM_PENDING if streaming else None))
 
     def show_result_text(self, text):
-        self.progress_bar.stop()
-        self.progress_bar.pack_forget()
-        self.analyze_btn.configure(state="normal", text="🔍 Запустить Анализ")
         self.result_box.configure(state="normal")
         self.result_box.delete("0.0", "end")
         self.result_box.insert("0.0", text)
         self.result_box.configure(state="disabled")
 
-    # ─── ЭКСПОРТ ОТЧЕТА ────────────────────────────────────────────
+    # ─── ЭКСПОРТ ОТЧЕТОВ ───────────────────────────────────────────
     def export_report(self):
-        if not self.last_data:
+        if not self.last_record:
             messagebox.showwarning("Нет данных", "Сначала проведите анализ.")
             return
-            
-        path = filedialog.asksaveasfilename(
-            defaultextension=".html",
-            filetypes=[("HTML файл", "*.html")],
-            title="Сохранить заключение"
-        )
-        if not path: return
-        
-        try:
-            clean = re.sub(r"```json|```", "", self.last_data).strip()
-            data  = json.loads(clean)
-        except:
+        path = self.ask_report_path("Сохранить заключение")
+        if path:
+            self.submit_export("Заключение", [ExportTask(path, [self.last_record],
+                                                          self.last_profile)])
+
+    def history_report_records(self):
+        # То, что сейчас в списке истории: найденные визиты или вся история
+        filters = self.history_filters()
+        if filters is None:
+            return self.history.records(), "Отчет по истории визитов"
+        text, options = filters
+        return (self.history.search(text, limit=HISTORY_SEARCH_LIMIT, **options),
+                "Отчет по найденным визитам")
+
+    def export_history_report(self):
+        if self.history is None:
+            return
+        records, title = self.history_report_records()
+        if not records:
+            messagebox.showwarning("Нет данных", "Нет визитов для отчета.")
             return
+        path = self.ask_report_path("Сохранить отчет")
+        if path:
+            self.submit_export(title, [ExportTask(path, records, self.profile, title)])
 
-        p = self.profile
-        date_str = datetime.now().strftime("%d.%m.%Y %H:%M")
-        
-        # Подготовка данных для HTML
-        pain_str = f"{self.pain_level}/10" if self.pain_level else "Не указан"
-        urgent_css = "color:red;font-weight:bold" if data.get("srochno_k_vrachu") else "color:green"
-        urgent_txt = "ТРЕБУЕТСЯ ОСМОТР ВРАЧА" if data.get("srochno_k_vrachu") else "Плановый режим"
-        
-        ex_html = "".join(f"<li>{ex}</li>" for ex in data.get("uprazhneniya", []))
-        
-        html = f"""
-        <!DOCTYPE html>
-        <html lang="ru">
-        <head>
-            <meta charset="UTF-8">
-            <title>Медицинское заключение - Spine Advisor</title>
-            <style>
-                body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; max-width: 800px; margin: 40px auto; color: #333; line-height: 1.6; }}
-                .header {{ border-bottom: 3px solid #00b4d8; padding-bottom: 20px; margin-bottom: 30px; }}
-                .header h1 {{ margin: 0; color: #16213e; }}
-                .meta {{ color: #666; font-size: 0.9em; margin-top: 5px; }}
-                .section {{ background: #f9f9f9; padding: 20px; border-radius: 8px; margin-bottom: 20px; }}
-                .section h2 {{ margin-top: 0; color: #00b4d8; font-size: 1.2em; border-bottom: 1px solid #ddd; padding-bottom: 10px; }}
-                .grid {{ display: grid; grid-template-columns: 1fr 1fr; gap: 15px; }}
-                .field {{ margin-bottom: 5px; }}
-                .label {{ font-weight: bold; color: #555; }}
-                .alert {{ background: #fff3e0; border-left: 5px solid #ff9800; padding: 15px; margin: 20px 0; }}
-                .footer {{ text-align: center; font-size: 0.8em; color: #aaa; margin-top: 50px; border-top: 1px solid #eee; padding-top: 20px; }}
-            </style>
-        </head>
-        <body>
-            <div class="header">
-                <h1>Spine Advisor: Заключение ИИ</h1>
-                <div class="meta">Дата анализа: {date_str}</div>
-            </div>
-
-            <div class="section">
-                <h2>Данные пациента</h2>
-                <div class="grid">
-                    <div class="field"><span class="label">ФИО:</span> {p.get('name','—')}</div>
-                    <div class="field"><span class="label">Возраст:</span> {p.get('age','—')}</div>
-                    <div class="field"><span class="label">Рост/Вес:</span> {p.get('height','—')} см / {p.get('weight','—')} кг</div>
-                </div>
-            </div>
-
-            <div class="section">
-                <h2>Результаты диагностики</h2>
-                <div class="grid">
-                    <div class="field"><span class="label">Угол искривления:</span> {data.get('ugol_iskrivleniya','—')}</div>
-                    <div class="field"><span class="label">Зона давления:</span> {data.get('zona_davleniya','—')}</div>
-                    <div class="field"><span class="label">Степень риска:</span> {data.get('stepen_riska','—')}</div>
-                    <div class="field"><span class="label">Уровень боли:</span> {pain_str}</div>
-                </div>
-                <br>
-                <div class="field"><span class="label">Статус:</span> <span style="{urgent_css}">{urgent_txt}</span></div>
-            </div>
-
-            <div class="section">
-                <h2>Рекомендации и Упражнения</h2>
-                <p>{data.get('kommentariy','')}</p>
-                <ul>{ex_html}</ul>
-            </div>
-
-            <div class="alert">
-                <strong>ВАЖНО:</strong> {data.get('preduprezhdenie','Данный отчет сформирован искусственным интеллектом и не является официальным медицинским диагнозом. Обратитесь к врачу.')}
-            </div>
-
-            <div class="footer">
-                Сгенерировано в приложении Spine Advisor v3.1
-            </div>
-        </body>
-        </html>
-        """
-
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(html)
-            
-        # Автооткрытие в браузере (где можно сохранить в PDF через Ctrl+P)
-        import webbrowser
-        webbrowser.open(path)
-        messagebox.showinfo("Готово", "Отчет сохранен!\nОн открыт в браузере.\nНажмите Ctrl+P, чтобы сохранить как PDF.")
+    def export_selected(self):
+        # По файлу на каждый выбранный визит и общий отчет — в выбранную папку
+        if not self.selected:
+            messagebox.showwarning("Нет данных", "Отметьте визиты в истории для экспорта.")
+            return
+        folder = filedialog.askdirectory(title="Папка для отчетов")
+        if not folder:
+            return
+        records = sorted(self.selected.values(), key=lambda r: (chart_point(r) or ("",))[0])
+        self.submit_export(f"Визиты: {len(records)}",
+                           bulk_tasks(records, self.profile, folder, "pdf"))
+
+    def ask_report_path(self, title):
+        return filedialog.asksaveasfilename(defaultextension=".pdf",
+                                            filetypes=EXPORT_FILETYPES, title=title)
+
+    def submit_export(self, label, tasks):
+        try:
+            self.exporter.submit(label, ExportRequest(tasks, PDF_FONT))
+        except QueueFullError as e:
+            messagebox.showwarning("Экспорт", f"Очередь экспорта переполнена: {e}")
+            return
+        self.show_export_progress(f"📄 {label}: в очереди", 0.0)
+
+    def poll_exports(self):
+        # Прогресс и итог экспорта — из того же цикла опроса, что и анализы
+        for job, state, update in self.exporter.poll():
+            if update is not None:
+                done, total, path = update
+                self.show_export_progress(f"📄 {job.label}: {done}/{total}", done / total)
+            elif state == DONE:
+                folder = os.path.dirname(job.result[-1]) if job.result else ""
+                self.show_export_progress(f"✔ Сохранено файлов: {len(job.result)}\n{folder}")
+            elif state == FAILED:
+                self.show_export_progress(f"✖ Экспорт не удался: {job.error}")
+        self.exporter.forget_finished(keep=0)
+
+    def show_export_progress(self, text, fraction=None):
+        self.export_label.configure(text=text)
+        if fraction is None or not self.exporter.active_count():
+            self.export_bar.pack_forget()
+            return
+        self.export_bar.set(fraction)
+        if not self.export_bar.winfo_manager():
+            self.export_bar.pack(fill="x", pady=(4, 0))
+
+    # ─── ПАНЕЛЬ «ЗАМЕРЫ» ───────────────────────────────────────────
+    def open_metrics_panel(self):
+        # Отладочное окно: p50/p95 по этапам анализа из telemetry.METRICS
+        if self.metrics_window is not None and self.metrics_window.winfo_exists():
+            self.metrics_window.focus()
+            return
+        win = ctk.CTkToplevel(self)
+        win.title("Замеры этапов анализа")
+        win.geometry("640x460")
+        win.configure(fg_color=COLOR_BG)
+        self.metrics_text = ctk.CTkTextbox(win, font=("Consolas", 12), fg_color=COLOR_CARD,
+            text_color=COLOR_TEXT_MAIN, wrap="none")
+        self.metrics_text.pack(fill="both", expand=True, padx=15, pady=(15, 8))
+        buttons = ctk.CTkFrame(win, fg_color="transparent")
+        buttons.pack(fill="x", padx=15, pady=(0, 15))
+        ctk.CTkButton(buttons, text="💾 Сохранить трассу", width=160,
+            fg_color=COLOR_ACCENT, hover_color=COLOR_ACCENT_HOVER,
+            command=self.save_trace).pack(side="left")
+        ctk.CTkButton(buttons, text="Сбросить", width=100, fg_color="#37474f",
+            hover_color="#455a64", command=METRICS.reset).pack(side="left", padx=10)
+        self.metrics_window = win
+        self.refresh_metrics_panel()
+
+    def refresh_metrics_panel(self):
+        if self.metrics_window is None or not self.metrics_window.winfo_exists():
+            self.metrics_window = None
+            return
+        lines = [f"{'Этап':<22}{'n':>6}{'p50, мс':>10}{'p95, мс':>10}{'макс, мс':>11}"]
+        for name, st in METRICS.stats().items():
+            lines.append(f"{name:<22}{st['count']:>6}{st['p50'] * 1000:>10.1f}"
+                         f"{st['p95'] * 1000:>10.1f}{st['max'] * 1000:>11.1f}")
+        counters = METRICS.counters()
+        if counters:
+            lines += ["", "Счетчики:"] + [f"  {k:<20}{v:>8}" for k, v in counters.items()]
+        self.metrics_text.configure(state="normal")
+        self.metrics_text.delete("0.0", "end")
+        self.metrics_text.insert("0.0", "\n".join(lines))
+        self.metrics_text.configure(state="disabled")
+        self.metrics_window.after(METRICS_REFRESH_MS, self.refresh_metrics_panel)
+
+    def save_trace(self):
+        path = filedialog.asksaveasfilename(parent=self.metrics_window, defaultextension=".json",
+            filetypes=[("Trace Event JSON", "*.json")],
+            initialfile=f"spine_trace_{datetime.now():%Y%m%d_%H%M}.json")
+        if not path:
+            return
+        try:
+            n = METRICS.dump_trace(path)
+        except OSError as e:
+            messagebox.showerror("Трасса", f"Не удалось сохранить файл:\n{e}")
+            return
+        messagebox.showinfo("Трасса", f"Сохранено спанов: {n}\n"
+            "Файл открывается в chrome://tracing или ui.perfetto.dev")
 
 if __name__ == "__main__":
+    process_umask()         # маска процесса читается, пока нет других потоков (см. export.py)
     app = SpineApp()
     app.mainloop()
\ No newline at end of file
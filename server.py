@@ -0,0 +1,78 @@
+import argparse
+import asyncio
+import sys
+
+from spine_core.backends import create_backend
+from spine_core.config import (API_KEY, MODEL_NAME, MODEL_BACKEND, RESILIENCE_CONFIG, DB_FILE,
+                               RESPONSE_CACHE_FILE, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_SEC,
+                               IMAGE_CACHE_DIR, IMAGE_CONFIG, IMAGE_STORE_DIR, THUMB_SIZE,
+                               PDF_FONT, SERVICE_HOST, SERVICE_PORT, SERVICE_WORKERS, TRACE_FILE)
+from spine_core.image_store import ImageStore
+from spine_core.imaging import ImagePreprocessor
+from spine_core.repository import PatientRepository
+from spine_core.resilience import ResilientBackend
+from spine_core.response_cache import ResponseCache
+from spine_core.service import AnalysisService
+from spine_core.telemetry import METRICS
+
+# ─── ЛОКАЛЬНЫЙ HTTP-СЕРВИС АНАЛИЗА ─────────────────────────────────
+# Один процесс с базой пациентов и клиентом модели обслуживает несколько
+# рабочих мест по HTTP (адреса — в spine_core/service.py).
+#
+#   python server.py --port 8765
+#   python server.py --backend fake --db /tmp/demo.db      # без ключа и сети
+#   python server.py --trace service.trace.json            # замеры этапов при выходе
+#
+#   curl -X POST localhost:8765/patients/1/analyze \
+#        -d '{"symptoms": "Боль в пояснице", "pain_level": 6}'
+#   curl "localhost:8765/patients/1/export?format=pdf" -o report.pdf
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP-сервис анализа для нескольких рабочих мест")
+    parser.add_argument("--host", default=SERVICE_HOST, help="адрес (по умолчанию %(default)s)")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT, help="порт (по умолчанию %(default)s)")
+    parser.add_argument("--db", default=DB_FILE, help="база пациентов (по умолчанию %(default)s)")
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS,
+                        help="одновременных анализов и отчетов")
+    parser.add_argument("--no-cache", action="store_true", help="не использовать кэш ответов")
+    parser.add_argument("--backend", choices=("gemini", "fake"), default=MODEL_BACKEND,
+                        help="бэкенд модели (по умолчанию %(default)s)")
+    parser.add_argument("--trace", default=TRACE_FILE,
+                        help="сохранить замеры этапов в файл Trace Event JSON при выходе")
+    args = parser.parse_args(argv)
+
+    repo = PatientRepository(args.db)
+    if repo.is_empty():
+        repo.create_patient({})
+    cache = None if args.no_cache else ResponseCache(RESPONSE_CACHE_FILE, RESPONSE_CACHE_SIZE,
+                                                     RESPONSE_CACHE_TTL_SEC)
+    preprocessor = ImagePreprocessor(IMAGE_CACHE_DIR, IMAGE_CONFIG, workers=args.workers)
+    backend = ResilientBackend(create_backend(args.backend, API_KEY, MODEL_NAME), RESILIENCE_CONFIG)
+    service = AnalysisService(repo, backend, cache, preprocessor,
+                              ImageStore(IMAGE_STORE_DIR, THUMB_SIZE),
+                              workers=args.workers, font_path=PDF_FONT)
+
+    async def serve():
+        await service.start(args.host, args.port)
+        print(f"Spine Advisor: http://{args.host}:{service.port} (бэкенд {args.backend})")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await service.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        preprocessor.shutdown()
+        service.images.shutdown()
+        repo.close()
+        if args.trace:
+            METRICS.dump_trace(args.trace)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,3 @@
+# Ядро Spine Advisor без зависимости от Tk: построение запроса, разбор ответа,
+# хранилища и отчеты. Тяжелые библиотеки (Pillow, numpy, google.generativeai)
+# импортируются модулями лениво — только когда действительно нужны.
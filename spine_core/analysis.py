@@ -0,0 +1,212 @@
+import io
+import time
+from datetime import datetime
+
+from .config import (PROMPT_TOKEN_BUDGET, SYMPTOMS_MAX_CHARS, DIAGNOSIS_MAX_CHARS,
+                     ANAMNESIS_MAX_CHARS)
+from .context import ContextBlock, StaticSegment, fit_blocks
+from .records import AnalysisResult, VisitRecord
+from .response_cache import request_key
+from .streaming import IncrementalJSONParser, iter_text
+from .telemetry import METRICS
+
+# ─── ПОСТРОЕНИЕ ЗАПРОСА К МОДЕЛИ ───────────────────────────────────
+# Функции не зависят от Tk: все, что нужно для анализа, передается
+# снимком AnalysisRequest, поэтому их можно вызывать из рабочих потоков.
+
+
+def calculate_bmi(height_cm, weight_kg):
+    try:
+        h_m = float(height_cm) / 100
+        w = float(weight_kg)
+        bmi = w / (h_m ** 2)
+        return round(bmi, 1)
+    except (ValueError, ZeroDivisionError, TypeError):
+        return None
+
+
+class AnalysisRequest:
+    # Снимок состояния формы на момент нажатия «Запустить Анализ»
+    def __init__(self, symptoms, pain_level, profile, image_path, history):
+        self.symptoms   = symptoms
+        self.pain_level = pain_level
+        self.profile    = dict(profile)
+        self.image_path = image_path
+        self.history    = history
+        self.image_id   = None      # хэш снимка в ImageStore — заполняет run_analysis
+
+
+def build_profile_context(p):
+    # Короткие анкетные данные; диагноз и анамнез — отдельными блоками в build_prompt
+    lines = []
+    if p.get("name"):      lines.append(f"Имя: {p['name']}")
+    if p.get("age"):       lines.append(f"Возраст: {p['age']} лет")
+    if p.get("height"):    lines.append(f"Рост: {p['height']} см")
+    if p.get("weight"):    lines.append(f"Вес: {p['weight']} кг")
+
+    bmi = calculate_bmi(p.get("height"), p.get("weight"))
+    if bmi: lines.append(f"Индекс массы тела (ИМТ): {bmi}")
+    return "\n".join(lines)
+
+
+def get_previous_analysis_context(history):
+    tail = history.last()
+    if not tail:
+        return ""
+    last = tail[0]
+    lines = ["\nПредыдущий анализ (для оценки динамики):"]
+    lines.append(f"  Дата: {last.date}")
+    if last.angle is not None:
+        lines.append(f"  Угол искривления: {last.angle:g}")
+    if last.pain_level is not None:
+        lines.append(f"  Уровень боли: {last.pain_level}/10")
+    lines.append("Сравни с текущими показателями и укажи динамику.")
+    return "\n".join(lines)
+
+
+PROMPT_HEADER = "Ты опытный врач-вертебролог и рентгенолог.\n"
+
+# Инструкция и схема ответа не зависят от пациента — собираются один раз
+PROMPT_SCHEMA = StaticSegment("""
+Твоя задача: Проанализировать данные и снимок (если есть).
+Верни ответ СТРОГО в формате JSON. Никакого текста до или после JSON.
+Все значения в JSON должны быть на русском языке.
+
+Формат JSON:
+{
+  "ugol_iskrivleniya": <число или null, если по фото/тексту невозможно определить>,
+  "zona_davleniya": "<поясничный отдел / грудной отдел / шейный отдел / null>",
+  "rekomenduemaya_zhostkost": "<мягкий / средний / жесткий / не требуется>",
+  "stepen_riska": "<низкий / средний / высокий>",
+  "srochno_k_vrachu": <true или false>,
+  "uprazhneniya": ["название упражнения 1", "название упражнения 2"],
+  "kommentariy": "<подробное описание проблемы для пациента (на русском)>",
+  "dinamika": "<uluchshenie / uhudshenie / bez_izmeneniy / pervichnyy_osmotr>",
+  "dinamika_kommentariy": "<сравнение с прошлым визитом, если есть данные>",
+  "preduprezhdenie": "Важное напоминание о необходимости очного осмотра."
+}""")
+
+
+def build_prompt_blocks(request):
+    # Приоритет 0 — не трогается; чем больше число, тем раньше блок урезается
+    p = request.profile
+    profile_ctx = build_profile_context(p)
+    has_profile = profile_ctx or p.get("diagnosis") or p.get("history")
+    pain = f"\nУровень боли пациента: {request.pain_level}/10\n" if request.pain_level else ""
+    return [
+        ContextBlock("header",    PROMPT_HEADER, required=True),
+        ContextBlock("profile",   f"\nДанные пациента:\n{profile_ctx}\n" if has_profile else "",
+                     priority=2),
+        ContextBlock("diagnosis", f"Диагноз: {p['diagnosis']}\n" if p.get("diagnosis") else "",
+                     priority=3, max_chars=DIAGNOSIS_MAX_CHARS),
+        ContextBlock("anamnesis", f"История болезни: {p['history']}\n" if p.get("history") else "",
+                     priority=4, max_chars=ANAMNESIS_MAX_CHARS),
+        ContextBlock("pain",      pain, priority=1),
+        ContextBlock("trend",     request.history.trend().prompt_block(), priority=3),
+        ContextBlock("previous",  get_previous_analysis_context(request.history), priority=2),
+        ContextBlock("symptoms",  f"\nТекущие жалобы/симптомы: {request.symptoms}\n",
+                     priority=1, required=True, max_chars=SYMPTOMS_MAX_CHARS),
+        PROMPT_SCHEMA.block("schema"),
+    ]
+
+
+def build_prompt(request, budget=None):
+    # Промпт в пределах бюджета токенов (по умолчанию PROMPT_TOKEN_BUDGET из config.py)
+    text, _ = fit_blocks(build_prompt_blocks(request),
+                         PROMPT_TOKEN_BUDGET if budget is None else budget)
+    return text
+
+
+def parse_response(raw_text):
+    # AnalysisResult или RecordError (подкласс ValueError) с понятным описанием
+    return AnalysisResult.parse(raw_text)
+
+
+def make_record(result, request):
+    # Запись истории из разобранного ответа модели
+    return VisitRecord(
+        date             = datetime.now().strftime("%d.%m.%Y %H:%M"),
+        symptoms         = request.symptoms,
+        pain_level       = request.pain_level or None,
+        risk             = result.risk or "неизвестно",
+        angle            = result.angle,
+        stiffness        = result.stiffness,
+        zone             = result.zone,
+        urgent           = result.urgent,
+        exercises        = result.exercises,
+        comment          = result.comment,
+        dynamics         = result.dynamics,
+        dynamics_comment = result.dynamics_comment,
+        warning          = result.warning,
+        image            = request.image_id or "",
+    )
+
+
+def call_model(backend, contents, on_field=None):
+    # Если задан on_field, ответ читается потоком и on_field(ключ, значение)
+    # вызывается для каждого поля JSON, как только оно пришло целиком
+    if not on_field:
+        with METRICS.span("analysis.model", stream=False):
+            return backend.generate_content(contents).text
+    parser, parts = IncrementalJSONParser(), []
+    with METRICS.span("analysis.model", stream=True):
+        started = time.perf_counter()
+        for chunk in iter_text(backend.generate_content(contents, stream=True)):
+            if not parts:
+                # Сколько пользователь ждет первых полей на экране
+                METRICS.observe("analysis.first_chunk", time.perf_counter() - started)
+            parts.append(chunk)
+            for field in parser.feed(chunk):
+                on_field(*field)
+    return "".join(parts)
+
+
+def run_analysis(request, backend, cache=None, preprocessor=None, on_field=None, images=None):
+    # Выполняется в рабочем потоке планировщика; возвращает сырой текст ответа.
+    # backend — любой объект из backends.py (или совместимый с ним).
+    # images — ImageStore: исходный снимок сохраняется в нем и связывается с визитом.
+    with METRICS.span("analysis.prompt"):
+        prompt = build_prompt(request)
+    image_bytes, prepared = None, None
+    if request.image_path:
+        with METRICS.span("analysis.image"):
+            if preprocessor:
+                # Снимок обычно уже подготовлен в фоне при загрузке — здесь берется готовый
+                prepared = preprocessor.submit(request.image_path).result()
+                image_bytes = prepared.data
+            else:
+                with open(request.image_path, "rb") as f:
+                    image_bytes = f.read()
+            if images:
+                request.image_id = images.add(request.image_path,
+                                              prepared and prepared.file_hash)
+
+    key = request_key(prompt, image_bytes) if cache else None
+    if cache:
+        with METRICS.span("analysis.cache"):
+            cached = cache.get(key)
+        METRICS.count("cache.miss" if cached is None else "cache.hit")
+        if cached is not None:
+            if on_field:
+                for field in IncrementalJSONParser().feed(cached):
+                    on_field(*field)
+            return cached
+
+    if prepared:
+        contents = [prompt, prepared.as_part()]
+    elif image_bytes:
+        from PIL import Image
+        contents = [prompt, Image.open(io.BytesIO(image_bytes))]
+    else:
+        contents = prompt
+
+    text = call_model(backend, contents, on_field)
+
+    # В кэш попадают только ответы, которые удалось разобрать
+    if cache:
+        try:
+            parse_response(text)
+            cache.put(key, text)
+        except ValueError:
+            pass
+    return text
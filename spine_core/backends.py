@@ -0,0 +1,101 @@
+import json
+import random
+import threading
+import time
+
+from .streaming import MockStreamingModel
+
+# ─── БЭКЕНДЫ МОДЕЛИ ────────────────────────────────────────────────
+# run_analysis не знает, кто отвечает на запрос: ему нужен объект с методом
+# generate_content(contents, stream=False), который возвращает ответ с полем
+# text, а при stream=True — итерируемые куски с полем text (как у Gemini).
+#   GeminiBackend — настоящая модель, клиент создается при первом запросе;
+#   FakeBackend   — локальная заглушка для нагрузочных тестов и бенчмарка.
+
+
+class BackendError(RuntimeError):
+    # retryable — стоит ли повторять запрос; retry_after — через сколько секунд
+    def __init__(self, message, retryable=True, retry_after=None):
+        super().__init__(message)
+        self.retryable   = retryable
+        self.retry_after = retry_after
+
+
+def create_model(api_key, model_name):
+    import google.generativeai as genai
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(model_name)
+
+
+class GeminiBackend:
+    # Клиент Gemini (и сам пакет google.generativeai) создается при первом запросе,
+    # а не при запуске приложения
+    def __init__(self, api_key, model_name):
+        self.api_key    = api_key
+        self.model_name = model_name
+        self._model     = None
+        self._lock      = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._model is None:
+                self._model = create_model(self.api_key, self.model_name)
+            return self._model
+
+    def generate_content(self, *args, **kwargs):
+        return self.get().generate_content(*args, **kwargs)
+
+
+FAKE_RESPONSE = {
+    "ugol_iskrivleniya": 14,
+    "zona_davleniya": "Поясничный отдел (L4-L5)",
+    "rekomenduemaya_zhostkost": "Полужесткий корсет",
+    "stepen_riska": "Средняя",
+    "srochno_k_vrachu": False,
+    "dinamika": "bez_izmeneniy",
+    "dinamika_kommentariy": "Показатели на уровне прошлого визита",
+    "uprazhneniya": ["Планка 3×30 с", "Кошка-верблюд 2×10", "Растяжка на фитболе 5 минут"],
+    "kommentariy": "Тестовый ответ локального бэкенда.",
+    "preduprezhdenie": "Это не медицинский диагноз.",
+}
+
+
+class FakeBackend(MockStreamingModel):
+    # Отвечает заготовленным JSON без сети: задержка latency ± jitter секунд,
+    # доля ошибок error_rate (BackendError, с подсказкой retry_after, если задана).
+    # response — словарь или строка.
+    def __init__(self, response=None, latency=0.0, jitter=0.0, error_rate=0.0,
+                 chunk_size=32, seed=None, retry_after=None):
+        if response is None:
+            response = FAKE_RESPONSE
+        if not isinstance(response, str):
+            response = "```json\n" + json.dumps(response, ensure_ascii=False, indent=2) + "\n```"
+        super().__init__(response, chunk_size=chunk_size)
+        self.latency    = latency
+        self.jitter     = jitter
+        self.error_rate = error_rate
+        self.errors     = 0
+        self.retry_after = retry_after
+        self._random    = random.Random(seed)
+        self._lock      = threading.Lock()
+
+    def generate_content(self, contents, stream=False):
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            fail  = self._random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise BackendError("Тестовая ошибка бэкенда", retry_after=self.retry_after)
+        return self.respond(stream)
+
+
+def create_backend(name, api_key=None, model_name=None, **options):
+    if name == "gemini":
+        return GeminiBackend(api_key, model_name)
+    if name == "fake":
+        return FakeBackend(**options)
+    raise ValueError(f"Неизвестный бэкенд модели: {name}")
@@ -0,0 +1,72 @@
+import os
+
+from .imaging import PreprocessConfig
+from .resilience import ResilienceConfig
+
+# ─── КОНФИГУРАЦИЯ ──────────────────────────────────────────────────
+# Общие настройки для окна приложения и пакетного режима (batch.py)
+
+# Ключ можно задать переменной окружения GEMINI_API_KEY
+API_KEY    = os.environ.get("GEMINI_API_KEY", "YOUR-GEMINI-AI API KEY") # Замените на свой ключ, если этот не работает
+MODEL_NAME = "gemini-3-flash-preview" # Используем актуальную модель
+# "gemini" — настоящая модель, "fake" — локальная заглушка без сети (см. backends.py)
+MODEL_BACKEND = os.environ.get("SPINE_BACKEND", "gemini")
+
+DB_FILE      = "spine.db"
+# Старые однопациентные файлы — импортируются в базу при первом запуске
+PROFILE_FILE = "profile.json"
+HISTORY_FILE = "history.json"
+HISTORY_LOG  = "history.jsonl"
+
+# Кэш ответов модели для одинаковых запросов (текст + снимок)
+RESPONSE_CACHE_FILE    = "response_cache.db"
+RESPONSE_CACHE_SIZE    = 500
+RESPONSE_CACHE_TTL_SEC = 7 * 24 * 3600
+
+# Бюджет промпта (оценка в токенах) и до скольких символов можно сократить
+# свободный текст, если промпт в бюджет не помещается (см. context.py)
+PROMPT_TOKEN_BUDGET = 1500
+SYMPTOMS_MAX_CHARS  = 1500
+DIAGNOSIS_MAX_CHARS = 300
+ANAMNESIS_MAX_CHARS = 400
+
+# Повторы, квоты и «предохранитель» для запросов к модели (см. resilience.py)
+RESILIENCE_CONFIG = ResilienceConfig(
+    attempts=4,                 # всего попыток на один анализ
+    base_delay=1.0,             # первая пауза перед повтором, с (дальше ×2)
+    max_delay=30.0,
+    requests_per_minute=30,     # квоты тарифа; 0 — без ограничения
+    tokens_per_minute=250_000,
+    breaker_threshold=5,        # ошибок подряд, после которых запросы сразу отклоняются
+    breaker_cooldown=30.0,      # ...на столько секунд
+)
+
+# Читать ответ модели потоком и показывать поля результата по мере прихода
+STREAM_RESPONSES = True
+
+# Шрифт TrueType с кириллицей для PDF-отчетов; пусто — DejaVu из matplotlib
+# или системный (см. pdf.py)
+PDF_FONT = os.environ.get("SPINE_PDF_FONT") or None
+
+# Исходные снимки исследований (по хэшу содержимого) и их миниатюры
+IMAGE_STORE_DIR   = "studies"
+THUMB_SIZE        = 96                 # px по длинной стороне
+THUMB_CACHE_BYTES = 8 * 1024 * 1024    # миниатюры в памяти
+
+# Файл трассы замеров (Trace Event JSON, см. telemetry.py) — пишется при выходе
+TRACE_FILE = os.environ.get("SPINE_TRACE") or None
+
+# Локальный HTTP-сервис анализа (server.py) для нескольких рабочих мест
+SERVICE_HOST    = os.environ.get("SPINE_HOST", "127.0.0.1")
+SERVICE_PORT    = int(os.environ.get("SPINE_PORT", "8765"))
+SERVICE_WORKERS = 4                   # одновременных анализов и отчетов
+
+# Подготовка снимков перед отправкой в модель
+IMAGE_CACHE_DIR = "image_cache"
+IMAGE_CONFIG    = PreprocessConfig(
+    max_edge=1536,      # длинная сторона после уменьшения, px
+    grayscale=True,     # МРТ и так монохромные — экономим объем
+    crop=None,          # (left, top, right, bottom) в долях кадра, если нужна обрезка
+    fmt="JPEG",
+    quality=85,
+)
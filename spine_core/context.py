@@ -0,0 +1,98 @@
+import logging
+import re
+
+# ─── СБОРКА КОНТЕКСТА ПРОМПТА В ПРЕДЕЛАХ БЮДЖЕТА ───────────────────
+# Промпт собирается из блоков с приоритетом (0 — самый важный). Если оценка
+# длины превышает бюджет токенов, блоки с наименьшим приоритетом сначала
+# сокращаются до max_chars (если это разрешено), затем выбрасываются целиком.
+# Обязательные блоки (required) только сокращаются. Порядок блоков в тексте
+# не меняется. Размер каждого промпта пишется в лог "spine_core.context".
+
+CHARS_PER_TOKEN = 3         # русский текст: ~3 символа на токен у Gemini
+
+log = logging.getLogger(__name__)
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1 if text else 0
+
+
+def shorten(text, max_chars):
+    # «Сводка» без модели: схлопываем пробелы и обрезаем по границе слова
+    text = re.sub(r"\s+", " ", text).strip()
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0]
+    return cut.rstrip(" ,.;:") + "…"
+
+
+class ContextBlock:
+    def __init__(self, name, text, priority=0, required=False, max_chars=None, tokens=None):
+        self.name      = name
+        self.text      = text
+        self.priority  = priority
+        self.required  = required
+        self.max_chars = max_chars      # до скольких символов можно сократить; None — нельзя
+        self.tokens    = estimate_tokens(text) if tokens is None else tokens
+        self.state     = "full"         # full / short / dropped
+
+    def shorten(self):
+        # Переводы строк по краям блока сохраняются, чтобы не склеить его с соседями
+        lead, body, trail = re.match(r"(\s*)(.*?)(\s*)$", self.text, re.S).groups()
+        short = lead + shorten(body, self.max_chars) + trail
+        self.text, self.tokens, self.state = short, estimate_tokens(short), "short"
+
+
+class StaticSegment:
+    # Неизменная часть промпта (инструкция и схема JSON): текст и его оценка
+    # считаются один раз при загрузке модуля, а не на каждый запрос
+    def __init__(self, text):
+        self.text   = text
+        self.tokens = estimate_tokens(text)
+
+    def block(self, name):
+        return ContextBlock(name, self.text, required=True, tokens=self.tokens)
+
+
+class PromptStats:
+    def __init__(self, budget, original, blocks):
+        self.budget   = budget
+        self.original = original
+        self.tokens   = sum(b.tokens for b in blocks if b.state != "dropped")
+        self.short    = [b.name for b in blocks if b.state == "short"]
+        self.dropped  = [b.name for b in blocks if b.state == "dropped"]
+
+    def __str__(self):
+        text = f"промпт ~{self.tokens} ток. (было {self.original}, бюджет {self.budget})"
+        if self.short:
+            text += f", сокращено: {', '.join(self.short)}"
+        if self.dropped:
+            text += f", убрано: {', '.join(self.dropped)}"
+        return text
+
+
+def fit_blocks(blocks, budget):
+    # Возвращает (текст, PromptStats); блоки изменяются на месте
+    blocks   = [b for b in blocks if b.text]
+    original = sum(b.tokens for b in blocks)
+    total    = original
+    # Шаги урезания — от наименее важных блоков; каждый сначала сокращается, потом выбрасывается
+    steps = [(b, "short") for b in blocks if b.max_chars] + \
+            [(b, "dropped") for b in blocks if not b.required]
+    steps.sort(key=lambda step: (-step[0].priority, step[1] == "dropped"))
+    for block, action in steps:
+        if not budget or total <= budget:
+            break
+        if block.state == "dropped":
+            continue
+        before = block.tokens
+        if action == "short" and block.state == "full":
+            block.shorten()
+            total -= before - block.tokens
+        elif action == "dropped":
+            block.state = "dropped"
+            total -= before
+
+    stats = PromptStats(budget, original, blocks)
+    log.info(stats)
+    return "".join(b.text for b in blocks if b.state != "dropped"), stats
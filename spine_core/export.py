@@ -0,0 +1,111 @@
+import os
+import re
+import tempfile
+import threading
+
+from .report import (render_history_pdf, render_history_report, render_html_report,
+                     render_pdf_report)
+
+# ─── ЭКСПОРТ ОТЧЕТОВ В ФАЙЛЫ ───────────────────────────────────────
+# Отчет (HTML или PDF — по расширению файла) формируется и пишется без
+# браузера и без Tk, поэтому экспорт выполняется в пуле планировщика
+# (scheduler.py): run_export получает ExportRequest и после каждого файла
+# сообщает прогресс (готово, всего, путь). Файл сначала пишется во временный
+# рядом с целевым и затем переименовывается — недописанных отчетов не бывает.
+
+FORMATS = ("pdf", "html")
+
+_umask      = None
+_umask_lock = threading.Lock()
+
+
+class ExportTask:
+    # Один файл: заключение по визиту или отчет по нескольким визитам (title задан)
+    def __init__(self, path, records, profile, title=None):
+        self.path    = path
+        self.records = list(records)
+        self.profile = profile
+        self.title   = title
+
+    @property
+    def fmt(self):
+        return os.path.splitext(self.path)[1].lower().lstrip(".") or "html"
+
+
+class ExportRequest:
+    def __init__(self, tasks, font_path=None):
+        self.tasks     = list(tasks)
+        self.font_path = font_path      # None — шрифт ищется автоматически (pdf.find_fonts)
+
+
+def render(task, font_path=None):
+    if task.fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат отчета: .{task.fmt}")
+    if task.title is None:
+        record = task.records[0]
+        if task.fmt == "pdf":
+            return render_pdf_report(record, task.profile, font_path)
+        return render_html_report(record, task.profile)
+    if task.fmt == "pdf":
+        return render_history_pdf(task.records, task.profile, task.title, font_path=font_path)
+    return render_history_report(task.records, task.profile, task.title)
+
+
+def process_umask():
+    # mkstemp создает файл с правами 0600; готовому отчету нужны обычные права по
+    # umask. Прочитать маску можно только заменив ее, а она общая для всего
+    # процесса, — поэтому один раз, под блокировкой и на время чтения строгая
+    # 077, а не 0. main вызывает это при запуске, до рабочих потоков
+    global _umask
+    with _umask_lock:
+        if _umask is None:
+            _umask = os.umask(0o077)
+            os.umask(_umask)
+        return _umask
+
+
+def write_atomic(path, data):
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=".export-", dir=folder)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data.encode("utf-8") if isinstance(data, str) else data)
+        os.chmod(tmp, 0o666 & ~process_umask())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def run_export(request, report=None):
+    # Выполняется в рабочем потоке; возвращает список записанных путей
+    written = []
+    total = len(request.tasks)
+    for task in request.tasks:
+        write_atomic(task.path, render(task, request.font_path))
+        written.append(task.path)
+        if report:
+            report((len(written), total, task.path))
+    return written
+
+
+def visit_filename(record, fmt, taken):
+    # «visit_25_02_2026_15_14.pdf»; при совпадении дат — суффикс _2, _3...
+    stem = "visit_" + (re.sub(r"\W+", "_", record.date).strip("_") or "unknown")
+    name, n = f"{stem}.{fmt}", 1
+    while name in taken:
+        n += 1
+        name = f"{stem}_{n}.{fmt}"
+    taken.add(name)
+    return name
+
+
+def bulk_tasks(records, profile, folder, fmt="pdf", summary_title="Отчет по выбранным визитам"):
+    # По файлу на каждый визит и общий отчет по всем — для пакетного экспорта
+    records, taken = list(records), set()
+    tasks = [ExportTask(os.path.join(folder, visit_filename(r, fmt, taken)), [r], profile)
+             for r in records]
+    if summary_title and len(records) > 1:
+        tasks.append(ExportTask(os.path.join(folder, f"summary.{fmt}"), records, profile,
+                                summary_title))
+    return tasks
@@ -0,0 +1,141 @@
+import json
+import logging
+import os
+import threading
+
+from .records import RecordError, VisitRecord
+
+# ─── ХРАНИЛИЩЕ ИСТОРИИ (JSON Lines) ────────────────────────────────
+# Каждая запись — одна строка JSON. Добавление не переписывает файл целиком:
+# строка дописывается в конец и сбрасывается на диск через fsync.
+# Полная перезапись (очистка, удаление битых строк) делается атомарно
+# через временный файл и os.replace. Недописанной после сбоя считается
+# только последняя строка, которая не разбирается как JSON, — ее отбрасываем.
+# Остальные непрочитанные строки (и записи старого history.json) не теряются:
+# они переносятся в файл <path>.rejected и пишутся в лог "spine_core.history_store".
+# Приложение хранит визиты в SQLite (repository.py); этот файл читается только
+# при разовой миграции (PatientRepository.migrate_from_json), так что разбор
+# битых строк защищает именно ее: при переносе ничего не теряется молча.
+
+log = logging.getLogger(__name__)
+
+
+class HistoryStore:
+    def __init__(self, path, legacy_path=None):
+        self.path        = path
+        self.legacy_path = legacy_path
+        self._records    = None
+        self._lock       = threading.Lock()
+
+    # ─── Чтение ────────────────────────────────────────────────────
+    def _ensure_loaded(self):
+        if self._records is not None:
+            return
+        if not os.path.exists(self.path) and self.legacy_path and os.path.exists(self.legacy_path):
+            self._import_legacy()
+            return
+
+        records, rejected, torn = [], [], False
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                lines = [line.strip() for line in f if line.strip()]
+            for n, line in enumerate(lines, 1):
+                try:
+                    records.append(VisitRecord.from_json(line))
+                except json.JSONDecodeError as e:
+                    if n == len(lines):
+                        # Недописанная строка после сбоя — отбрасываем
+                        log.warning("%s: отброшена недописанная последняя строка", self.path)
+                        torn = True
+                    else:
+                        log.warning("%s, строка %d: %s", self.path, n, e)
+                        rejected.append(line)
+                except RecordError as e:
+                    log.warning("%s, строка %d: %s", self.path, n, e)
+                    rejected.append(line)
+        self._records = records
+        if rejected:
+            self._reject(rejected)
+        if torn or rejected:
+            self._rewrite(records)
+
+    def _import_legacy(self):
+        # Разовый импорт старого формата history.json (один JSON-массив)
+        try:
+            with open(self.legacy_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            data = []
+        records, rejected = [], []
+        for n, r in enumerate(data if isinstance(data, list) else [], 1):
+            try:
+                records.append(VisitRecord.from_dict(r))
+            except RecordError as e:
+                log.warning("%s, запись %d: %s", self.legacy_path, n, e)
+                rejected.append(json.dumps(r, ensure_ascii=False, default=str))
+        if rejected:
+            self._reject(rejected)
+        self._records = records
+        self._rewrite(records)
+
+    def records(self):
+        with self._lock:
+            self._ensure_loaded()
+            return list(self._records)
+
+    def last(self, n=1):
+        with self._lock:
+            self._ensure_loaded()
+            return list(self._records[-n:]) if n > 0 else []
+
+    def count(self):
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._records)
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return iter(self.records())
+
+    # ─── Запись ────────────────────────────────────────────────────
+    def append(self, record):
+        record = VisitRecord.from_dict(record)
+        line = record.to_json() + "\n"
+        with self._lock:
+            self._ensure_loaded()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._records.append(record)
+
+    def clear(self):
+        with self._lock:
+            self._rewrite([])
+            self._records = []
+
+    def compact(self):
+        with self._lock:
+            self._ensure_loaded()
+            self._rewrite(self._records)
+
+    def _rewrite(self, records):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for r in records:
+                f.write(r.to_json() + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _reject(self, lines):
+        # Строки, которые не удалось прочитать, — в отдельный файл для ручного разбора
+        with open(self.path + ".rejected", "a", encoding="utf-8") as f:
+            for line in lines:
+                f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        log.warning("%s: нечитаемых записей: %d, перенесены в %s.rejected",
+                    self.path, len(lines), self.path)
@@ -0,0 +1,137 @@
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .imaging import file_hash
+
+# ─── ХРАНИЛИЩЕ СНИМКОВ ИССЛЕДОВАНИЙ ────────────────────────────────
+# Исходный снимок копируется в objects/<2 символа>/<sha256>.<расш.> — один
+# и тот же файл, загруженный много раз, хранится один раз. Визит ссылается
+# на снимок хэшем (VisitRecord.image). Миниатюра создается при первом
+# запросе (thumbs/<sha256>-<размер>.png) в фоновом потоке и держится в памяти
+# в LRU, ограниченном по байтам, — карточки истории не читают диск повторно.
+
+DIGEST_RE = re.compile(r"[0-9a-f]{64}")     # sha256 в нижнем регистре — имя снимка
+
+
+class MemoryLRU:
+    # Вытесняет давно не использованные элементы, пока сумма cost > max_cost
+    def __init__(self, max_cost, cost=lambda value: 1):
+        self.max_cost = max_cost
+        self.cost     = cost
+        self.total    = 0
+        self._items   = OrderedDict()     # ключ -> (значение, стоимость)
+        self._lock    = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            return item[0]
+
+    def put(self, key, value):
+        cost = self.cost(value)
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.total -= old[1]
+            self._items[key] = (value, cost)
+            self.total += cost
+            while self.total > self.max_cost and len(self._items) > 1:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self.total -= evicted
+
+    def __len__(self):
+        return len(self._items)
+
+
+def image_cost(img):
+    # Байты декодированной картинки PIL
+    return img.width * img.height * len(img.getbands())
+
+
+class ImageStore:
+    def __init__(self, root, thumb_size=96, memory_limit=8 << 20, workers=1):
+        self.root       = root
+        self.thumb_size = thumb_size
+        self.thumbs     = MemoryLRU(memory_limit, image_cost)
+        self._inflight  = {}
+        self._lock      = threading.Lock()
+        self._executor  = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbs")
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(root, "thumbs"), exist_ok=True)
+
+    # ─── Исходные снимки ───────────────────────────────────────────
+    def _object_dir(self, digest):
+        return os.path.join(self.root, "objects", digest[:2])
+
+    def add(self, path, digest=None):
+        # Возвращает хэш снимка; повторная загрузка того же содержимого не копирует файл
+        digest = digest or file_hash(path)
+        if self.path(digest) is None:
+            folder = self._object_dir(digest)
+            os.makedirs(folder, exist_ok=True)
+            ext = os.path.splitext(path)[1].lower() or ".img"
+            target = os.path.join(folder, digest + ext)
+            tmp = f"{target}.{threading.get_ident()}.tmp"
+            shutil.copyfile(path, tmp)
+            os.replace(tmp, target)
+        return digest
+
+    def path(self, digest):
+        # Путь к исходному снимку или None, если его нет в хранилище. Хэш нужен
+        # полный: по префиксу нашелся бы чужой снимок
+        if not isinstance(digest, str) or not DIGEST_RE.fullmatch(digest):
+            return None
+        folder = self._object_dir(digest)
+        if os.path.isdir(folder):
+            for name in os.listdir(folder):
+                if name.startswith(digest + ".") and not name.endswith(".tmp"):
+                    return os.path.join(folder, name)
+        return None
+
+    # ─── Миниатюры ─────────────────────────────────────────────────
+    def thumbnail(self, digest):
+        # Только из памяти — для GUI-потока; None, если еще не загружена
+        return self.thumbs.get(digest)
+
+    def request_thumbnail(self, digest):
+        # Future с картинкой PIL; один снимок в работе не более одного раза
+        with self._lock:
+            future = self._inflight.get(digest)
+            if future is None:
+                future = self._executor.submit(self._load_thumbnail, digest)
+                future.add_done_callback(lambda f, d=digest: self._forget(d))
+                self._inflight[digest] = future
+            return future
+
+    def _forget(self, digest):
+        with self._lock:
+            self._inflight.pop(digest, None)
+
+    def _load_thumbnail(self, digest):
+        from PIL import Image, ImageOps
+        thumb_path = os.path.join(self.root, "thumbs", f"{digest}-{self.thumb_size}.png")
+        if not os.path.exists(thumb_path):
+            source = self.path(digest)
+            if source is None:
+                raise FileNotFoundError(f"Снимок {digest[:12]} отсутствует в хранилище")
+            with Image.open(source) as src:
+                img = ImageOps.exif_transpose(src).convert("L")
+                img.thumbnail((self.thumb_size, self.thumb_size), Image.LANCZOS)
+                tmp = f"{thumb_path}.{threading.get_ident()}.tmp"
+                img.save(tmp, "PNG")
+                os.replace(tmp, thumb_path)
+        with Image.open(thumb_path) as img:
+            img.load()
+            thumb = img.copy()
+        self.thumbs.put(digest, thumb)
+        return thumb
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
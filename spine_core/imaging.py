@@ -0,0 +1,141 @@
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# ─── ПОДГОТОВКА СНИМКОВ ПЕРЕД ОТПРАВКОЙ ────────────────────────────
+# Поворот по EXIF, перевод в оттенки серого, обрезка до области интереса,
+# уменьшение до max_edge по длинной стороне и сжатие. Результат кэшируется
+# на диске по хэшу исходного файла и настройкам, поэтому повторная
+# загрузка того же снимка не пересчитывается.
+
+
+class PreprocessConfig:
+    def __init__(self, max_edge=1536, grayscale=True, crop=None, fmt="JPEG", quality=85):
+        self.max_edge  = max_edge
+        self.grayscale = grayscale
+        self.crop      = crop        # (left, top, right, bottom) в долях 0..1 или None
+        self.fmt       = fmt
+        self.quality   = quality
+
+    def signature(self):
+        return f"{self.max_edge}-{int(self.grayscale)}-{self.crop}-{self.fmt}-{self.quality}"
+
+    @property
+    def mime_type(self):
+        return "image/png" if self.fmt == "PNG" else "image/jpeg"
+
+
+class PreparedImage:
+    def __init__(self, file_hash, data, mime_type, original_bytes, size):
+        self.file_hash      = file_hash
+        self.data           = data
+        self.mime_type      = mime_type
+        self.original_bytes = original_bytes
+        self.size           = size
+
+    @property
+    def bytes_saved(self):
+        return max(0, self.original_bytes - len(self.data))
+
+    def as_part(self):
+        # Формат части запроса, который принимает generate_content
+        return {"mime_type": self.mime_type, "data": self.data}
+
+
+def file_hash(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def format_bytes(n):
+    for unit in ("Б", "КБ", "МБ"):
+        if n < 1024 or unit == "МБ":
+            return f"{n:.0f} {unit}" if unit == "Б" else f"{n:.1f} {unit}"
+        n /= 1024
+
+
+class ImagePreprocessor:
+    MAX_INFLIGHT = 32
+
+    def __init__(self, cache_dir, config=None, workers=1):
+        self.cache_dir = cache_dir
+        self.config    = config or PreprocessConfig()
+        self._inflight = {}
+        self._lock     = threading.RLock()   # колбэк может сработать внутри submit
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="imaging")
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def submit(self, path):
+        # Один и тот же файл (по пути, размеру и времени изменения) обрабатывается один раз
+        st  = os.stat(path)
+        key = (os.path.abspath(path), st.st_size, st.st_mtime)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._executor.submit(self.prepare, path)
+                future.add_done_callback(lambda f, k=key: self._forget_failed(k, f))
+                self._inflight[key] = future
+                while len(self._inflight) > self.MAX_INFLIGHT:
+                    self._inflight.pop(next(iter(self._inflight)))
+            return future
+
+    def _forget_failed(self, key, future):
+        # Ошибку не кэшируем: повторная загрузка файла попробует снова
+        if future.exception() is not None:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def prepare(self, path):
+        digest   = file_hash(path)
+        original = os.path.getsize(path)
+        ext      = "png" if self.config.fmt == "PNG" else "jpg"
+        sig      = hashlib.sha1(self.config.signature().encode()).hexdigest()[:8]
+        cached   = os.path.join(self.cache_dir, f"{digest}-{sig}.{ext}")
+
+        if os.path.exists(cached):
+            from PIL import Image
+            with open(cached, "rb") as f:
+                data = f.read()
+            with Image.open(io.BytesIO(data)) as img:
+                size = img.size
+            return PreparedImage(digest, data, self.config.mime_type, original, size)
+
+        data, size = self._process(path)
+        tmp = cached + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, cached)
+        return PreparedImage(digest, data, self.config.mime_type, original, size)
+
+    def _process(self, path):
+        from PIL import Image, ImageOps   # Pillow нужен только при первой обработке снимка
+        cfg = self.config
+        with Image.open(path) as src:
+            img = ImageOps.exif_transpose(src)
+            if cfg.grayscale:
+                img = img.convert("L")
+            elif img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+
+            if cfg.crop:
+                w, h = img.size
+                left, top, right, bottom = cfg.crop
+                img = img.crop((int(left * w), int(top * h), int(right * w), int(bottom * h)))
+
+            if max(img.size) > cfg.max_edge:
+                img.thumbnail((cfg.max_edge, cfg.max_edge), Image.LANCZOS)
+
+            out = io.BytesIO()
+            if cfg.fmt == "PNG":
+                img.save(out, "PNG", optimize=True)
+            else:
+                img.save(out, "JPEG", quality=cfg.quality, optimize=True)
+            return out.getvalue(), img.size
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,436 @@
+import os
+import struct
+import zlib
+from functools import lru_cache
+
+# ─── PDF БЕЗ ВНЕШНИХ БИБЛИОТЕК ─────────────────────────────────────
+# Минимальный писатель PDF 1.4: страницы A4, текст шрифтом TrueType
+# (встраивается только использованные глифы — кириллица работает без
+# браузера), линии, прямоугольники и растровые картинки RGB.
+# Разметку (переносы строк, разрывы страниц) дает PdfLayout; что писать —
+# решает report.py.
+
+A4 = (595.28, 841.89)       # пункты
+
+# Где искать шрифт с кириллицей, если путь не задан явно
+FONT_DIRS = (
+    "/usr/share/fonts/truetype/dejavu",
+    "/usr/share/fonts/dejavu",
+    "/Library/Fonts",
+    os.path.join(os.environ.get("WINDIR", "C:\\Windows"), "Fonts"),
+)
+FONT_NAMES = (("DejaVuSans.ttf", "DejaVuSans-Bold.ttf"), ("arial.ttf", "arialbd.ttf"),
+              ("Arial.ttf", "Arial Bold.ttf"))
+
+
+class PdfError(Exception):
+    pass
+
+
+def find_fonts(path=None):
+    # (обычный, жирный) — пути к TTF; жирный может совпадать с обычным
+    if path:
+        return path, path
+    dirs = list(FONT_DIRS)
+    try:
+        import matplotlib     # DejaVu поставляется вместе с matplotlib
+        dirs.insert(0, os.path.join(matplotlib.get_data_path(), "fonts", "ttf"))
+    except ImportError:
+        pass
+    for folder in dirs:
+        for regular, bold in FONT_NAMES:
+            if os.path.exists(os.path.join(folder, regular)):
+                bold_path = os.path.join(folder, bold)
+                return (os.path.join(folder, regular),
+                        bold_path if os.path.exists(bold_path) else os.path.join(folder, regular))
+    raise PdfError("Не найден шрифт TrueType с кириллицей (задайте SPINE_PDF_FONT)")
+
+
+# ─── Шрифт TrueType ────────────────────────────────────────────────
+class TrueTypeFont:
+    # Таблицы, которые нужны встроенному шрифту; остальные отбрасываются
+    KEEP = (b"head", b"hhea", b"maxp", b"hmtx", b"loca", b"glyf", b"cvt ", b"fpgm", b"prep")
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.data = f.read()
+        self.name   = os.path.splitext(os.path.basename(path))[0].replace(" ", "")
+        self.tables = {}
+        count = struct.unpack_from(">H", self.data, 4)[0]
+        for i in range(count):
+            tag, _, offset, length = struct.unpack_from(">4sIII", self.data, 12 + 16 * i)
+            self.tables[tag] = (offset, length)
+        if b"glyf" not in self.tables:
+            raise PdfError(f"{path}: поддерживаются только шрифты TrueType (glyf)")
+
+        head = self.tables[b"head"][0]
+        self.units = struct.unpack_from(">H", self.data, head + 18)[0]
+        self.bbox  = [v * 1000 // self.units
+                      for v in struct.unpack_from(">hhhh", self.data, head + 36)]
+        self.long_loca = struct.unpack_from(">h", self.data, head + 50)[0] == 1
+        hhea = self.tables[b"hhea"][0]
+        ascent, descent = struct.unpack_from(">hh", self.data, hhea + 4)
+        self.ascent, self.descent = ascent * 1000 // self.units, descent * 1000 // self.units
+        metrics = struct.unpack_from(">H", self.data, hhea + 34)[0]
+        self.glyph_count = struct.unpack_from(">H", self.data, self.tables[b"maxp"][0] + 4)[0]
+
+        hmtx = self.tables[b"hmtx"][0]
+        advances = struct.unpack_from(f">{metrics * 2}H", self.data, hmtx)[0::2]
+        self.widths = [a * 1000 // self.units for a in advances]
+        self.widths += [self.widths[-1]] * (self.glyph_count - metrics)
+        self.cmap = self._read_cmap()
+        self._char_widths = {}
+
+    def _read_cmap(self):
+        base = self.tables[b"cmap"][0]
+        count = struct.unpack_from(">H", self.data, base + 2)[0]
+        subtables = {}
+        for i in range(count):
+            platform, encoding, offset = struct.unpack_from(">HHI", self.data, base + 4 + 8 * i)
+            subtables[(platform, encoding)] = base + offset
+        for key in ((3, 10), (0, 4), (3, 1), (0, 3)):
+            if key in subtables:
+                offset = subtables[key]
+                fmt = struct.unpack_from(">H", self.data, offset)[0]
+                if fmt == 12:
+                    return self._cmap12(offset)
+                if fmt == 4:
+                    return self._cmap4(offset)
+        raise PdfError("в шрифте нет таблицы cmap для Unicode")
+
+    def _cmap4(self, offset):
+        segs = struct.unpack_from(">H", self.data, offset + 6)[0] // 2
+        ends   = struct.unpack_from(f">{segs}H", self.data, offset + 14)
+        starts = struct.unpack_from(f">{segs}H", self.data, offset + 16 + 2 * segs)
+        deltas = struct.unpack_from(f">{segs}h", self.data, offset + 16 + 4 * segs)
+        ranges_at = offset + 16 + 6 * segs
+        ranges = struct.unpack_from(f">{segs}H", self.data, ranges_at)
+        cmap = {}
+        for i in range(segs):
+            for code in range(starts[i], ends[i] + 1):
+                if code == 0xFFFF:
+                    break
+                if ranges[i] == 0:
+                    gid = (code + deltas[i]) & 0xFFFF
+                else:
+                    at = ranges_at + 2 * i + ranges[i] + 2 * (code - starts[i])
+                    gid = struct.unpack_from(">H", self.data, at)[0]
+                    gid = (gid + deltas[i]) & 0xFFFF if gid else 0
+                if gid:
+                    cmap[code] = gid
+        return cmap
+
+    def _cmap12(self, offset):
+        groups = struct.unpack_from(">I", self.data, offset + 12)[0]
+        cmap = {}
+        for i in range(groups):
+            start, end, gid = struct.unpack_from(">III", self.data, offset + 16 + 12 * i)
+            for code in range(start, end + 1):
+                cmap[code] = gid + code - start
+        return cmap
+
+    def glyphs(self, text):
+        return [self.cmap.get(ord(ch), 0) for ch in text]
+
+    def width(self, text, size):
+        # Ширины символов кэшируются — разметка меряет каждое слово
+        widths = self._char_widths
+        total = 0
+        for ch in text:
+            w = widths.get(ch)
+            if w is None:
+                w = widths[ch] = self.widths[self.cmap.get(ord(ch), 0)]
+            total += w
+        return total * size / 1000
+
+    # ─── Подмножество глифов ───────────────────────────────────────
+    def _glyph_range(self, gid):
+        loca = self.tables[b"loca"][0]
+        if self.long_loca:
+            start, end = struct.unpack_from(">II", self.data, loca + 4 * gid)
+        else:
+            start, end = (2 * v for v in struct.unpack_from(">HH", self.data, loca + 2 * gid))
+        glyf = self.tables[b"glyf"][0]
+        return glyf + start, glyf + end
+
+    def _components(self, gid):
+        # Составной глиф ссылается на другие — их тоже нужно оставить
+        start, end = self._glyph_range(gid)
+        if end - start < 10 or struct.unpack_from(">h", self.data, start)[0] >= 0:
+            return []
+        found, at = [], start + 10
+        while True:
+            flags, component = struct.unpack_from(">HH", self.data, at)
+            found.append(component)
+            at += 4 + (4 if flags & 0x0001 else 2)
+            at += 2 if flags & 0x0008 else 4 if flags & 0x0040 else 8 if flags & 0x0080 else 0
+            if not flags & 0x0020:
+                return found
+
+    def subset(self, used):
+        # Номера глифов сохраняются (CIDToGIDMap /Identity), неиспользуемые глифы пустые
+        keep, stack = set(), [0, *used]
+        while stack:
+            gid = stack.pop()
+            if gid not in keep and gid < self.glyph_count:
+                keep.add(gid)
+                stack.extend(self._components(gid))
+
+        glyf, loca = bytearray(), []
+        for gid in range(self.glyph_count):
+            loca.append(len(glyf))
+            if gid in keep:
+                start, end = self._glyph_range(gid)
+                glyf += self.data[start:end]
+                glyf += b"\0" * (-len(glyf) % 4)
+        loca.append(len(glyf))
+
+        tables = {}
+        for tag in self.KEEP:
+            if tag in self.tables:
+                offset, length = self.tables[tag]
+                tables[tag] = self.data[offset:offset + length]
+        head = bytearray(tables[b"head"])
+        head[8:12] = b"\0\0\0\0"                    # checksumAdjustment
+        head[50:52] = struct.pack(">h", 1)          # длинный формат loca
+        tables[b"head"] = bytes(head)
+        tables[b"loca"] = struct.pack(f">{len(loca)}I", *loca)
+        tables[b"glyf"] = bytes(glyf)
+        return _sfnt(tables)
+
+
+def _checksum(data):
+    data += b"\0" * (-len(data) % 4)
+    return sum(struct.unpack(f">{len(data) // 4}I", data)) & 0xFFFFFFFF
+
+
+def _sfnt(tables):
+    tags = sorted(tables)
+    power = 1 << (len(tags).bit_length() - 1)
+    header = struct.pack(">IHHHH", 0x00010000, len(tags), power * 16,
+                         power.bit_length() - 1, len(tags) * 16 - power * 16)
+    directory, body = b"", b""
+    offset = 12 + 16 * len(tags)
+    for tag in tags:
+        data = tables[tag]
+        directory += struct.pack(">4sIII", tag, _checksum(data), offset + len(body), len(data))
+        body += data + b"\0" * (-len(data) % 4)
+    return header + directory + body
+
+
+@lru_cache(maxsize=4)
+def load_font(path):
+    # Шрифт разбирается один раз на процесс; документы его только читают
+    return TrueTypeFont(path)
+
+
+# ─── Документ ──────────────────────────────────────────────────────
+class PdfDocument:
+    def __init__(self, font_path=None, title=""):
+        regular, bold = find_fonts(font_path)
+        self.fonts  = {"F1": load_font(regular), "F2": load_font(bold)}
+        self.used   = {"F1": set(), "F2": set()}
+        self.title  = title
+        self.pages  = []            # содержимое страниц (list строк операторов)
+        self.images = []            # (ширина, высота, сжатые RGB-байты)
+        self.width, self.height = A4
+
+    def add_page(self):
+        self.pages.append([])
+
+    def _ops(self):
+        if not self.pages:
+            self.add_page()
+        return self.pages[-1]
+
+    def text(self, x, y, text, size=10, bold=False, color=(0, 0, 0)):
+        name = "F2" if bold else "F1"
+        glyphs = self.fonts[name].glyphs(text)
+        self.used[name].update(glyphs)
+        hex_text = "".join(f"{g:04X}" for g in glyphs)
+        self._ops().append(f"BT {color[0]:.3f} {color[1]:.3f} {color[2]:.3f} rg /{name} {size:g} Tf "
+                           f"{x:.2f} {y:.2f} Td <{hex_text}> Tj ET")
+
+    def text_width(self, text, size=10, bold=False):
+        return self.fonts["F2" if bold else "F1"].width(text, size)
+
+    def line(self, x1, y1, x2, y2, width=0.5, color=(0.8, 0.8, 0.8)):
+        self._ops().append(f"{color[0]:.3f} {color[1]:.3f} {color[2]:.3f} RG {width:g} w "
+                           f"{x1:.2f} {y1:.2f} m {x2:.2f} {y2:.2f} l S")
+
+    def rect(self, x, y, w, h, color):
+        self._ops().append(f"{color[0]:.3f} {color[1]:.3f} {color[2]:.3f} rg "
+                           f"{x:.2f} {y:.2f} {w:.2f} {h:.2f} re f")
+
+    def image(self, x, y, w, h, pixels, px_width, px_height):
+        # pixels — байты RGB построчно сверху вниз
+        self.images.append((px_width, px_height, zlib.compress(pixels, 6)))
+        name = f"Im{len(self.images)}"
+        self._ops().append(f"q {w:.2f} 0 0 {h:.2f} {x:.2f} {y:.2f} cm /{name} Do Q")
+
+    # ─── Сборка файла ──────────────────────────────────────────────
+    def to_bytes(self):
+        if not self.pages:
+            self.add_page()
+        objects = []                # тела объектов; номер = индекс + 1
+
+        def add(body):
+            objects.append(body)
+            return len(objects)
+
+        def stream(data, extra=""):
+            data = zlib.compress(data, 6)
+            return (f"<< /Length {len(data)} /Filter /FlateDecode {extra}>>\nstream\n"
+                    .encode("latin-1") + data + b"\nendstream")
+
+        catalog = add(None)
+        pages   = add(None)
+        # Если жирного начертания нет, F1 и F2 — один и тот же встроенный шрифт
+        font_refs = {}
+        if self.fonts["F1"] is self.fonts["F2"]:
+            ref = self._add_font(self.fonts["F1"], self.used["F1"] | self.used["F2"], add, stream)
+            font_refs = {"F1": ref, "F2": ref}
+        else:
+            for name, font in self.fonts.items():
+                font_refs[name] = self._add_font(font, self.used[name], add, stream)
+        image_refs = [add(self._image_object(w, h, data)) for w, h, data in self.images]
+
+        fonts = " ".join(f"/{n} {ref} 0 R" for n, ref in font_refs.items())
+        xobjects = " ".join(f"/Im{i + 1} {ref} 0 R" for i, ref in enumerate(image_refs))
+        resources = f"<< /Font << {fonts} >> /XObject << {xobjects} >> >>"
+        kids = []
+        for ops in self.pages:
+            content = add(stream("\n".join(ops).encode("latin-1")))
+            kids.append(add(f"<< /Type /Page /Parent {pages} 0 R /MediaBox [0 0 {self.width} "
+                            f"{self.height}] /Resources {resources} /Contents {content} 0 R >>"))
+        objects[pages - 1] = (f"<< /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in kids)}] "
+                              f"/Count {len(kids)} >>")
+        objects[catalog - 1] = f"<< /Type /Catalog /Pages {pages} 0 R >>"
+        info = add(f"<< /Producer (Spine Advisor) /Title <FEFF{self.title.encode('utf-16-be').hex()}> >>")
+
+        out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(len(out))
+            out += f"{number} 0 obj\n".encode("latin-1")
+            out += body if isinstance(body, bytes) else body.encode("latin-1")
+            out += b"\nendobj\n"
+        xref = len(out)
+        out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+        out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode("latin-1")
+        out += (f"trailer\n<< /Size {len(objects) + 1} /Root {catalog} 0 R /Info {info} 0 R >>\n"
+                f"startxref\n{xref}\n%%EOF\n").encode("latin-1")
+        return bytes(out)
+
+    def _image_object(self, w, h, data):
+        return (f"<< /Type /XObject /Subtype /Image /Width {w} /Height {h} /ColorSpace /DeviceRGB "
+                f"/BitsPerComponent 8 /Length {len(data)} /Filter /FlateDecode >>\nstream\n"
+                .encode("latin-1") + data + b"\nendstream")
+
+    def _add_font(self, font, used, add, stream):
+        # Type0 + CIDFontType2 с кодировкой Identity-H: код символа в тексте = номер глифа
+        used = sorted(used | {0})
+        font_data = font.subset(used)
+        font_file = add(stream(font_data, f"/Length1 {len(font_data)} "))
+        base = f"SPNADV+{font.name}"      # префикс обозначает встроенное подмножество
+        descriptor = add(f"<< /Type /FontDescriptor /FontName /{base} /Flags 32 "
+                         f"/FontBBox [{' '.join(map(str, font.bbox))}] /ItalicAngle 0 "
+                         f"/Ascent {font.ascent} /Descent {font.descent} /CapHeight {font.ascent} "
+                         f"/StemV 80 /FontFile2 {font_file} 0 R >>")
+        widths = " ".join(f"{g} [{font.widths[g]}]" for g in used)
+        cid_font = add(f"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /{base} "
+                       f"/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> "
+                       f"/FontDescriptor {descriptor} 0 R /W [{widths}] /CIDToGIDMap /Identity >>")
+        to_unicode = add(stream(self._to_unicode(font, used)))
+        return add(f"<< /Type /Font /Subtype /Type0 /BaseFont /{base} /Encoding /Identity-H "
+                   f"/DescendantFonts [{cid_font} 0 R] /ToUnicode {to_unicode} 0 R >>")
+
+    def _to_unicode(self, font, used):
+        # Обратная таблица «глиф -> символ», чтобы текст PDF можно было копировать и искать
+        reverse = {}
+        for code, gid in font.cmap.items():
+            reverse.setdefault(gid, code)
+        pairs = [(g, reverse[g]) for g in used if g in reverse and reverse[g] <= 0xFFFF]
+        lines = ["/CIDInit /ProcSet findresource begin 12 dict begin begincmap",
+                 "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def",
+                 "/CMapName /Adobe-Identity-UCS def /CMapType 2 def",
+                 "1 begincodespacerange <0000> <FFFF> endcodespacerange"]
+        for i in range(0, len(pairs), 100):
+            chunk = pairs[i:i + 100]
+            lines.append(f"{len(chunk)} beginbfchar")
+            lines.extend(f"<{g:04X}> <{c:04X}>" for g, c in chunk)
+            lines.append("endbfchar")
+        lines.append("endcmap CMapName currentdict /CMap defineresource pop end end")
+        return "\n".join(lines).encode("latin-1")
+
+
+# ─── Разметка ──────────────────────────────────────────────────────
+class PdfLayout:
+    # Поток сверху вниз: абзацы с переносом по словам, новая страница,
+    # когда следующая строка не помещается
+    def __init__(self, doc, margin=50):
+        self.doc    = doc
+        self.margin = margin
+        self.y      = None
+
+    @property
+    def width(self):
+        return self.doc.width - 2 * self.margin
+
+    def new_page(self):
+        self.doc.add_page()
+        self.y = self.doc.height - self.margin
+
+    def reserve(self, height):
+        if self.y is None or self.y - height < self.margin:
+            self.new_page()
+
+    def skip(self, height):
+        self.y -= height
+
+    def wrap(self, text, size, bold=False, width=None):
+        # Жадный перенос: ширина строки накапливается по словам, без повторных замеров
+        width = width or self.width
+        measure = lambda t: self.doc.text_width(t, size, bold)
+        space = measure(" ")
+        lines = []
+        for source in text.splitlines() or [""]:
+            line, line_width = [], 0.0
+            for word in source.split():
+                word_width = measure(word)
+                if line and line_width + space + word_width <= width:
+                    line.append(word)
+                    line_width += space + word_width
+                    continue
+                if line:
+                    lines.append(" ".join(line))
+                # Слово длиннее строки режется по символам
+                while word_width > width and len(word) > 1:
+                    cut = len(word) - 1
+                    while cut > 1 and measure(word[:cut]) > width:
+                        cut -= 1
+                    lines.append(word[:cut])
+                    word = word[cut:]
+                    word_width = measure(word)
+                line, line_width = [word], word_width
+            lines.append(" ".join(line))
+        return lines
+
+    def paragraph(self, text, size=10, bold=False, color=(0.2, 0.2, 0.2), indent=0, leading=1.4):
+        step = size * leading
+        for line in self.wrap(text, size, bold, self.width - indent):
+            self.reserve(step)
+            self.y -= step
+            self.doc.text(self.margin + indent, self.y + (step - size) / 2, line, size, bold, color)
+
+    def rule(self, color=(0.0, 0.706, 0.847), width=1.0, gap=6):
+        self.reserve(gap * 2)
+        self.y -= gap
+        self.doc.line(self.margin, self.y, self.doc.width - self.margin, self.y, width, color)
+        self.y -= gap
+
+    def image(self, pixels, px_width, px_height):
+        height = self.width * px_height / px_width
+        self.reserve(height)
+        self.y -= height
+        self.doc.image(self.margin, self.y, self.width, height, pixels, px_width, px_height)
@@ -0,0 +1,141 @@
+import atexit
+import threading
+import time
+from concurrent.futures import Future
+
+from .telemetry import METRICS
+
+# ─── ОТЛОЖЕННАЯ ЗАПИСЬ НА ДИСК ─────────────────────────────────────
+# GUI не пишет в базу сам: submit() ставит операцию в очередь и сразу
+# возвращает Future. Рабочий поток ждет flush_delay, чтобы собрать серию
+# записей, и выполняет все накопленное одной транзакцией (transaction —
+# обычно PatientRepository.batch), то есть одним commit/fsync. Каждая
+# операция идет в своей точке сохранения (savepoint — PatientRepository.savepoint):
+# ошибка откатывает только ее, Future этой операции получает исключение,
+# а on_error(ошибка) сообщает о ней, например, окну приложения.
+# Операции с одинаковым ключом (профиль пациента, meta) схлопываются:
+# выполняется только последняя. flush() ждет, пока очередь опустеет;
+# close() вызывается при выходе (и на всякий случай через atexit) и тоже
+# ждет всю очередь — с timeout он может вернуть False, и тогда его вызывают снова.
+
+
+class WriteBehind:
+    def __init__(self, transaction=None, flush_delay=0.05, on_error=None, savepoint=None):
+        self.transaction = transaction      # фабрика контекст-менеджера на одну пачку
+        self.savepoint   = savepoint        # ... и на одну операцию внутри пачки
+        self.flush_delay = flush_delay
+        self.on_error    = on_error
+        self.flushes     = 0
+        self.written     = 0
+        self._pending    = []               # [(ключ, функция, аргументы, Future)]
+        self._busy       = False
+        self._closed     = False
+        self._cond       = threading.Condition()
+        self._thread     = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, key, fn, *args):
+        # key=None — операция не схлопывается (например, новый визит)
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Запись на диск уже остановлена")
+            if key is not None:
+                for i, (other, _, _, replaced) in enumerate(self._pending):
+                    if other == key:
+                        del self._pending[i]
+                        # Ждавшие старую версию узнают о записи вместе с новой
+                        future.add_done_callback(lambda f, r=replaced: _chain(f, r))
+                        break
+            self._pending.append((key, fn, args, future))
+            self._cond.notify()
+        return future
+
+    def flush(self, timeout=None):
+        # True, если все поставленные до вызова операции записаны
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify()
+            while self._pending or self._busy:
+                left = None if deadline is None else deadline - time.monotonic()
+                if left is not None and left <= 0:
+                    return False
+                self._cond.wait(left)
+        return True
+
+    def close(self, timeout=None):
+        # True — все поставленные операции выполнены; False — истек timeout,
+        # запись продолжается в фоне
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+            # Пауза, чтобы серия записей попала в одну транзакцию
+            if not self._closed:
+                time.sleep(self.flush_delay)
+            with self._cond:
+                batch, self._pending = self._pending, []
+                self._busy = True
+            try:
+                self._write(batch)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _write(self, batch):
+        outcomes = []
+        try:
+            with METRICS.span("db.flush", operations=len(batch)):
+                if self.transaction is None:
+                    outcomes = [self._apply(fn, args) for _, fn, args, _ in batch]
+                else:
+                    with self.transaction():
+                        outcomes = [self._apply(fn, args) for _, fn, args, _ in batch]
+        except Exception as e:
+            # Транзакция откатилась целиком — сообщаем всем операциям пачки
+            if self.on_error:
+                self.on_error(e)
+            for _, _, _, future in batch:
+                future.set_exception(e)
+            return
+        self.flushes += 1
+        for (_, _, _, future), (ok, value) in zip(batch, outcomes):
+            if ok:
+                self.written += 1
+                future.set_result(value)
+            else:
+                if self.on_error:
+                    self.on_error(value)
+                future.set_exception(value)
+
+    def _apply(self, fn, args):
+        # (True, результат) или (False, ошибка); без точек сохранения ошибка
+        # внутри транзакции откатывает всю пачку
+        try:
+            if self.savepoint is None:
+                return True, fn(*args)
+            with self.savepoint():
+                return True, fn(*args)
+        except Exception as e:
+            if self.savepoint is None and self.transaction is not None:
+                raise
+            METRICS.count("db.failed")
+            return False, e
+
+
+def _chain(source, target):
+    if source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(None)
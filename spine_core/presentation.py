@@ -0,0 +1,168 @@
+from .image_store import MemoryLRU
+from .records import AnalysisResult, RecordError, to_angle, to_bool
+
+# ─── ПРЕДСТАВЛЕНИЕ РЕЗУЛЬТАТОВ ─────────────────────────────────────
+# Подписи и цвета для динамики, риска, боли и срочности — одни таблицы для
+# панели результата, карточек истории, шкалы боли и отчетов. Текст заключения
+# и поля карточки визита собираются один раз на запись (RecordView) и
+# хранятся в LRU по содержимому записи: повторная прокрутка истории и
+# повторный показ визита берут готовые строки.
+
+# Цвета состояния («лучше» / «внимание» / «хуже»)
+COLOR_SUCCESS = "#4caf50"
+COLOR_WARNING = "#ff9800"
+COLOR_DANGER  = "#ef5350"
+COLOR_NEUTRAL = "white"
+
+# Цвета для шкалы боли (от зеленого к красному) и подписи уровней
+PAIN_COLORS = {
+    1: "#4caf50", 2: "#66bb6a", 3: "#8bc34a",
+    4: "#cddc39", 5: "#ffeb3b", 6: "#ffc107",
+    7: "#ff9800", 8: "#ff5722", 9: "#f44336", 10: "#b71c1c"
+}
+PAIN_LABELS = {1: "Нет боли", 2: "Очень слабая", 3: "Слабая", 4: "Умеренная",
+               5: "Средняя", 6: "Заметная", 7: "Сильная", 8: "Очень сильная",
+               9: "Нестерпимая", 10: "Максимальная"}
+
+FIRST_VISIT = "pervichnyy_osmotr"
+DYNAMICS_LABELS = {"uluchshenie": "Улучшение", "uhudshenie": "Ухудшение",
+                   "bez_izmeneniy": "Без изменений"}
+DYNAMICS_HEADLINES = {"uluchshenie": "ПОЛОЖИТЕЛЬНАЯ (Улучшение)",
+                      "uhudshenie": "ОТРИЦАТЕЛЬНАЯ (Ухудшение)",
+                      "bez_izmeneniy": "БЕЗ ИЗМЕНЕНИЙ"}
+DYNAMICS_COLORS = {"uluchshenie": COLOR_SUCCESS, "uhudshenie": COLOR_DANGER,
+                   "bez_izmeneniy": COLOR_WARNING}
+
+# Риск модель пишет по-разному («средний», «Средняя», «высокий риск») — сверяем по основе
+RISK_COLORS = (("низк", COLOR_SUCCESS), ("средн", COLOR_WARNING), ("высок", COLOR_DANGER))
+
+URGENT_ANSWERS = {True: "🚨 ДА, НУЖЕН ВРАЧ!", False: "Нет, плановый осмотр"}
+URGENT_STATUS  = {True: "ТРЕБУЕТСЯ ОСМОТР ВРАЧА", False: "Плановый режим"}
+
+CARD_COMMENT_CHARS = 240       # комментарий в карточке истории обрезается до стольких символов
+RENDER_CACHE_SIZE  = 1000      # записей с готовым представлением
+
+
+def risk_color(risk):
+    risk = (risk or "").lower()
+    for stem, color in RISK_COLORS:
+        if stem in risk:
+            return color
+    return COLOR_NEUTRAL
+
+
+def angle_text(angle):
+    return f"{angle:g}°" if angle is not None else "Не определен"
+
+
+# ─── Текст заключения ──────────────────────────────────────────────
+def _coerce(convert, value, default):
+    try:
+        return convert(value, None)
+    except RecordError:
+        return default
+
+
+def result_text(data, pain_level, pending=None):
+    # data — поля в ключах ответа модели; pending — заглушка еще не пришедших
+    # полей при потоковом ответе (их значение равно pending)
+    lines = []
+    if pending is not None:
+        lines.append("⏳ Ответ модели поступает...\n")
+
+    dyn = data.get("dinamika") or FIRST_VISIT
+    if dyn != FIRST_VISIT:
+        lines.append("📊 ДИНАМИКА:")
+        lines.append(f"   {DYNAMICS_HEADLINES.get(dyn, dyn)}")
+        if data.get("dinamika_kommentariy"):
+            lines.append(f"   {data['dinamika_kommentariy']}")
+        lines.append("-" * 40)
+
+    # Поля потокового ответа еще не проверены records.py: угол может прийти
+    # строкой («12.5», «около 15°»), срочность — «нет»
+    angle = data.get("ugol_iskrivleniya")
+    if pending is not None and angle == pending:
+        angle_str = pending
+    else:
+        angle_str = angle_text(_coerce(to_angle, angle, None))
+    urgent = data.get("srochno_k_vrachu")
+    if pending is not None and urgent == pending:
+        urgent_str = pending
+    else:
+        urgent_str = URGENT_ANSWERS[_coerce(to_bool, urgent, False)]
+
+    lines.append(f"📐 Угол искривления:  {angle_str}")
+    lines.append(f"📍 Зона проблемы:     {data.get('zona_davleniya') or '—'}")
+    lines.append(f"⚙️ Корсет/Жесткость:  {data.get('rekomenduemaya_zhostkost') or '—'}")
+    lines.append(f"⚠️ Степень риска:     {data.get('stepen_riska') or '—'}")
+    lines.append(f"🚑 Срочно к врачу:    {urgent_str}")
+    if pain_level:
+        lines.append(f"⚡ Уровень боли:      {pain_level}/10")
+
+    lines.append("\n" + "─" * 30 + "\n")
+    lines.append("🏃 Рекомендуемые упражнения:")
+    lines.extend(f"   • {ex}" for ex in data.get("uprazhneniya") or [])
+    lines.append("\n💬 Заключение ИИ:")
+    lines.append(data.get("kommentariy") or "")
+    lines.append(f"\nℹ️ ВАЖНО: {data.get('preduprezhdenie') or ''}")
+    return "\n".join(lines)
+
+
+# ─── Представление визита ──────────────────────────────────────────
+class RecordView:
+    # Готовые строки и цвета для карточки истории и панели результата
+    __slots__ = ("metrics", "risk_text", "risk_color", "dynamics_text", "dynamics_color",
+                 "comment", "_record", "_text")
+
+    def __init__(self, record):
+        metrics = []
+        if record.pain_level is not None:
+            metrics.append(f"Боль: {record.pain_level}/10")
+        if record.angle is not None:
+            metrics.append(f"Угол: {angle_text(record.angle)}")
+        self.metrics    = " | ".join(metrics)
+        self.risk_text  = f"Риск: {(record.risk or '--').upper()}"
+        self.risk_color = risk_color(record.risk)
+
+        dyn = record.dynamics
+        if dyn and dyn != FIRST_VISIT:
+            self.dynamics_text  = f"Динамика: {DYNAMICS_LABELS.get(dyn, dyn)}"
+            self.dynamics_color = DYNAMICS_COLORS.get(dyn, COLOR_NEUTRAL)
+        else:
+            self.dynamics_text, self.dynamics_color = "", COLOR_NEUTRAL
+
+        comment = record.comment
+        if len(comment) > CARD_COMMENT_CHARS:
+            comment = comment[:CARD_COMMENT_CHARS].rstrip() + "…"
+        self.comment = comment
+        self._record = record
+        self._text   = None
+
+    @property
+    def text(self):
+        # Полное заключение для панели результата — собирается при первом показе
+        if self._text is None:
+            record = self._record
+            data = {key: getattr(record, attr) for key, attr in AnalysisResult.KEYS.items()}
+            self._text = result_text(data, record.pain_level)
+        return self._text
+
+
+def render_key(record):
+    # Записи из базы — новые объекты при каждой подгрузке страницы, поэтому
+    # ключ кэша — содержимое, от которого зависит представление
+    return (record.date, record.symptoms, record.pain_level, record.risk, record.angle,
+            record.stiffness, record.zone, record.urgent, tuple(record.exercises),
+            record.comment, record.dynamics, record.dynamics_comment, record.warning)
+
+
+_views = MemoryLRU(RENDER_CACHE_SIZE)
+
+
+def record_view(record):
+    key = render_key(record)
+    view = _views.get(key)
+    if view is None:
+        view = RecordView(record)
+        _views.put(key, view)
+    return view
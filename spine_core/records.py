@@ -0,0 +1,244 @@
+import json
+import re
+
+# ─── РАЗБОР И ПРОВЕРКА ЗАПИСЕЙ ─────────────────────────────────────
+# Единственное место, где сырой ответ модели и сохраненный JSON превращаются
+# в типизированные объекты. Дальше (база, графики, отчеты, поиск) поля уже
+# приведены к своим типам: angle — float или None, pain_level — int 0..10
+# или None, urgent — bool, exercises — список строк.
+# Если установлен orjson, он используется для разбора и сериализации.
+
+try:
+    import orjson
+
+    def loads(text):
+        return orjson.loads(text)
+
+    def dumps(obj):
+        return orjson.dumps(obj).decode("utf-8")
+
+    JSON_BACKEND = "orjson"
+except ImportError:
+    def loads(text):
+        return json.loads(text)
+
+    def dumps(obj):
+        return json.dumps(obj, ensure_ascii=False)
+
+    JSON_BACKEND = "json"
+
+
+class RecordError(ValueError):
+    # field — какое поле не удалось привести к типу (None — ошибка всего ответа)
+    def __init__(self, message, field=None, value=None):
+        super().__init__(f"{field}: {message} ({value!r})" if field else message)
+        self.field = field
+        self.value = value
+
+
+_FENCE  = re.compile(r"```(?:json)?")
+_NUMBER = re.compile(r"-?\d+(?:[.,]\d+)?")
+_TRUE   = {"true", "да", "yes", "1"}
+_FALSE  = {"false", "нет", "no", "0", "", "null", "none"}
+_EMPTY  = {"", "--", "—", "null", "none", "не определен", "не определено", "неизвестно"}
+
+
+# ─── Приведение типов ──────────────────────────────────────────────
+def to_text(value, field):
+    if value is None:
+        return ""
+    if isinstance(value, (str, int, float)):
+        text = str(value).strip()
+        return "" if text.lower() in ("null", "none") else text
+    raise RecordError("ожидалась строка", field, value)
+
+
+def to_angle(value, field="angle"):
+    # 12, 12.5, "12°", "около 15 градусов" -> float; пусто или «не определен» -> None
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        if value.strip().lower() in _EMPTY:
+            return None
+        match = _NUMBER.search(value)
+        return float(match.group().replace(",", ".")) if match else None
+    raise RecordError("ожидалось число", field, value)
+
+
+def to_pain(value, field="pain_level"):
+    # 7, "7", "7/10" -> 7; "--" или 0 -> None (уровень не указан)
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        if value.strip().lower() in _EMPTY:
+            return None
+        match = _NUMBER.search(value)
+        if not match:
+            raise RecordError("ожидалось число от 0 до 10", field, value)
+        value = float(match.group().replace(",", "."))
+    if not isinstance(value, (int, float)) or not 0 <= value <= 10:
+        raise RecordError("ожидалось число от 0 до 10", field, value)
+    return int(round(value)) or None
+
+
+def to_bool(value, field):
+    if isinstance(value, bool) or value is None:
+        return bool(value)
+    if isinstance(value, (int, float)):
+        return value != 0
+    if isinstance(value, str):
+        key = value.strip().lower()
+        if key in _TRUE:
+            return True
+        if key in _FALSE:
+            return False
+    raise RecordError("ожидалось true или false", field, value)
+
+
+def to_list(value, field):
+    # Список строк; строку модель иногда присылает вместо списка — делим по строкам
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [s.strip(" •-\t") for s in value.splitlines() if s.strip(" •-\t")]
+    if isinstance(value, (list, tuple)):
+        items = (to_text(v, field) for v in value)
+        return [s for s in items if s]
+    raise RecordError("ожидался список", field, value)
+
+
+# ─── Ответ модели ──────────────────────────────────────────────────
+class AnalysisResult:
+    # Поля ответа модели (ключи JSON из схемы промпта) -> атрибуты
+    KEYS = {
+        "ugol_iskrivleniya":        "angle",
+        "zona_davleniya":           "zone",
+        "rekomenduemaya_zhostkost": "stiffness",
+        "stepen_riska":             "risk",
+        "srochno_k_vrachu":         "urgent",
+        "uprazhneniya":             "exercises",
+        "kommentariy":              "comment",
+        "dinamika":                 "dynamics",
+        "dinamika_kommentariy":     "dynamics_comment",
+        "preduprezhdenie":          "warning",
+    }
+    __slots__ = tuple(KEYS.values())
+
+    def __init__(self, angle=None, zone="", stiffness="", risk="", urgent=False, exercises=(),
+                 comment="", dynamics="pervichnyy_osmotr", dynamics_comment="", warning=""):
+        self.angle            = angle
+        self.zone             = zone
+        self.stiffness        = stiffness
+        self.risk             = risk
+        self.urgent           = urgent
+        self.exercises        = list(exercises)
+        self.comment          = comment
+        self.dynamics         = dynamics
+        self.dynamics_comment = dynamics_comment
+        self.warning          = warning
+
+    @classmethod
+    def parse(cls, raw_text):
+        # Модель иногда оборачивает JSON в ```json ... ``` или добавляет текст вокруг
+        clean = _FENCE.sub("", raw_text or "").strip()
+        start, end = clean.find("{"), clean.rfind("}")
+        if start < 0 or end < start:
+            raise RecordError("в ответе модели нет JSON-объекта")
+        try:
+            data = loads(clean[start:end + 1])
+        except ValueError as e:
+            raise RecordError(f"ответ модели — некорректный JSON: {e}") from None
+        return cls.from_dict(data)
+
+    @classmethod
+    def from_dict(cls, data):
+        if not isinstance(data, dict):
+            raise RecordError("ответ модели должен быть JSON-объектом")
+        return cls(
+            angle            = to_angle(data.get("ugol_iskrivleniya"), "ugol_iskrivleniya"),
+            zone             = to_text(data.get("zona_davleniya"), "zona_davleniya"),
+            stiffness        = to_text(data.get("rekomenduemaya_zhostkost"),
+                                       "rekomenduemaya_zhostkost"),
+            risk             = to_text(data.get("stepen_riska"), "stepen_riska").lower(),
+            urgent           = to_bool(data.get("srochno_k_vrachu"), "srochno_k_vrachu"),
+            exercises        = to_list(data.get("uprazhneniya"), "uprazhneniya"),
+            comment          = to_text(data.get("kommentariy"), "kommentariy"),
+            dynamics         = to_text(data.get("dinamika"), "dinamika") or "pervichnyy_osmotr",
+            dynamics_comment = to_text(data.get("dinamika_kommentariy"), "dinamika_kommentariy"),
+            warning          = to_text(data.get("preduprezhdenie"), "preduprezhdenie"),
+        )
+
+    def to_dict(self):
+        # Обратно в ключи модели — для экрана результата
+        return {key: getattr(self, attr) for key, attr in self.KEYS.items()}
+
+
+# ─── Запись визита ─────────────────────────────────────────────────
+class VisitRecord:
+    __slots__ = ("date", "symptoms", "pain_level", "risk", "angle", "stiffness", "zone",
+                 "urgent", "exercises", "comment", "dynamics", "dynamics_comment", "warning",
+                 "image")
+
+    def __init__(self, date, symptoms="", pain_level=None, risk="", angle=None, stiffness="",
+                 zone="", urgent=False, exercises=(), comment="", dynamics="pervichnyy_osmotr",
+                 dynamics_comment="", warning="", image=""):
+        self.date             = date          # "25.02.2026 15:14"
+        self.symptoms         = symptoms
+        self.pain_level       = pain_level    # int 1..10 или None
+        self.risk             = risk          # в нижнем регистре: «низкий», «средний»...
+        self.angle            = angle         # float или None
+        self.stiffness        = stiffness
+        self.zone             = zone
+        self.urgent           = urgent
+        self.exercises        = list(exercises)
+        self.comment          = comment
+        self.dynamics         = dynamics
+        self.dynamics_comment = dynamics_comment
+        self.warning          = warning
+        self.image            = image         # sha256 снимка в ImageStore или ""
+
+    @classmethod
+    def from_dict(cls, data):
+        # Сохраненная запись любой версии: "--" вместо боли, угол строкой и т. п.
+        if isinstance(data, cls):
+            return data
+        if not isinstance(data, dict):
+            raise RecordError("запись визита должна быть JSON-объектом")
+        return cls(
+            date             = to_text(data.get("date"), "date") or "--",
+            symptoms         = to_text(data.get("symptoms"), "symptoms"),
+            pain_level       = to_pain(data.get("pain_level")),
+            risk             = to_text(data.get("risk"), "risk").lower(),
+            angle            = to_angle(data.get("angle")),
+            stiffness        = to_text(data.get("stiffness"), "stiffness"),
+            zone             = to_text(data.get("zone"), "zone"),
+            urgent           = to_bool(data.get("urgent"), "urgent"),
+            exercises        = to_list(data.get("exercises"), "exercises"),
+            comment          = to_text(data.get("comment"), "comment"),
+            dynamics         = to_text(data.get("dynamics"), "dynamics") or "pervichnyy_osmotr",
+            dynamics_comment = to_text(data.get("dynamics_comment"), "dynamics_comment"),
+            warning          = to_text(data.get("warning"), "warning"),
+            image            = to_text(data.get("image"), "image"),
+        )
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(loads(text))
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def to_json(self):
+        return dumps(self.to_dict())
+
+    def __eq__(self, other):
+        return isinstance(other, VisitRecord) and self.to_dict() == other.to_dict()
+
+    # Запись изменяемая (правка заключения, exercises — список), поэтому
+    # сравнивается по содержимому, но не хэшируется: ключ в set/dict устарел бы
+    __hash__ = None
+
+    def __repr__(self):
+        return f"VisitRecord({self.date!r}, risk={self.risk!r}, angle={self.angle!r})"
@@ -0,0 +1,374 @@
+import base64
+import io
+import re
+from datetime import datetime
+from html import escape
+
+from .presentation import URGENT_STATUS
+from .repository import chart_point
+from .trend import TrendSummary
+
+# ─── HTML-ОТЧЕТЫ ───────────────────────────────────────────────────
+# Заключение по одному анализу и отчет по нескольким визитам (или всей
+# истории пациента) с графиком динамики. Шаблоны разбираются один раз при
+# загрузке модуля; при выводе остается только склеить готовые куски с уже
+# экранированными значениями. Данные берутся из VisitRecord (records.py),
+# повторного разбора JSON нет. Те же отчеты есть в PDF (см. pdf.py).
+# От Tk не зависит — вызывается и из окна, и из пакетного режима.
+
+DEFAULT_WARNING = ("Данный отчет сформирован искусственным интеллектом и не является "
+                   "официальным медицинским диагнозом. Обратитесь к врачу.")
+APP_TITLE = "Spine Advisor v3.1"
+
+
+class Template:
+    # "{имя}" — место для значения; фигурные скобки CSS (с пробелом) не трогаются
+    FIELD = re.compile(r"\{(\w+)\}")
+
+    def __init__(self, text):
+        parts = self.FIELD.split(text)
+        self.literals = parts[0::2]
+        self.fields   = parts[1::2]
+
+    def render(self, values):
+        # values — уже экранированные строки
+        out = [self.literals[0]]
+        for name, literal in zip(self.fields, self.literals[1:]):
+            out.append(values[name])
+            out.append(literal)
+        return "".join(out)
+
+
+PAGE = Template("""<!DOCTYPE html>
+<html lang="ru">
+<head>
+    <meta charset="UTF-8">
+    <title>{title} - Spine Advisor</title>
+    <style>
+        body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; max-width: 900px; margin: 40px auto; color: #333; line-height: 1.6; }
+        .header { border-bottom: 3px solid #00b4d8; padding-bottom: 20px; margin-bottom: 30px; }
+        .header h1 { margin: 0; color: #16213e; }
+        .meta { color: #666; font-size: 0.9em; margin-top: 5px; }
+        .section { background: #f9f9f9; padding: 20px; border-radius: 8px; margin-bottom: 20px; }
+        .section h2 { margin-top: 0; color: #00b4d8; font-size: 1.2em; border-bottom: 1px solid #ddd; padding-bottom: 10px; }
+        .grid { display: grid; grid-template-columns: 1fr 1fr; gap: 15px; }
+        .field { margin-bottom: 5px; }
+        .label { font-weight: bold; color: #555; }
+        .alert { background: #fff3e0; border-left: 5px solid #ff9800; padding: 15px; margin: 20px 0; }
+        .chart { width: 100%; }
+        table { width: 100%; border-collapse: collapse; font-size: 0.9em; }
+        th, td { text-align: left; vertical-align: top; padding: 6px 8px; border-bottom: 1px solid #ddd; }
+        th { color: #555; }
+        td ul { margin: 0; padding-left: 18px; }
+        .urgent { color: red; font-weight: bold; }
+        .footer { text-align: center; font-size: 0.8em; color: #aaa; margin-top: 50px; border-top: 1px solid #eee; padding-top: 20px; }
+    </style>
+</head>
+<body>
+    <div class="header">
+        <h1>Spine Advisor: {title}</h1>
+        <div class="meta">{meta}</div>
+    </div>
+
+    <div class="section">
+        <h2>Данные пациента</h2>
+        <div class="grid">
+            <div class="field"><span class="label">ФИО:</span> {name}</div>
+            <div class="field"><span class="label">Возраст:</span> {age}</div>
+            <div class="field"><span class="label">Рост/Вес:</span> {height} см / {weight} кг</div>
+        </div>
+    </div>
+{body}
+    <div class="alert">
+        <strong>ВАЖНО:</strong> {warning}
+    </div>
+
+    <div class="footer">
+        Сгенерировано в приложении {app}
+    </div>
+</body>
+</html>
+""")
+
+VISIT = Template("""
+    <div class="section">
+        <h2>Результаты диагностики</h2>
+        <div class="grid">
+            <div class="field"><span class="label">Угол искривления:</span> {angle}</div>
+            <div class="field"><span class="label">Зона давления:</span> {zone}</div>
+            <div class="field"><span class="label">Степень риска:</span> {risk}</div>
+            <div class="field"><span class="label">Уровень боли:</span> {pain}</div>
+        </div>
+        <br>
+        <div class="field"><span class="label">Статус:</span> <span style="{urgent_css}">{urgent}</span></div>
+    </div>
+
+    <div class="section">
+        <h2>Рекомендации и Упражнения</h2>
+        <p>{comment}</p>
+        <ul>{exercises}</ul>
+    </div>
+""")
+
+SUMMARY = Template("""
+    <div class="section">
+        <h2>Динамика</h2>
+        <div class="field"><span class="label">Угол искривления:</span> {angle}</div>
+        <div class="field"><span class="label">Уровень боли:</span> {pain}</div>
+        <div class="field"><span class="label">Визитов со срочным направлением к врачу:</span> {urgent}</div>
+        {chart}
+    </div>
+""")
+
+TABLE = Template("""
+    <div class="section">
+        <h2>Визиты ({count})</h2>
+        <table>
+            <tr><th>Дата</th><th>Боль</th><th>Угол</th><th>Риск</th><th>Зона</th><th>Заключение</th></tr>
+{rows}
+        </table>
+    </div>
+""")
+
+ROW = Template("""            <tr><td>{date}</td><td>{pain}</td><td>{angle}</td><td{urgent_attr}>{risk}</td><td>{zone}</td><td>{comment}{exercises}</td></tr>
+""")
+
+CHART = Template('<img class="chart" alt="График динамики" src="data:image/png;base64,{data}">')
+
+
+# ─── Значения полей ────────────────────────────────────────────────
+def _text(value, empty="—"):
+    return escape(str(value)) if value not in (None, "") else empty
+
+
+def _pain(record):
+    return f"{record.pain_level}/10" if record.pain_level else "Не указан"
+
+
+def _angle(record):
+    return f"{record.angle:g}°" if record.angle is not None else "Не определен"
+
+
+def _exercises(record):
+    return "".join(f"<li>{escape(ex)}</li>" for ex in record.exercises)
+
+
+def _page(title, meta, p, body, warning=""):
+    return PAGE.render({
+        "title": title, "meta": meta, "body": body, "app": APP_TITLE,
+        "name": _text(p.get("name")), "age": _text(p.get("age")),
+        "height": _text(p.get("height")), "weight": _text(p.get("weight")),
+        "warning": _text(warning, DEFAULT_WARNING),
+    })
+
+
+def render_html_report(record, p):
+    # record — VisitRecord, p — профиль пациента
+    date_str = record.date if record.date != "--" else datetime.now().strftime("%d.%m.%Y %H:%M")
+    body = VISIT.render({
+        "angle": _angle(record), "zone": _text(record.zone), "risk": _text(record.risk),
+        "pain": _pain(record),
+        "urgent_css": "color:red;font-weight:bold" if record.urgent else "color:green",
+        "urgent": URGENT_STATUS[bool(record.urgent)],
+        "comment": _text(record.comment, ""), "exercises": _exercises(record),
+    })
+    return _page("Заключение ИИ", f"Дата анализа: {escape(date_str)}", p, body, record.warning)
+
+
+def render_history_report(records, p, title="Отчет по истории визитов", chart=True):
+    # Несколько визитов (или вся история) за один проход: строки таблицы,
+    # точки графика и сводка тренда собираются одновременно.
+    # Визиты выводятся в переданном порядке, график и тренд — по времени.
+    rows, entries = [], []
+    for record in records:
+        rows.append(ROW.render({
+            "date": _text(record.date),
+            "pain": f"{record.pain_level}/10" if record.pain_level else "—",
+            "angle": f"{record.angle:g}°" if record.angle is not None else "—",
+            "risk": _text(record.risk), "zone": _text(record.zone),
+            "urgent_attr": ' class="urgent"' if record.urgent else "",
+            "comment": _text(record.comment, ""),
+            "exercises": f"<ul>{_exercises(record)}</ul>" if record.exercises else "",
+        }))
+        entries.append((chart_point(record), record.risk, record.urgent))
+
+    trend, points = _summarize(entries)
+    image = chart_png(points) if chart and len(points) >= 2 else None
+    body = SUMMARY.render({
+        "angle": escape(trend.angle.describe("°")),
+        "pain": escape(trend.pain.describe("/10", "")),
+        "urgent": str(trend.urgent),
+        "chart": CHART.render({"data": base64.b64encode(image).decode("ascii")}) if image else "",
+    }) + TABLE.render({"count": str(len(rows)), "rows": "".join(rows)})
+
+    return _page(escape(title), escape(_history_meta(points)), p, body)
+
+
+def _summarize(entries):
+    # entries — [(точка графика или None, риск, срочно)] -> (TrendSummary, точки по времени)
+    entries.sort(key=lambda e: e[0][0] if e[0] else "")
+    trend = TrendSummary()
+    for point, risk, urgent in entries:
+        trend.add(point, risk, urgent)
+    return trend, [e[0] for e in entries if e[0]]
+
+
+def _history_meta(points):
+    meta = f"Сформирован: {datetime.now().strftime('%d.%m.%Y %H:%M')}"
+    if points:
+        meta += f" · визиты с {points[0][0][:10]} по {points[-1][0][:10]}"
+    return meta
+
+
+# ─── PDF ───────────────────────────────────────────────────────────
+# Тот же отчет без браузера: pdf.py встраивает шрифт и сам размечает страницы.
+ACCENT = (0.0, 0.706, 0.847)
+GRAY   = (0.45, 0.45, 0.45)
+RED    = (0.85, 0.1, 0.1)
+GREEN  = (0.1, 0.6, 0.2)
+
+
+def _pdf_header(layout, title, meta, p):
+    layout.paragraph(f"Spine Advisor: {title}", 18, bold=True, color=(0.086, 0.129, 0.243))
+    layout.paragraph(meta, 9, color=GRAY)
+    layout.rule()
+    layout.paragraph("Данные пациента", 13, bold=True, color=ACCENT)
+    layout.paragraph(f"ФИО: {p.get('name') or '—'}    Возраст: {p.get('age') or '—'}    "
+                     f"Рост/Вес: {p.get('height') or '—'} см / {p.get('weight') or '—'} кг")
+    layout.skip(8)
+
+
+def _pdf_footer(layout, warning=""):
+    layout.skip(8)
+    layout.paragraph(f"ВАЖНО: {warning or DEFAULT_WARNING}", 9, color=(0.6, 0.35, 0.0))
+    layout.skip(12)
+    layout.paragraph(f"Сгенерировано в приложении {APP_TITLE}", 8, color=GRAY)
+
+
+def _pdf_exercises(layout, record, size=10):
+    for ex in record.exercises:
+        layout.paragraph(f"• {ex}", size, indent=12)
+
+
+def render_pdf_report(record, p, font_path=None):
+    # Заключение по одному визиту -> байты PDF
+    from .pdf import PdfDocument, PdfLayout
+    doc = PdfDocument(font_path, title="Заключение ИИ")
+    layout = PdfLayout(doc)
+    date_str = record.date if record.date != "--" else datetime.now().strftime("%d.%m.%Y %H:%M")
+    _pdf_header(layout, "Заключение ИИ", f"Дата анализа: {date_str}", p)
+
+    layout.paragraph("Результаты диагностики", 13, bold=True, color=ACCENT)
+    layout.paragraph(f"Угол искривления: {_angle(record)}")
+    layout.paragraph(f"Зона давления: {record.zone or '—'}")
+    layout.paragraph(f"Степень риска: {record.risk or '—'}")
+    layout.paragraph(f"Уровень боли: {_pain(record)}")
+    layout.paragraph("Статус: " + URGENT_STATUS[bool(record.urgent)],
+                     bold=True, color=RED if record.urgent else GREEN)
+    layout.skip(8)
+
+    layout.paragraph("Рекомендации и упражнения", 13, bold=True, color=ACCENT)
+    if record.comment:
+        layout.paragraph(record.comment)
+    _pdf_exercises(layout, record)
+    _pdf_footer(layout, record.warning)
+    return doc.to_bytes()
+
+
+def render_history_pdf(records, p, title="Отчет по истории визитов", chart=True, font_path=None):
+    # Несколько визитов -> байты PDF; сводка и график идут перед списком визитов,
+    # поэтому визиты размечаются во вторую очередь — из уже собранного списка
+    from .pdf import PdfDocument, PdfLayout
+    records = list(records)
+    trend, points = _summarize([(chart_point(r), r.risk, r.urgent) for r in records])
+
+    doc = PdfDocument(font_path, title=title)
+    layout = PdfLayout(doc)
+    _pdf_header(layout, title, _history_meta(points), p)
+
+    layout.paragraph("Динамика", 13, bold=True, color=ACCENT)
+    layout.paragraph(f"Угол искривления: {trend.angle.describe('°')}")
+    layout.paragraph(f"Уровень боли: {trend.pain.describe('/10', '')}")
+    layout.paragraph(f"Визитов со срочным направлением к врачу: {trend.urgent}")
+    image = chart_rgb(points) if chart and len(points) >= 2 else None
+    if image:
+        layout.skip(6)
+        layout.image(*image)
+    layout.skip(8)
+
+    layout.paragraph(f"Визиты ({len(records)})", 13, bold=True, color=ACCENT)
+    for record in records:
+        layout.skip(4)
+        parts = [record.date, f"риск: {record.risk or '—'}"]
+        if record.pain_level:
+            parts.append(f"боль {record.pain_level}/10")
+        if record.angle is not None:
+            parts.append(f"угол {record.angle:g}°")
+        layout.paragraph(" · ".join(parts), 10, bold=True,
+                         color=RED if record.urgent else (0.1, 0.1, 0.1))
+        if record.zone:
+            layout.paragraph(f"Зона: {record.zone}", 9, color=GRAY)
+        if record.comment:
+            layout.paragraph(record.comment, 9)
+        _pdf_exercises(layout, record, 9)
+        layout.rule(color=(0.85, 0.85, 0.85), width=0.5, gap=3)
+    _pdf_footer(layout)
+    return doc.to_bytes()
+
+
+# ─── График для отчета ─────────────────────────────────────────────
+def _chart_figure(points):
+    # Figure с графиком угла и боли или None, если нет matplotlib. Рисуется без
+    # pyplot и без Tk (холст Agg), поэтому годится и для фоновых потоков.
+    try:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.dates import DateFormatter, date2num
+        from matplotlib.figure import Figure
+    except ImportError:
+        return None
+
+    nan = float("nan")
+    t     = date2num([datetime.strptime(ts, "%Y-%m-%d %H:%M") for ts, _, _ in points])
+    angle = [a if a is not None else nan for _, a, _ in points]
+    pain  = [v if v is not None else nan for _, _, v in points]
+
+    fig = Figure(figsize=(8, 4), facecolor="white")
+    FigureCanvasAgg(fig)
+    fig.subplots_adjust(hspace=0.5, left=0.1, right=0.97, top=0.9, bottom=0.12)
+    for i, (values, color, marker, ylabel, name) in enumerate((
+            (angle, "#00b4d8", "o", "Угол (°)", "Динамика искривления"),
+            (pain, "#ff5722", "s", "Боль (1-10)", "Уровень боли"))):
+        ax = fig.add_subplot(2, 1, i + 1)
+        ax.plot(t, values, color=color, linewidth=2, marker=marker, markersize=4)
+        ax.set_title(name, fontsize=10, pad=4)
+        ax.set_ylabel(ylabel, fontsize=8)
+        ax.tick_params(labelsize=7)
+        ax.xaxis.set_major_formatter(DateFormatter("%d.%m.%y"))
+        ax.grid(color="#dddddd", linestyle="--")
+    fig.axes[1].set_ylim(0, 10.5)
+    return fig
+
+
+def chart_png(points, dpi=100):
+    fig = _chart_figure(points)
+    if fig is None:
+        return None
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=dpi)
+    return buffer.getvalue()
+
+
+def chart_rgb(points, dpi=150):
+    # (байты RGB, ширина, высота) — для вставки в PDF без разбора PNG
+    fig = _chart_figure(points)
+    if fig is None:
+        return None
+    fig.set_dpi(dpi)
+    fig.canvas.draw()
+    rgba = fig.canvas.buffer_rgba()
+    width, height = rgba.shape[1], rgba.shape[0]
+    rgb = bytearray(width * height * 3)
+    data = bytes(rgba)
+    for channel in range(3):
+        rgb[channel::3] = data[channel::4]
+    return bytes(rgb), width, height
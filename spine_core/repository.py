@@ -0,0 +1,515 @@
+import heapq
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from .records import VisitRecord
+from .search import bm25, query_slots, record_terms, slot_matches
+from .trend import TrendSummary
+
+# ─── SQLITE-ХРАНИЛИЩЕ ПАЦИЕНТОВ И ВИЗИТОВ ──────────────────────────
+# Одна база на всю клинику: профили пациентов и их визиты.
+# Поля, по которым идут выборки (пациент, дата, риск, срочность), вынесены
+# в отдельные индексированные колонки; полная запись хранится как JSON.
+# Запись идет через одно соединение под блокировкой (пачкой — см. batch() и
+# persistence.py), чтение — через второе: в режиме WAL оно видит последнее
+# зафиксированное состояние и не ждет, пока пачка записей дойдет до диска.
+
+DATE_FORMAT = "%d.%m.%Y %H:%M"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS patients (
+    id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    name    TEXT NOT NULL DEFAULT '',
+    profile TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS visits (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    patient_id INTEGER NOT NULL REFERENCES patients(id) ON DELETE CASCADE,
+    ts         TEXT,
+    risk       TEXT,
+    urgent     INTEGER NOT NULL DEFAULT 0,
+    angle      REAL,
+    pain       INTEGER,
+    data       TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS trends (
+    patient_id INTEGER PRIMARY KEY REFERENCES patients(id) ON DELETE CASCADE,
+    data       TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS search_docs (
+    visit_id   INTEGER PRIMARY KEY REFERENCES visits(id) ON DELETE CASCADE,
+    patient_id INTEGER NOT NULL,
+    length     INTEGER NOT NULL,
+    zone       TEXT NOT NULL DEFAULT '',
+    risk       TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS search_terms (
+    patient_id INTEGER NOT NULL,
+    term       TEXT NOT NULL,
+    visit_id   INTEGER NOT NULL REFERENCES visits(id) ON DELETE CASCADE,
+    tf         INTEGER NOT NULL,
+    PRIMARY KEY (patient_id, term, visit_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS revisions (
+    patient_id INTEGER PRIMARY KEY,
+    n          INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_visits_patient_ts     ON visits(patient_id, ts);
+CREATE INDEX IF NOT EXISTS idx_visits_patient_risk   ON visits(patient_id, risk);
+CREATE INDEX IF NOT EXISTS idx_visits_patient_urgent ON visits(patient_id, urgent);
+CREATE INDEX IF NOT EXISTS idx_visits_ts             ON visits(ts);
+CREATE INDEX IF NOT EXISTS idx_search_docs_patient   ON search_docs(patient_id);
+CREATE INDEX IF NOT EXISTS idx_search_terms_visit    ON search_terms(visit_id);
+"""
+
+
+def _sortable_ts(date_str):
+    # "25.02.2026 15:14" -> "2026-02-25 15:14" (лексикографически сортируется)
+    try:
+        return datetime.strptime(date_str, DATE_FORMAT).strftime("%Y-%m-%d %H:%M")
+    except (TypeError, ValueError):
+        return None
+
+
+INSERT_VISIT = ("INSERT INTO visits(patient_id, ts, risk, urgent, angle, pain, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)")
+
+
+def chart_point(record):
+    # (ts, угол, боль) в том же виде, что возвращает chart_points(), или None
+    ts = _sortable_ts(record.date)
+    if ts is None or (record.angle is None and record.pain_level is None):
+        return None
+    return ts, record.angle, record.pain_level
+
+
+def _visit_row(patient_id, record):
+    return (patient_id, _sortable_ts(record.date), record.risk, 1 if record.urgent else 0,
+            record.angle, record.pain_level, record.to_json())
+
+
+class PatientRepository:
+    def __init__(self, path):
+        self.path  = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._read_lock = threading.RLock()
+        self._reader = sqlite3.connect(path, check_same_thread=False)
+        self._reads  = 0        # вложенность snapshot()
+        self._trends = {}       # patient_id -> TrendSummary, копия зафиксированной таблицы trends
+        self._staged = {}       # сводки незафиксированной транзакции (None — сбросить копию)
+        self._depth  = 0        # вложенность batch(): внутри него commit откладывается
+        self._index_missing()
+
+    def close(self):
+        with self._lock, self._read_lock:
+            self._reader.close()
+            self._conn.close()
+
+    @contextmanager
+    def batch(self):
+        # Несколько операций — одна транзакция и один commit (см. persistence.py)
+        with self._lock:
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._depth -= 1
+                if not self._depth:
+                    self._conn.rollback()
+                    self._staged.clear()
+                raise
+            self._depth -= 1
+            self._commit()
+
+    @contextmanager
+    def savepoint(self):
+        # Одна операция внутри batch(): при ошибке откатывается только она,
+        # остальные операции пачки попадают в общий commit
+        with self._lock:
+            if not self._conn.in_transaction:
+                # Иначе RELEASE внешней точки сохранения сам сделал бы commit
+                self._conn.execute("BEGIN")
+            self._conn.execute("SAVEPOINT operation")
+            staged = dict(self._staged)
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._depth -= 1
+                self._conn.execute("ROLLBACK TO operation")
+                self._conn.execute("RELEASE operation")
+                self._staged = staged
+                if not self._depth:
+                    self._conn.rollback()
+                    self._staged.clear()
+                raise
+            self._depth -= 1
+            self._conn.execute("RELEASE operation")
+            self._commit()
+
+    def _commit(self):
+        if not self._depth:
+            self._conn.commit()
+            # Сводки в памяти меняются только вместе с зафиксированной базой
+            for patient_id, trend in self._staged.items():
+                if trend is None:
+                    self._trends.pop(patient_id, None)
+                else:
+                    self._trends[patient_id] = trend
+            self._staged.clear()
+
+    @contextmanager
+    def snapshot(self):
+        # Несколько чтений подряд видят одно и то же зафиксированное состояние
+        with self._read_lock:
+            if not self._reads:
+                self._reader.execute("BEGIN")
+            self._reads += 1
+            try:
+                yield self
+            finally:
+                self._reads -= 1
+                if not self._reads:
+                    self._reader.commit()
+
+    def _query(self, sql, params=()):
+        # Чтение — через свое соединение, не дожидаясь записи
+        with self._read_lock:
+            return self._reader.execute(sql, params).fetchall()
+
+    def _read_own(self, sql, params=()):
+        # Чтение внутри записи: видит и еще не зафиксированные изменения этой пачки
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            cur = self._conn.execute(sql, params)
+            self._commit()
+            return cur
+
+    # ─── Пациенты ──────────────────────────────────────────────────
+    def is_empty(self):
+        return not self._query("SELECT 1 FROM patients LIMIT 1")
+
+    def list_patients(self):
+        return self._query("SELECT id, name FROM patients ORDER BY name COLLATE NOCASE, id")
+
+    def create_patient(self, profile=None):
+        profile = profile or {}
+        cur = self._execute("INSERT INTO patients(name, profile) VALUES (?, ?)",
+                            (profile.get("name", ""), json.dumps(profile, ensure_ascii=False)))
+        return cur.lastrowid
+
+    def has_patient(self, patient_id):
+        return bool(self._query("SELECT 1 FROM patients WHERE id = ?", (patient_id,)))
+
+    def get_profile(self, patient_id):
+        rows = self._query("SELECT profile FROM patients WHERE id = ?", (patient_id,))
+        return json.loads(rows[0][0]) if rows else {}
+
+    def save_profile(self, patient_id, profile):
+        self._execute("UPDATE patients SET name = ?, profile = ? WHERE id = ?",
+                      (profile.get("name", ""), json.dumps(profile, ensure_ascii=False), patient_id))
+
+    def delete_patient(self, patient_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM patients WHERE id = ?", (patient_id,))
+            self._bump(patient_id)
+            self._staged[patient_id] = None
+            self._commit()
+
+    def get_meta(self, key, default=None):
+        rows = self._query("SELECT value FROM meta WHERE key = ?", (key,))
+        return rows[0][0] if rows else default
+
+    def set_meta(self, key, value):
+        self._execute("INSERT OR REPLACE INTO meta(key, value) VALUES (?, ?)", (key, str(value)))
+
+    # ─── Визиты ────────────────────────────────────────────────────
+    def add_visit(self, patient_id, record):
+        # Визит, сводка, поисковый индекс и ревизия — одна точка сохранения:
+        # ошибка на любом шаге откатывает все. Сводка дописывается в копию и
+        # попадает в память только после commit
+        record = VisitRecord.from_dict(record)
+        with self.savepoint():
+            trend = self._trend(patient_id).copy()
+            cur = self._conn.execute(INSERT_VISIT, _visit_row(patient_id, record))
+            trend.add(chart_point(record), record.risk, record.urgent)
+            self._save_trend(patient_id, trend)
+            self._index_visit(cur.lastrowid, patient_id, record)
+            self._bump(patient_id)
+            self._staged[patient_id] = trend
+        return cur.lastrowid
+
+    def clear_visits(self, patient_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM search_terms WHERE patient_id = ?", (patient_id,))
+            self._conn.execute("DELETE FROM search_docs WHERE patient_id = ?", (patient_id,))
+            self._conn.execute("DELETE FROM visits WHERE patient_id = ?", (patient_id,))
+            self._conn.execute("DELETE FROM trends WHERE patient_id = ?", (patient_id,))
+            self._bump(patient_id)
+            self._staged[patient_id] = None
+            self._commit()
+
+    def revision(self, patient_id):
+        # Растет при каждом добавлении и очистке визитов пациента: экран, отрисованный
+        # при той же ревизии, перечитывать не нужно. Пишется в той же транзакции,
+        # что и визиты, поэтому читающее соединение видит их вместе
+        rows = self._query("SELECT n FROM revisions WHERE patient_id = ?", (patient_id,))
+        return rows[0][0] if rows else 0
+
+    def _bump(self, patient_id):
+        self._conn.execute("INSERT INTO revisions(patient_id, n) VALUES (?, 1) "
+                           "ON CONFLICT(patient_id) DO UPDATE SET n = n + 1", (patient_id,))
+
+    def trend(self, patient_id):
+        # Копия: рабочий поток читает сводку, пока GUI может дописывать визит
+        with self._lock:
+            return self._trend(patient_id).copy()
+
+    def _trend(self, patient_id):
+        # Сводка хранится в базе; пересчет по визитам — только если ее еще нет
+        # (база старой версии, миграция из JSON)
+        with self._lock:
+            trend = self._staged.get(patient_id, self._trends.get(patient_id))
+            if trend is not None:
+                return trend
+            rows = self._read_own("SELECT data FROM trends WHERE patient_id = ?", (patient_id,))
+            if rows:
+                trend = TrendSummary.from_dict(json.loads(rows[0][0]))
+            else:
+                trend = TrendSummary()
+                for ts, angle, pain, risk, urgent in self._read_own(
+                        "SELECT ts, angle, pain, risk, urgent FROM visits "
+                        "WHERE patient_id = ? ORDER BY ts, id", (patient_id,)):
+                    point = (ts, angle, pain) if ts and (angle is not None
+                                                        or pain is not None) else None
+                    trend.add(point, risk, urgent)
+                self._save_trend(patient_id, trend)
+            self._staged[patient_id] = trend
+            self._commit()
+            return trend
+
+    def _save_trend(self, patient_id, trend):
+        self._conn.execute("INSERT OR REPLACE INTO trends(patient_id, data) VALUES (?, ?)",
+                           (patient_id, json.dumps(trend.to_dict(), ensure_ascii=False)))
+
+    def _where(self, patient_id, risk, urgent, date_from, date_to):
+        clauses, params = [], []
+        if patient_id is not None:
+            clauses.append("patient_id = ?"); params.append(patient_id)
+        if risk is not None:
+            clauses.append("risk = ?"); params.append(risk)
+        if urgent is not None:
+            clauses.append("urgent = ?"); params.append(1 if urgent else 0)
+        if date_from is not None:
+            clauses.append("ts >= ?"); params.append(date_from.strftime("%Y-%m-%d %H:%M"))
+        if date_to is not None:
+            clauses.append("ts <= ?"); params.append(date_to.strftime("%Y-%m-%d %H:%M"))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query_visits(self, patient_id=None, risk=None, urgent=None, date_from=None, date_to=None,
+                     offset=0, limit=50, newest_first=True):
+        where, params = self._where(patient_id, risk, urgent, date_from, date_to)
+        order = "DESC" if newest_first else "ASC"
+        rows = self._query(
+            f"SELECT data FROM visits{where} ORDER BY ts {order}, id {order} LIMIT ? OFFSET ?",
+            params + [limit, offset])
+        return [VisitRecord.from_json(r[0]) for r in rows]
+
+    def count_visits(self, patient_id=None, risk=None, urgent=None, date_from=None, date_to=None):
+        where, params = self._where(patient_id, risk, urgent, date_from, date_to)
+        return self._query(f"SELECT COUNT(*) FROM visits{where}", params)[0][0]
+
+    def chart_points(self, patient_id):
+        # Только колонки для графика, без разбора JSON всей записи
+        return self._query(
+            "SELECT ts, angle, pain FROM visits WHERE patient_id = ? AND ts IS NOT NULL "
+            "AND (angle IS NOT NULL OR pain IS NOT NULL) ORDER BY ts, id", (patient_id,))
+
+    def chart_snapshot(self, patient_id):
+        # Точки графика и ревизия, при которой они прочитаны, — из одного снимка:
+        # commit из другого потока не может попасть между ними
+        with self.snapshot():
+            return self.revision(patient_id), self.chart_points(patient_id)
+
+    def history(self, patient_id):
+        return PatientHistory(self, patient_id)
+
+    # ─── Полнотекстовый поиск (см. search.py) ──────────────────────
+    def _index_visit(self, visit_id, patient_id, record):
+        terms = record_terms(record)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO search_docs(visit_id, patient_id, length, zone, risk) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (visit_id, patient_id, sum(terms.values()), record.zone.lower(), record.risk))
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO search_terms(patient_id, term, visit_id, tf) VALUES (?, ?, ?, ?)",
+            [(patient_id, term, visit_id, tf) for term, tf in terms.items()])
+
+    def _index_missing(self):
+        # Визиты из базы, созданной до появления индекса, индексируются при открытии —
+        # поиск из GUI-потока не должен ждать блокировки записи
+        with self._lock:
+            rows = self._read_own(
+                "SELECT v.id, v.patient_id, v.data FROM visits v "
+                "LEFT JOIN search_docs d ON d.visit_id = v.id WHERE d.visit_id IS NULL")
+            for visit_id, patient_id, data in rows:
+                self._index_visit(visit_id, patient_id, VisitRecord.from_json(data))
+            self._commit()
+
+    def search_visits(self, patient_id, text="", risk=None, zone=None, date_from=None,
+                      date_to=None, limit=200):
+        # Визиты пациента по убыванию релевантности (BM25), без текста — новые сверху.
+        # risk и zone — подстроки в нижнем регистре («высок», «поясничн»).
+        return self._search(patient_id, text, risk, zone, date_from, date_to, limit)[0]
+
+    def search_page(self, patient_id, text="", offset=0, limit=50, **filters):
+        # (число всех совпадений, записи offset..offset+limit) — для постраничной выдачи
+        records, total = self._search(patient_id, text, limit=offset + limit, **filters)
+        return total, records[offset:]
+
+    def _search(self, patient_id, text="", risk=None, zone=None, date_from=None,
+                date_to=None, limit=200):
+        # (первые limit записей, число всех совпадений) — из одного снимка базы
+        with self.snapshot():
+            return self._rank(patient_id, text, risk, zone, date_from, date_to, limit)
+
+    def _rank(self, patient_id, text, risk, zone, date_from, date_to, limit):
+        clauses, params = ["d.patient_id = ?"], [patient_id]
+        if risk:
+            clauses.append("d.risk LIKE ?"); params.append(f"%{risk}%")
+        if zone:
+            clauses.append("d.zone LIKE ?"); params.append(f"%{zone}%")
+        if date_from is not None:
+            clauses.append("v.ts >= ?"); params.append(date_from.strftime("%Y-%m-%d %H:%M"))
+        if date_to is not None:
+            clauses.append("v.ts <= ?"); params.append(date_to.strftime("%Y-%m-%d %H:%M"))
+        where = " AND ".join(clauses)
+        # Таблица визитов нужна только для фильтра по дате
+        join  = " JOIN visits v ON v.id = d.visit_id" if (date_from, date_to) != (None, None) else ""
+        scope = f"FROM search_docs d{join} WHERE {where}"
+
+        slots = query_slots(text)
+        if not slots:
+            rows = self._query(
+                "SELECT v.data FROM search_docs d JOIN visits v ON v.id = d.visit_id "
+                f"WHERE {where} ORDER BY v.ts DESC, v.id DESC LIMIT ?", params + [limit])
+            found = self._query(f"SELECT COUNT(*) {scope}", params)[0][0]
+            return [VisitRecord.from_json(r[0]) for r in rows], found
+
+        # Все основы запроса одним проходом по индексу (patient_id, term)
+        match, match_params = [], []
+        for exact, prefix in slots:
+            match.append("t.term = ?"); match_params.append(exact)
+            if prefix:
+                match.append("(t.term >= ? AND t.term < ?)")
+                match_params += [prefix, prefix + "\uffff"]
+        rows = self._query(
+            "SELECT t.term, t.visit_id, t.tf, d.length FROM search_terms t "
+            f"JOIN search_docs d ON d.visit_id = t.visit_id{join} "
+            f"WHERE t.patient_id = ? AND ({' OR '.join(match)}) AND {where}",
+            [patient_id] + match_params + params)
+        if not rows:
+            return [], 0
+
+        postings, lengths = {slot: {} for slot in slots}, {}
+        for term, visit_id, tf, length in rows:
+            lengths[visit_id] = length
+            for slot in slots:
+                if slot_matches(slot, term):
+                    docs = postings[slot]
+                    docs[visit_id] = max(docs.get(visit_id, 0), tf)
+        total, avg_length = self._query(f"SELECT COUNT(*), AVG(d.length) {scope}", params)[0]
+        scores = bm25(postings, lengths, total, avg_length)
+        # При равной релевантности — более поздний визит выше
+        ranked = heapq.nlargest(limit, scores, key=lambda vid: (scores[vid], vid))
+
+        marks = ",".join("?" * len(ranked))
+        data = dict(self._query(f"SELECT id, data FROM visits WHERE id IN ({marks})", ranked))
+        return [VisitRecord.from_json(data[vid]) for vid in ranked], len(scores)
+
+    # ─── Миграция со старых JSON-файлов ────────────────────────────
+    def migrate_from_json(self, profile_path, history_store):
+        profile = {}
+        if os.path.exists(profile_path):
+            try:
+                with open(profile_path, "r", encoding="utf-8") as f:
+                    profile = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                profile = {}
+        records = history_store.records()
+        if not profile and not records:
+            return None
+
+        patient_id = self.create_patient(profile if isinstance(profile, dict) else {})
+        with self._lock:
+            for record in records:
+                cur = self._conn.execute(INSERT_VISIT, _visit_row(patient_id, record))
+                self._index_visit(cur.lastrowid, patient_id, record)
+            self._commit()
+        return patient_id
+
+
+class PatientHistory:
+    # Тот же интерфейс, что у HistoryStore, но в рамках одного пациента
+    def __init__(self, repo, patient_id):
+        self.repo       = repo
+        self.patient_id = patient_id
+
+    def append(self, record):
+        self.repo.add_visit(self.patient_id, record)
+
+    def clear(self):
+        self.repo.clear_visits(self.patient_id)
+
+    def count(self, **filters):
+        return self.repo.count_visits(self.patient_id, **filters)
+
+    def page(self, offset=0, limit=50, newest_first=True, **filters):
+        return self.repo.query_visits(self.patient_id, offset=offset, limit=limit,
+                                      newest_first=newest_first, **filters)
+
+    def last(self, n=1):
+        return list(reversed(self.page(0, n))) if n > 0 else []
+
+    def records(self):
+        return self.page(0, -1, newest_first=False)
+
+    def chart_points(self):
+        return self.repo.chart_points(self.patient_id)
+
+    def chart_snapshot(self):
+        return self.repo.chart_snapshot(self.patient_id)
+
+    def trend(self):
+        return self.repo.trend(self.patient_id)
+
+    def revision(self):
+        return self.repo.revision(self.patient_id)
+
+    def search(self, text="", **filters):
+        return self.repo.search_visits(self.patient_id, text, **filters)
+
+    def search_page(self, text="", offset=0, limit=50, **filters):
+        return self.repo.search_page(self.patient_id, text, offset, limit, **filters)
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return iter(self.records())
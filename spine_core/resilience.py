@@ -0,0 +1,252 @@
+import random
+import re
+import threading
+import time
+from collections import deque
+
+from .backends import BackendError
+from .context import estimate_tokens as estimate_text_tokens
+
+# ─── УСТОЙЧИВЫЙ ВЫЗОВ МОДЕЛИ ───────────────────────────────────────
+# ResilientBackend оборачивает любой бэкенд (см. backends.py) и сам им является:
+#   • временные ошибки (429, 5xx, обрывы соединения) повторяются с
+#     экспоненциальной задержкой и случайным разбросом; если сервер прислал
+#     retry-after — ждем именно столько;
+#   • запросы и токены в минуту не превышают квоту — лишний запрос ждет
+#     освобождения окна, а не получает 429;
+#   • после серии временных ошибок подряд «предохранитель» размыкается и на время
+#     cooldown все запросы сразу завершаются CircuitOpenError, не нагружая API;
+#   • metrics() — счетчики для строки состояния и бенчмарка.
+
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+IMAGE_TOKENS    = 258       # столько токенов Gemini считает за одно изображение
+
+
+class CircuitOpenError(BackendError):
+    def __init__(self, retry_in):
+        super().__init__(f"Сервис модели недоступен, повтор через {retry_in:.0f} с",
+                         retryable=False)
+        self.retry_in = retry_in
+
+
+class ResilienceConfig:
+    def __init__(self, attempts=4, base_delay=1.0, max_delay=30.0,
+                 requests_per_minute=30, tokens_per_minute=250_000,
+                 breaker_threshold=5, breaker_cooldown=30.0):
+        self.attempts            = attempts             # всего попыток, включая первую
+        self.base_delay          = base_delay
+        self.max_delay           = max_delay
+        self.requests_per_minute = requests_per_minute  # 0 — без ограничения
+        self.tokens_per_minute   = tokens_per_minute
+        self.breaker_threshold   = breaker_threshold    # ошибок подряд до размыкания
+        self.breaker_cooldown    = breaker_cooldown
+
+
+def estimate_tokens(contents):
+    # Грубая оценка до отправки: текст по context.py + фиксированно за снимок
+    parts = contents if isinstance(contents, list) else [contents]
+    tokens = 0
+    for part in parts:
+        if isinstance(part, str):
+            tokens += estimate_text_tokens(part)
+        else:
+            tokens += IMAGE_TOKENS
+    return tokens
+
+
+def is_retryable(error):
+    flag = getattr(error, "retryable", None)
+    if flag is not None:
+        return flag
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    code = getattr(error, "code", None)     # google.api_core.exceptions.*
+    try:
+        return int(code) in RETRYABLE_CODES
+    except (TypeError, ValueError):
+        return False
+
+
+def retry_after(error):
+    # Секунды из retry-after: атрибут, заголовок ответа или текст ошибки Gemini
+    value = getattr(error, "retry_after", None)
+    if value is None:
+        response = getattr(error, "response", None)
+        headers  = getattr(response, "headers", None) or {}
+        value = headers.get("retry-after") or headers.get("Retry-After")
+    if value is None:
+        match = re.search(r"retry[ _]?(?:in|delay)\D{0,20}?([\d.]+)\s*s", str(error), re.I)
+        value = match and match.group(1)
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+class MinuteBudget:
+    # Скользящее окно в 60 с по числу запросов и сумме токенов
+    WINDOW = 60.0
+
+    def __init__(self, requests_per_minute, tokens_per_minute, clock=time.monotonic):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute   = tokens_per_minute
+        self.clock   = clock
+        self._window = deque()      # (время, токены)
+        self._tokens = 0
+        self._lock   = threading.Lock()
+
+    def reserve(self, tokens):
+        # Сколько ждать до отправки; 0 — место в окне уже занято под этот запрос
+        with self._lock:
+            now = self.clock()
+            while self._window and now - self._window[0][0] >= self.WINDOW:
+                self._tokens -= self._window.popleft()[1]
+            wait = 0.0
+            if self.requests_per_minute and len(self._window) >= self.requests_per_minute:
+                wait = self._window[0][0] + self.WINDOW - now
+            if (self.tokens_per_minute and self._window
+                    and self._tokens + tokens > self.tokens_per_minute):
+                freed, need = self._tokens, self._tokens + tokens - self.tokens_per_minute
+                for t, n in self._window:
+                    freed -= n
+                    if self._tokens - freed >= need:
+                        wait = max(wait, t + self.WINDOW - now)
+                        break
+            if wait <= 0:
+                self._window.append((now, tokens))
+                self._tokens += tokens
+            return max(0.0, wait)
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, threshold, cooldown, clock=time.monotonic):
+        self.threshold = threshold
+        self.cooldown  = cooldown
+        self.clock     = clock
+        self.state     = self.CLOSED
+        self.failures  = 0
+        self.opens     = 0
+        self._opened   = 0.0
+        self._lock     = threading.Lock()
+
+    def before_call(self):
+        # Разомкнут — сразу ошибка; после cooldown пропускается одна пробная попытка
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            left = self._opened + self.cooldown - self.clock()
+            if self.state == self.OPEN and left <= 0:
+                self.state = self.HALF_OPEN
+                return
+            raise CircuitOpenError(max(left, 0.0))
+
+    def success(self):
+        with self._lock:
+            self.state, self.failures = self.CLOSED, 0
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.threshold
+                                                and self.failures >= self.threshold):
+                if self.state != self.OPEN:
+                    self.opens += 1
+                self.state, self._opened = self.OPEN, self.clock()
+
+
+class ResilientBackend:
+    def __init__(self, backend, config=None, sleep=time.sleep, clock=time.monotonic, seed=None):
+        self.backend = backend
+        self.config  = config or ResilienceConfig()
+        self.sleep   = sleep
+        self.budget  = MinuteBudget(self.config.requests_per_minute,
+                                    self.config.tokens_per_minute, clock)
+        self.breaker = CircuitBreaker(self.config.breaker_threshold,
+                                      self.config.breaker_cooldown, clock)
+        self.counters = {"requests": 0, "succeeded": 0, "failed": 0, "retries": 0,
+                         "rejected": 0, "tokens": 0, "throttled_sec": 0.0}
+        self._random = random.Random(seed)
+        self._lock   = threading.Lock()
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def metrics(self):
+        with self._lock:
+            snapshot = dict(self.counters)
+        snapshot["breaker"] = self.breaker.state
+        snapshot["breaker_opens"] = self.breaker.opens
+        return snapshot
+
+    def backoff(self, attempt, error):
+        hint = retry_after(error)
+        if hint is not None:
+            return min(hint, self.config.max_delay * 4)
+        # «Полный» разброс: равномерно от 0 до экспоненциального потолка
+        ceiling = min(self.config.max_delay, self.config.base_delay * 2 ** attempt)
+        with self._lock:
+            return self._random.uniform(0, ceiling)
+
+    def generate_content(self, contents, stream=False):
+        tokens = estimate_tokens(contents)
+        self._count("requests")
+        attempt = 0
+        while True:
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                self._count("rejected")
+                raise
+            self._wait_budget(tokens)
+            try:
+                response = self._call(contents, stream)
+            except Exception as e:
+                retryable = is_retryable(e)
+                if retryable:
+                    self.breaker.failure()
+                else:
+                    # Ошибка запроса (400, ключ API): сервис ответил, значит доступен —
+                    # такие ошибки не размыкают предохранитель и закрывают пробную попытку
+                    self.breaker.success()
+                attempt += 1
+                if not retryable or attempt >= self.config.attempts:
+                    self._count("failed")
+                    raise
+                self._count("retries")
+                self.sleep(self.backoff(attempt - 1, e))
+                continue
+            self.breaker.success()
+            self._count("succeeded")
+            return response
+
+    def _wait_budget(self, tokens):
+        while True:
+            wait = self.budget.reserve(tokens)
+            if not wait:
+                self._count("tokens", tokens)
+                return
+            self._count("throttled_sec", wait)
+            self.sleep(wait)
+
+    def _call(self, contents, stream):
+        if not stream:
+            return self.backend.generate_content(contents)
+        # Ошибка потока обычно случается до первого куска — его читаем здесь,
+        # чтобы такую попытку можно было повторить. Обрыв посреди ответа не повторяется.
+        chunks = iter(self.backend.generate_content(contents, stream=True))
+        first = next(chunks, None)
+        return _Resumed(first, chunks)
+
+
+class _Resumed:
+    def __init__(self, first, rest):
+        self.first = first
+        self.rest  = rest
+
+    def __iter__(self):
+        if self.first is not None:
+            yield self.first
+        yield from self.rest
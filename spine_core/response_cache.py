@@ -0,0 +1,81 @@
+import hashlib
+import sqlite3
+import threading
+import time
+
+# ─── КЭШ ОТВЕТОВ МОДЕЛИ ────────────────────────────────────────────
+# Ключ — SHA-256 от текста запроса и байтов снимка. Хранится на диске
+# (SQLite), вытесняется по TTL и по давности последнего обращения (LRU).
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key         TEXT PRIMARY KEY,
+    response    TEXT NOT NULL,
+    created     REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access);
+"""
+
+
+def request_key(prompt, image_bytes=None):
+    h = hashlib.sha256()
+    h.update(prompt.encode("utf-8"))
+    h.update(b"\0")
+    if image_bytes:
+        h.update(image_bytes)
+    return h.hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path, max_entries=500, ttl_seconds=7 * 24 * 3600, clock=time.time):
+        self.max_entries = max_entries
+        self.ttl         = ttl_seconds
+        self.clock       = clock        # подменяется в тестах
+        self.hits        = 0
+        self.misses      = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def get(self, key):
+        now = self.clock()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, response):
+        now = self.clock()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses(key, response, created, last_access) VALUES (?, ?, ?, ?)",
+                (key, response, now, now))
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        self._conn.execute(
+            "DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+            "ORDER BY last_access DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": size}
@@ -0,0 +1,130 @@
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .telemetry import METRICS
+
+# ─── ПЛАНИРОВЩИК АНАЛИЗОВ ──────────────────────────────────────────
+# Ограниченный пул потоков + очередь ожидающих задач. Каждое изменение
+# состояния задачи и каждое промежуточное сообщение от run (report)
+# кладется в один канал events тройкой (задача, состояние на момент события,
+# сообщение или None), который GUI опрашивает из своего цикла (poll) — потоки
+# не трогают виджеты напрямую. Состояние берется из события, а не из job.state:
+# за один опрос быстрая задача успевает пройти PENDING, RUNNING и DONE.
+
+PENDING   = "pending"
+RUNNING   = "running"
+DONE      = "done"
+FAILED    = "failed"
+CANCELLED = "cancelled"
+
+ACTIVE_STATES = (PENDING, RUNNING)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class AnalysisJob:
+    def __init__(self, job_id, label, request, trace=None):
+        self.id      = job_id
+        self.label   = label
+        self.request = request
+        self.trace   = trace       # метка спанов задачи в telemetry.py
+        self.state   = PENDING
+        self.result  = None
+        self.error   = None
+        self.future  = None
+        self.submitted = time.perf_counter()
+        self.cancel_requested = False
+
+    @property
+    def active(self):
+        return self.state in ACTIVE_STATES
+
+
+class AnalysisScheduler:
+    def __init__(self, run, max_workers=2, max_pending=20, name="analysis"):
+        self.run         = run
+        self.name        = name        # префикс этапов в замерах: analysis.queue, analysis.run
+        self.max_pending = max_pending
+        self.events      = queue.Queue()
+        self.jobs        = {}
+        self._ids        = itertools.count(1)
+        self._lock       = threading.Lock()
+        self._executor   = ThreadPoolExecutor(max_workers=max_workers,
+                                              thread_name_prefix=name)
+
+    def submit(self, label, request):
+        with self._lock:
+            pending = sum(1 for j in self.jobs.values() if j.state == PENDING)
+            if pending >= self.max_pending:
+                raise QueueFullError(f"В очереди уже {pending} анализов")
+            job_id = next(self._ids)
+            job = AnalysisJob(job_id, label, request, f"{self.name}-{job_id}")
+            self.jobs[job.id] = job
+        self.events.put((job, PENDING, None))
+        job.future = self._executor.submit(self._execute, job)
+        return job
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or not job.active:
+            return False
+        # Ожидающую задачу снимаем с очереди; у запущенной результат будет отброшен
+        job.cancel_requested = True
+        if job.future is not None and job.future.cancel():
+            self._set_state(job, CANCELLED)
+        return True
+
+    def active_count(self):
+        return sum(1 for j in self.jobs.values() if j.active)
+
+    def poll(self):
+        # Вызывается из GUI-потока: забирает все накопившиеся события
+        changed = []
+        while True:
+            try:
+                changed.append(self.events.get_nowait())
+            except queue.Empty:
+                return changed
+
+    def forget_finished(self, keep=10):
+        with self._lock:
+            finished = [j.id for j in self.jobs.values() if not j.active]
+            for job_id in finished[:max(0, len(finished) - keep)]:
+                del self.jobs[job_id]
+
+    def shutdown(self):
+        for job in list(self.jobs.values()):
+            if job.state == PENDING:
+                self.cancel(job.id)
+        self._executor.shutdown(wait=False)
+
+    def _set_state(self, job, state):
+        job.state = state
+        self.events.put((job, state, None))
+
+    def _report(self, job, update):
+        if not job.cancel_requested:
+            self.events.put((job, RUNNING, update))
+
+    def _execute(self, job):
+        if job.cancel_requested:
+            self._set_state(job, CANCELLED)
+            return
+        self._set_state(job, RUNNING)
+        try:
+            with METRICS.tracing(job.trace):
+                METRICS.observe(f"{self.name}.queue", time.perf_counter() - job.submitted)
+                with METRICS.span(f"{self.name}.run"):
+                    result = self.run(job.request, lambda update: self._report(job, update))
+        except Exception as e:
+            METRICS.count(f"{self.name}.failed")
+            job.error = e
+            self._set_state(job, CANCELLED if job.cancel_requested else FAILED)
+            return
+        job.result = result
+        self._set_state(job, CANCELLED if job.cancel_requested else DONE)
@@ -0,0 +1,170 @@
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+
+# ─── ПОЛНОТЕКСТОВЫЙ ПОИСК ПО ВИЗИТАМ ───────────────────────────────
+# Текст визита (жалобы, заключение, динамика, упражнения) разбивается на
+# слова, каждое приводится к основе стеммером Портера для русского языка
+# (Snowball), так что «болит», «боли» и «болью» находят друг друга.
+# Основы и их частоты хранит репозиторий (таблицы search_*), дописывая их
+# вместе с визитом; здесь — только разбор текста и ранжирование BM25.
+
+TEXT_FIELDS = ("symptoms", "comment", "dynamics_comment", "exercises", "zone", "stiffness")
+
+BM25_K1 = 1.2
+BM25_B  = 0.75
+
+STOP_WORDS = frozenset("""
+и в во не что он на я с со как а то все она так его но да ты к у же вы за бы по
+только ее мне было вот от меня еще нет о из ему теперь когда даже ну ли если уже
+или ни быть был него до вас нибудь опять уж вам ведь там потом себя ничего ей
+может они тут где есть надо ней для мы тебя их чем была сам чтоб без будто чего
+раз тоже себе под будет ж тогда кто этот того потому этого какой совсем ним
+здесь этом один почти мой тем чтобы нее сейчас были куда зачем всех никогда
+можно при наконец два об другой хоть после над больше тот через эти нас про
+всего них какая много разве три эту моя впрочем хорошо свою этой перед иногда
+лучше чуть том нельзя такой им более всегда конечно всю между это
+""".split())
+
+_WORD = re.compile(r"[а-яёa-z0-9]+")
+
+# ─── Стеммер Snowball для русского языка ───────────────────────────
+_VOWELS = "аеиоуыэюя"
+
+# (окончание, нужна ли перед ним «а»/«я») — от длинных к коротким
+def _endings(group1, group2=""):
+    items = [(e, True) for e in group1.split()] + [(e, False) for e in group2.split()]
+    return sorted(items, key=lambda item: -len(item[0]))
+
+
+_GERUND      = _endings("в вши вшись", "ив ивши ившись ыв ывши ывшись")
+_ADJECTIVE   = _endings("", "ее ие ые ое ими ыми ей ий ый ой ем им ым ом его ого ему ому "
+                            "их ых ую юю ая яя ою ею")
+_PARTICIPLE  = _endings("ем нн вш ющ щ", "ивш ывш ующ")
+_REFLEXIVE   = _endings("", "ся сь")
+_VERB        = _endings("ла на ете йте ли й л ем н ло но ет ют ны ть ешь нно",
+                        "ила ыла ена ейте уйте ите или ыли ей уй ил ыл им ым ен ило ыло "
+                        "ено ят ует уют ит ыт ены ить ыть ишь ую ю")
+_NOUN        = _endings("", "а ев ов ие ье е иями ями ами еи ии и ией ей ой ий й иям ям "
+                            "ием ем ам ом о у ах иях ях ы ь ию ью ю ия ья я")
+_SUPERLATIVE = _endings("", "ейше ейш")
+_DERIVATIONAL = _endings("", "ость ост")
+
+
+def _region(word, start):
+    # Позиция после первой согласной, идущей за гласной (начиная со start)
+    for i in range(start + 1, len(word)):
+        if word[i] not in _VOWELS and word[i - 1] in _VOWELS:
+            return i + 1
+    return len(word)
+
+
+def _strip(word, start, endings):
+    # Отрезает самое длинное подходящее окончание, лежащее не левее start
+    for ending, after_a in endings:
+        cut = len(word) - len(ending)
+        if cut < start or not word.endswith(ending):
+            continue
+        if after_a and (cut - 1 < start or word[cut - 1] not in "ая"):
+            continue
+        return word[:cut]
+    return None
+
+
+@lru_cache(maxsize=65536)      # словарь медицинских записей невелик — основы повторяются
+def stem(word):
+    word = word.replace("ё", "е")
+    rv = next((i + 1 for i, c in enumerate(word) if c in _VOWELS), len(word))
+    if rv >= len(word):
+        return word
+    r2 = _region(word, _region(word, 0) - 1)
+
+    # Шаг 1: деепричастие, иначе возвратность + прилагательное/глагол/существительное
+    stripped = _strip(word, rv, _GERUND)
+    if stripped is None:
+        word = _strip(word, rv, _REFLEXIVE) or word
+        stripped = _strip(word, rv, _ADJECTIVE)
+        if stripped is not None:
+            stripped = _strip(stripped, rv, _PARTICIPLE) or stripped
+        else:
+            stripped = _strip(word, rv, _VERB)
+            if stripped is None:
+                stripped = _strip(word, rv, _NOUN)
+    if stripped is not None:
+        word = stripped
+
+    # Шаг 2: конечная «и»
+    if word.endswith("и") and len(word) - 1 >= rv:
+        word = word[:-1]
+
+    # Шаг 3: словообразовательное окончание в R2
+    word = _strip(word, r2, _DERIVATIONAL) or word
+
+    # Шаг 4: «нн» -> «н», превосходная степень, мягкий знак
+    if word.endswith("нн") and len(word) - 1 >= rv:
+        return word[:-1]
+    stripped = _strip(word, rv, _SUPERLATIVE)
+    if stripped is not None:
+        word = stripped
+        return word[:-1] if word.endswith("нн") else word
+    if word.endswith("ь") and len(word) - 1 >= rv:
+        word = word[:-1]
+    return word
+
+
+# ─── Разбор текста и ранжирование ──────────────────────────────────
+def tokenize(text):
+    # Основы слов без стоп-слов; латиница и числа («L4», «5») — как есть
+    terms = []
+    for word in _WORD.findall(text.lower()):
+        if word in STOP_WORDS or (len(word) < 2 and not word.isdigit()):
+            continue
+        terms.append(stem(word) if not word.isascii() else word)
+    return terms
+
+
+def record_text(record):
+    parts = []
+    for field in TEXT_FIELDS:
+        value = getattr(record, field)
+        if isinstance(value, list):
+            parts.extend(str(v) for v in value)
+        elif value:
+            parts.append(str(value))
+    return " ".join(parts)
+
+
+def record_terms(record):
+    # Counter основ для индекса
+    return Counter(tokenize(record_text(record)))
+
+
+def query_slots(text):
+    # Слова запроса как [(основа, префикс или None)]. Последнее недописанное
+    # слово ищется еще и как префикс, чтобы поиск работал по мере набора.
+    slots = [(term, None) for term in dict.fromkeys(tokenize(text))]
+    words = _WORD.findall(text.lower())
+    if words and not text[-1:].isspace():
+        last = words[-1].replace("ё", "е")
+        if last not in STOP_WORDS:
+            exact = stem(last) if not last.isascii() else last
+            slots = [s for s in slots if s[0] != exact] + [(exact, last)]
+    return slots
+
+
+def slot_matches(slot, term):
+    exact, prefix = slot
+    return term == exact or (prefix is not None and term.startswith(prefix))
+
+
+def bm25(postings, doc_lengths, total_docs, avg_length):
+    # postings: {основа: {visit_id: tf}} -> {visit_id: score}
+    scores = {}
+    avg_length = avg_length or 1
+    for docs in postings.values():
+        idf = math.log(1 + (total_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+        for visit_id, tf in docs.items():
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths[visit_id] / avg_length)
+            scores[visit_id] = scores.get(visit_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+    return scores
@@ -0,0 +1,409 @@
+import asyncio
+import base64
+import binascii
+import math
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from .analysis import AnalysisRequest, make_record, parse_response, run_analysis
+from .backends import BackendError
+from .export import FORMATS, ExportTask, render
+from .persistence import WriteBehind
+from .records import RecordError, dumps, loads, to_pain
+from .telemetry import METRICS
+
+# ─── HTTP-СЕРВИС АНАЛИЗА ───────────────────────────────────────────
+# Тот же конвейер, что в окне приложения, без Tk: несколько рабочих мест
+# обращаются к одному процессу по HTTP/1.1 (keep-alive, JSON). Каждый запрос
+# работает со снимком профиля и историей своего пациента, а не с общим
+# состоянием формы. Анализы одного пациента выполняются по очереди (иначе
+# второй не увидит первый как «предыдущий визит»), разных — параллельно,
+# в пуле из workers потоков. Бэкенд модели один на весь сервис: клиент
+# Gemini создается один раз и переиспользует свои соединения, а квоты и
+# «предохранитель» ResilientBackend общие для всех клиентов.
+#
+#   GET    /health                         состояние, счетчики и замеры этапов
+#   GET    /patients                       список пациентов
+#   POST   /patients                       новый пациент (тело — профиль)
+#   GET    /patients/<id>                  профиль
+#   PUT    /patients/<id>                  сохранить профиль
+#   POST   /patients/<id>/analyze          {"symptoms", "pain_level", "image" (base64),
+#                                           "image_name" | "image_id"}
+#   GET    /patients/<id>/history          ?q=&risk=&zone=&offset=&limit=
+#   DELETE /patients/<id>/history          очистить историю
+#   GET    /patients/<id>/dynamics         сводка и точки графика
+#   GET    /patients/<id>/export           ?format=pdf|html&scope=last|history
+
+MAX_BODY      = 32 << 20       # снимок в base64 — до ~24 МБ
+IDLE_TIMEOUT  = 30.0           # с без запросов, после которых соединение закрывается
+HISTORY_LIMIT = 200
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 411: "Length Required", 413: "Payload Too Large",
+           422: "Unprocessable Entity", 500: "Internal Server Error", 502: "Bad Gateway"}
+
+CONTENT_TYPES = {"json": "application/json; charset=utf-8",
+                 "html": "text/html; charset=utf-8",
+                 "pdf":  "application/pdf"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Request:
+    def __init__(self, method, target, headers, body=b"", keep_alive=True):
+        url = urlsplit(target)
+        self.method     = method.upper()
+        self.path       = unquote(url.path).rstrip("/") or "/"
+        self.query      = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        self.headers    = headers
+        self.body       = body
+        self.keep_alive = keep_alive
+
+    def json(self):
+        if not self.body:
+            return {}
+        try:
+            data = loads(self.body)
+        except ValueError:
+            raise HttpError(400, "Тело запроса — не JSON")
+        if not isinstance(data, dict):
+            raise HttpError(400, "Ожидался объект JSON")
+        return data
+
+    def int_arg(self, name, default):
+        value = self.query.get(name)
+        if value in (None, ""):
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            raise HttpError(400, f"Параметр {name} должен быть целым числом")
+
+
+class Response:
+    def __init__(self, status=200, body=b"", content_type=CONTENT_TYPES["json"], headers=None):
+        self.status       = status
+        self.body         = body.encode("utf-8") if isinstance(body, str) else body
+        self.content_type = content_type
+        self.headers      = headers or {}
+
+    def encode(self, keep_alive):
+        lines = [f"HTTP/1.1 {self.status} {REASONS.get(self.status, '')}",
+                 f"Content-Type: {self.content_type}",
+                 f"Content-Length: {len(self.body)}",
+                 "Connection: " + ("keep-alive" if keep_alive else "close")]
+        lines += [f"{k}: {v}" for k, v in self.headers.items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + self.body
+
+
+def json_response(data, status=200):
+    return Response(status, dumps(data))
+
+
+def _finite(value):
+    # NaN (наклон по одной точке) в JSON не представим — отдаем null
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, dict):
+        return {k: _finite(v) for k, v in value.items()}
+    return value
+
+
+# ─── Разбор HTTP ───────────────────────────────────────────────────
+async def read_request(reader):
+    # None — клиент закрыл соединение между запросами
+    try:
+        line = await reader.readline()
+        if not line:
+            return None
+        parts = line.decode("latin-1").split()
+        if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+            raise HttpError(400, "Некорректная строка запроса")
+        method, target, version = parts
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+    except ValueError:      # строка длиннее лимита StreamReader
+        raise HttpError(400, "Слишком длинный заголовок")
+
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        raise HttpError(411, "Нужен заголовок Content-Length")
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HttpError(400, "Некорректный Content-Length")
+    if length > MAX_BODY:
+        raise HttpError(413, "Слишком большой запрос")
+    body = await reader.readexactly(length) if length > 0 else b""
+
+    connection = headers.get("connection", "").lower()
+    keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+    return Request(method, target, headers, body, keep_alive)
+
+
+class AnalysisService:
+    def __init__(self, repo, backend, cache=None, preprocessor=None, images=None,
+                 workers=4, font_path=None):
+        self.repo         = repo
+        self.backend      = backend        # один на все запросы — общие соединения и квоты
+        self.cache        = cache
+        self.preprocessor = preprocessor
+        self.images       = images
+        self.font_path    = font_path
+        self.writer       = WriteBehind(repo.batch, savepoint=repo.savepoint)
+        self.counters     = {"requests": 0, "analyses": 0, "errors": 0, "connections": 0}
+        self._pool        = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="service")
+        self._locks       = {}             # patient_id -> asyncio.Lock
+        self._server      = None
+        self._connections = set()          # открытые keep-alive соединения
+        routes = (
+            ("GET",    r"/health",                         self.health),
+            ("GET",    r"/patients",                       self.list_patients),
+            ("POST",   r"/patients",                       self.create_patient),
+            ("GET",    r"/patients/(?P<pid>\d+)",          self.get_profile),
+            ("PUT",    r"/patients/(?P<pid>\d+)",          self.save_profile),
+            ("POST",   r"/patients/(?P<pid>\d+)/analyze",  self.analyze),
+            ("GET",    r"/patients/(?P<pid>\d+)/history",  self.history),
+            ("DELETE", r"/patients/(?P<pid>\d+)/history",  self.clear_history),
+            ("GET",    r"/patients/(?P<pid>\d+)/dynamics", self.dynamics),
+            ("GET",    r"/patients/(?P<pid>\d+)/export",   self.export),
+        )
+        self.routes = [(method, re.compile(pattern + "$"), handler)
+                       for method, pattern, handler in routes]
+
+    # ─── Сервер ────────────────────────────────────────────────────
+    async def start(self, host="127.0.0.1", port=8765):
+        self._server = await asyncio.start_server(self.handle_connection, host, port)
+        return self._server
+
+    @property
+    def port(self):
+        return self._server.sockets[0].getsockname()[1] if self._server else None
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            # Простаивающие keep-alive соединения закрываем сами — иначе сервер их ждет
+            for writer in list(self._connections):
+                writer.close()
+            await self._server.wait_closed()
+        # Дописать очередь на диск до закрытия базы
+        await self.run(self.writer.close)
+        self._pool.shutdown(wait=True)
+
+    async def handle_connection(self, reader, writer):
+        self.counters["connections"] += 1
+        self._connections.add(writer)
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), IDLE_TIMEOUT)
+                except HttpError as e:
+                    writer.write(json_response({"error": str(e)}, e.status).encode(False))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                response = await self.dispatch(request)
+                writer.write(response.encode(request.keep_alive))
+                await writer.drain()
+                if not request.keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def dispatch(self, request):
+        self.counters["requests"] += 1
+        try:
+            allowed = False
+            for method, pattern, handler in self.routes:
+                match = pattern.match(request.path)
+                if not match:
+                    continue
+                allowed = True
+                if method == request.method:
+                    with METRICS.span("http." + handler.__name__):
+                        return await handler(request, **{k: int(v) for k, v in
+                                                         match.groupdict().items()})
+            if allowed:
+                raise HttpError(405, f"Метод {request.method} не поддерживается для {request.path}")
+            raise HttpError(404, f"Нет такого адреса: {request.path}")
+        except HttpError as e:
+            status, message = e.status, str(e)
+        except RecordError as e:
+            status, message = 502, f"Ошибка чтения ответа от ИИ: {e}"
+        except BackendError as e:
+            status, message = 502, f"Модель недоступна: {e}"
+        except Exception as e:
+            status, message = 500, f"Ошибка обработки: {e}"
+        self.counters["errors"] += 1
+        return json_response({"error": message}, status)
+
+    # ─── Общие части ───────────────────────────────────────────────
+    async def run(self, fn, *args):
+        # Блокирующая работа (SQLite, модель, отчеты) — в пуле, цикл событий свободен
+        return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+
+    async def write(self, key, fn, *args):
+        return await asyncio.wrap_future(self.writer.submit(key, fn, *args))
+
+    def patient_lock(self, pid):
+        # Вызывается только из цикла событий — словарь без блокировки
+        lock = self._locks.get(pid)
+        if lock is None:
+            lock = self._locks[pid] = asyncio.Lock()
+        return lock
+
+    async def require_patient(self, pid):
+        if not await self.run(self.repo.has_patient, pid):
+            raise HttpError(404, f"Пациент {pid} не найден")
+
+    # ─── Пациенты ──────────────────────────────────────────────────
+    async def health(self, request):
+        data = {"status": "ok", **self.counters,
+                "writes": {"flushes": self.writer.flushes, "written": self.writer.written}}
+        if hasattr(self.backend, "metrics"):
+            data["backend"] = self.backend.metrics()
+        data["stages"]   = METRICS.stats()
+        data["counters"] = METRICS.counters()
+        return json_response(data)
+
+    async def list_patients(self, request):
+        rows = await self.run(self.repo.list_patients)
+        return json_response([{"id": pid, "name": name} for pid, name in rows])
+
+    async def create_patient(self, request):
+        pid = await self.write(None, self.repo.create_patient, request.json())
+        return json_response({"id": pid}, 201)
+
+    async def get_profile(self, request, pid):
+        await self.require_patient(pid)
+        return json_response(await self.run(self.repo.get_profile, pid))
+
+    async def save_profile(self, request, pid):
+        profile = request.json()
+        await self.require_patient(pid)
+        await self.write(("profile", pid), self.repo.save_profile, pid, profile)
+        return json_response(profile)
+
+    # ─── Анализ ────────────────────────────────────────────────────
+    async def analyze(self, request, pid):
+        data = request.json()
+        symptoms = str(data.get("symptoms") or "").strip()
+        if not symptoms:
+            raise HttpError(422, "Не указаны жалобы (symptoms)")
+        try:
+            pain_level = to_pain(data.get("pain_level")) or 0
+        except RecordError as e:
+            raise HttpError(422, str(e))
+        await self.require_patient(pid)
+
+        async with self.patient_lock(pid):
+            # Декодирование и запись снимка (или поиск в хранилище) — не в цикле событий
+            image_path, temporary = await self.run(self.resolve_image, data)
+            try:
+                profile = await self.run(self.repo.get_profile, pid)
+                analysis = AnalysisRequest(symptoms, pain_level, profile, image_path,
+                                           self.repo.history(pid))
+                raw = await self.run(run_analysis, analysis, self.backend, self.cache,
+                                     self.preprocessor, None, self.images)
+            finally:
+                if temporary:
+                    os.unlink(image_path)
+            result = parse_response(raw)
+            record = make_record(result, analysis)
+            await self.write(None, analysis.history.append, record)
+        self.counters["analyses"] += 1
+        return json_response({"record": record.to_dict(), "result": result.to_dict()}, 201)
+
+    def resolve_image(self, data):
+        # (путь, временный ли файл): снимок из хранилища по хэшу или присланный в base64
+        if data.get("image_id"):
+            path = self.images.path(str(data["image_id"])) if self.images else None
+            if path is None:
+                raise HttpError(404, f"Снимок {data['image_id']} не найден в хранилище")
+            return path, False
+        if not data.get("image"):
+            return None, False
+        try:
+            content = base64.b64decode(data["image"], validate=True)
+        except (binascii.Error, TypeError):
+            raise HttpError(400, "Поле image должно быть в base64")
+        ext = os.path.splitext(str(data.get("image_name") or ""))[1].lower() or ".png"
+        fd, path = tempfile.mkstemp(prefix="spine-upload-", suffix=ext)
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        return path, True
+
+    # ─── История и динамика ────────────────────────────────────────
+    async def history(self, request, pid):
+        await self.require_patient(pid)
+        history = self.repo.history(pid)
+        offset = max(0, request.int_arg("offset", 0))
+        limit  = min(max(1, request.int_arg("limit", 50)), HISTORY_LIMIT)
+        text, risk, zone = (request.query.get(k, "").strip() for k in ("q", "risk", "zone"))
+        if text or risk or zone:
+            total, records = await self.run(lambda: history.search_page(
+                text, offset, limit, risk=risk.lower() or None, zone=zone.lower() or None))
+        else:
+            total   = await self.run(history.count)
+            records = await self.run(history.page, offset, limit)
+        return json_response({"total": total, "offset": offset,
+                              "records": [r.to_dict() for r in records]})
+
+    async def clear_history(self, request, pid):
+        await self.require_patient(pid)
+        async with self.patient_lock(pid):
+            await self.write(None, self.repo.clear_visits, pid)
+        return json_response({"cleared": pid})
+
+    async def dynamics(self, request, pid):
+        await self.require_patient(pid)
+        trend, points = await self.run(self._dynamics, pid)
+        data = {"trend": trend.to_dict(),
+                "points": [{"ts": ts, "angle": angle, "pain": pain} for ts, angle, pain in points]}
+        if points:
+            from .timeseries import VisitSeries
+            series = VisitSeries.from_points(points, key=pid)
+            data["angle"] = _finite(series.summary(series.angle))
+            data["pain"]  = _finite(series.summary(series.pain))
+        return json_response(data)
+
+    def _dynamics(self, pid):
+        history = self.repo.history(pid)
+        return history.trend(), history.chart_points()
+
+    # ─── Отчеты ────────────────────────────────────────────────────
+    async def export(self, request, pid):
+        fmt   = request.query.get("format", "pdf").lower()
+        scope = request.query.get("scope", "history")
+        if fmt not in FORMATS:
+            raise HttpError(400, f"Неизвестный формат отчета: {fmt}")
+        if scope not in ("last", "history"):
+            raise HttpError(400, "scope — last или history")
+        await self.require_patient(pid)
+        history = self.repo.history(pid)
+        records = await self.run(history.last if scope == "last" else history.records)
+        if not records:
+            raise HttpError(404, "У пациента нет визитов")
+        profile = await self.run(self.repo.get_profile, pid)
+        title = None if scope == "last" else "Отчет по истории визитов"
+        task  = ExportTask(f"report.{fmt}", records, profile, title)
+        body  = await self.run(render, task, self.font_path)
+        name  = f"spine_report_{pid}_{scope}.{fmt}"
+        return Response(200, body, CONTENT_TYPES[fmt],
+                        {"Content-Disposition": f'attachment; filename="{name}"'})
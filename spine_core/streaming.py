@@ -0,0 +1,141 @@
+import json
+import time
+
+# ─── ПОТОКОВЫЙ РАЗБОР ОТВЕТА МОДЕЛИ ────────────────────────────────
+# Модель отдает JSON кусками. Парсер посимвольно отслеживает верхний уровень
+# объекта и, как только значение очередного поля закончилось (встретилась
+# запятая или закрывающая скобка вне строк и вложенных структур), отдает
+# пару (ключ, значение). Все, что до первой «{» (например, ```json), и после
+# закрывающей «}» пропускается.
+
+
+class IncrementalJSONParser:
+    def __init__(self):
+        self.buffer    = ""
+        self.pos       = 0
+        self.state     = "seek"
+        self.fields    = {}
+        self._key      = None
+        self._start    = 0
+        self._nest     = 0
+        self._in_str   = False
+        self._escape   = False
+
+    @property
+    def done(self):
+        return self.state == "done"
+
+    def feed(self, chunk):
+        # Возвращает поля, завершившиеся в этом куске: [(ключ, значение), ...]
+        self.buffer += chunk
+        completed = []
+        buf = self.buffer
+        while self.pos < len(buf) and self.state != "done":
+            c = buf[self.pos]
+            state = self.state
+
+            if state == "seek":
+                if c == "{":
+                    self.state = "key_or_end"
+
+            elif state == "key_or_end":
+                if c == '"':
+                    self._start, self._escape = self.pos, False
+                    self.state = "key"
+                elif c == "}":
+                    self.state = "done"
+
+            elif state == "key":
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._key  = json.loads(buf[self._start:self.pos + 1])
+                    self.state = "colon"
+
+            elif state == "colon":
+                if c == ":":
+                    self.state = "value_start"
+
+            elif state == "value_start":
+                if not c.isspace():
+                    self._start, self._nest = self.pos, 0
+                    self._in_str, self._escape = False, False
+                    self.state = "value"
+                    continue     # этот же символ обрабатывается как часть значения
+
+            elif state == "value":
+                if self._in_str:
+                    if self._escape:
+                        self._escape = False
+                    elif c == "\\":
+                        self._escape = True
+                    elif c == '"':
+                        self._in_str = False
+                elif c == '"':
+                    self._in_str = True
+                elif c in "{[":
+                    self._nest += 1
+                elif self._nest:
+                    if c in "}]":
+                        self._nest -= 1
+                elif c == "," or c == "}":
+                    self._finish_value(buf[self._start:self.pos], completed)
+                    self.state = "key_or_end" if c == "," else "done"
+
+            self.pos += 1
+        return completed
+
+    def _finish_value(self, text, completed):
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError:
+            return
+        self.fields[self._key] = value
+        completed.append((self._key, value))
+
+
+def iter_text(response):
+    # Куски потокового ответа generate_content(..., stream=True)
+    for chunk in response:
+        text = getattr(chunk, "text", "")
+        if text:
+            yield text
+
+
+# ─── ТЕСТОВАЯ МОДЕЛЬ С ПОТОКОВЫМ ОТВЕТОМ ───────────────────────────
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class _StreamResponse:
+    def __init__(self, text, chunk_size, delay):
+        self.text       = text
+        self.chunk_size = chunk_size
+        self.delay      = delay
+
+    def __iter__(self):
+        for i in range(0, len(self.text), self.chunk_size):
+            if self.delay:
+                time.sleep(self.delay)
+            yield _Chunk(self.text[i:i + self.chunk_size])
+
+
+class MockStreamingModel:
+    # Отдает заранее заданный текст кусками по chunk_size символов с паузой delay
+    def __init__(self, text, chunk_size=16, delay=0.0):
+        self.text       = text
+        self.chunk_size = chunk_size
+        self.delay      = delay
+        self.calls      = 0
+
+    def generate_content(self, contents, stream=False):
+        self.calls += 1
+        return self.respond(stream)
+
+    def respond(self, stream=False):
+        if stream:
+            return _StreamResponse(self.text, self.chunk_size, self.delay)
+        return _Chunk(self.text)
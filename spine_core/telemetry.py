@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# ─── ЗАМЕРЫ ЭТАПОВ АНАЛИЗА ─────────────────────────────────────────
+# span("этап") меряет длительность блока кода. По каждому этапу хранятся
+# последние window значений — из них панель «Замеры» считает p50/p95, —
+# и общее число замеров. count() — накопительные счетчики (попадания в кэш
+# и т. п.). Завершенные спаны копятся в кольцевом буфере и по запросу
+# сохраняются в файл Trace Event JSON (открывается в chrome://tracing или
+# ui.perfetto.dev). Спаны одного анализа связаны общим trace — он задается
+# для потока через tracing(), поэтому этапы в рабочем потоке и в GUI-потоке
+# видны как одна цепочка. Стоимость спана — два perf_counter и append под
+# блокировкой, на фоне вызова модели она не видна.
+
+
+def percentile(values, p):
+    # Ближайший ранг по отсортированному списку
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = max(0, min(len(values) - 1, round(p / 100 * len(values) + 0.5) - 1))
+    return values[k]
+
+
+class SpanRecord:
+    __slots__ = ("name", "start", "duration", "thread", "trace", "attrs")
+
+    def __init__(self, name, start, duration, thread, trace, attrs):
+        self.name     = name
+        self.start    = start
+        self.duration = duration
+        self.thread   = thread
+        self.trace    = trace
+        self.attrs    = attrs
+
+
+class MetricsRegistry:
+    def __init__(self, window=500, trace_capacity=5000):
+        self.window    = window
+        self._samples  = {}                 # этап -> deque длительностей, с
+        self._totals   = {}                 # этап -> число замеров за все время
+        self._counters = {}
+        self._spans    = deque(maxlen=trace_capacity)
+        self._local    = threading.local()
+        self._lock     = threading.Lock()
+        self._origin   = time.perf_counter()
+
+    # ─── Запись ────────────────────────────────────────────────────
+    @contextmanager
+    def span(self, name, **attrs):
+        # Словарь attrs можно дополнить внутри блока: with span(...) as a: a["hit"] = True
+        start = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            self.record(name, start, time.perf_counter() - start, attrs)
+
+    def observe(self, name, seconds, **attrs):
+        # Длительность, измеренная не блоком кода (ожидание в очереди, весь анализ)
+        self.record(name, time.perf_counter() - seconds, seconds, attrs)
+
+    def record(self, name, start, duration, attrs=None):
+        span = SpanRecord(name, start, duration, threading.current_thread().name,
+                          getattr(self._local, "trace", None), attrs or None)
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+                self._totals[name] = 0
+            samples.append(duration)
+            self._totals[name] += 1
+            self._spans.append(span)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    @contextmanager
+    def tracing(self, trace):
+        # Все спаны потока внутри блока помечаются trace (например, «analysis-12»)
+        previous = getattr(self._local, "trace", None)
+        self._local.trace = trace
+        try:
+            yield
+        finally:
+            self._local.trace = previous
+
+    # ─── Чтение ────────────────────────────────────────────────────
+    def stats(self):
+        # {этап: {count, p50, p95, max, last}} — секунды, по скользящему окну
+        with self._lock:
+            samples = {name: list(d) for name, d in self._samples.items()}
+            totals  = dict(self._totals)
+        return {name: {"count": totals[name],
+                       "p50":   percentile(values, 50),
+                       "p95":   percentile(values, 95),
+                       "max":   max(values),
+                       "last":  values[-1]}
+                for name, values in sorted(samples.items())}
+
+    def counters(self):
+        with self._lock:
+            return dict(sorted(self._counters.items()))
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._totals.clear()
+            self._counters.clear()
+            self._spans.clear()
+
+    def dump_trace(self, path):
+        # Trace Event JSON: события «X» (начало и длительность в мкс), по дорожке на поток
+        with self._lock:
+            spans = list(self._spans)
+            counters = dict(self._counters)
+        threads, events = {}, []
+        for s in spans:
+            tid = threads.setdefault(s.thread, len(threads) + 1)
+            args = dict(s.attrs or {})
+            if s.trace is not None:
+                args["trace"] = s.trace
+            events.append({"name": s.name, "cat": s.name.split(".")[0], "ph": "X",
+                           "ts": round((s.start - self._origin) * 1e6, 1),
+                           "dur": round(s.duration * 1e6, 1),
+                           "pid": os.getpid(), "tid": tid, "args": args})
+        events += [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid,
+                    "args": {"name": name}} for name, tid in threads.items()]
+        data = {"traceEvents": events, "displayTimeUnit": "ms",
+                "otherData": {"counters": counters, "stats": self.stats()}}
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, default=str)
+        os.replace(tmp, path)
+        return len(spans)
+
+
+# Общий реестр процесса: ядро, окно приложения, сервис и пакетный режим пишут сюда
+METRICS = MetricsRegistry()
+span    = METRICS.span
+count   = METRICS.count
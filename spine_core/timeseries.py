@@ -0,0 +1,117 @@
+import numpy as np
+
+# ─── КОЛОНОЧНЫЙ ВРЕМЕННОЙ РЯД ВИЗИТОВ ──────────────────────────────
+# Время, угол и боль хранятся в отдельных массивах NumPy (пропуски — NaN).
+# Ряд строится один раз из chart_points() и дальше только дописывается;
+# емкость удваивается, поэтому добавление амортизированно O(1).
+# Время — дни от 1970-01-01, как в matplotlib.dates, чтобы график мог брать
+# массив напрямую.
+
+EPOCH = np.datetime64("1970-01-01T00:00", "m")
+MINUTES_PER_DAY = 1440.0
+
+
+def to_days(ts_list):
+    # ["2026-02-25 15:14", ...] -> дни от эпохи (векторный разбор дат)
+    stamps = np.array(ts_list, dtype="datetime64[m]")
+    return (stamps - EPOCH).astype("f8") / MINUTES_PER_DAY
+
+
+class VisitSeries:
+    def __init__(self, capacity=64, key=None):
+        self.key    = key         # для чего построен ряд (в окне — пациент и ревизия истории)
+        self._n     = 0
+        self._t     = np.empty(capacity)
+        self._angle = np.empty(capacity)
+        self._pain  = np.empty(capacity)
+
+    @classmethod
+    def from_points(cls, points, key=None):
+        series = cls(capacity=max(64, len(points) * 2), key=key)
+        if points:
+            ts, angles, pains = zip(*points)
+            n = len(points)
+            series._t[:n]     = to_days(ts)
+            series._angle[:n] = np.array(angles, dtype="f8")   # None -> nan
+            series._pain[:n]  = np.array(pains, dtype="f8")
+            series._n = n
+        return series
+
+    def append(self, ts, angle, pain):
+        if self._n == len(self._t):
+            self._grow()
+        i = self._n
+        self._t[i]     = to_days([ts])[0]
+        self._angle[i] = angle if angle is not None else np.nan
+        self._pain[i]  = pain if pain is not None else np.nan
+        self._n += 1
+
+    def _grow(self):
+        capacity = len(self._t) * 2
+        for name in ("_t", "_angle", "_pain"):
+            old = getattr(self, name)
+            new = np.empty(capacity)
+            new[:self._n] = old[:self._n]
+            setattr(self, name, new)
+
+    def __len__(self):
+        return self._n
+
+    # Представления без копирования
+    @property
+    def t(self):
+        return self._t[:self._n]
+
+    @property
+    def angle(self):
+        return self._angle[:self._n]
+
+    @property
+    def pain(self):
+        return self._pain[:self._n]
+
+    # ─── Статистика ────────────────────────────────────────────────
+    def rolling_mean(self, values, window):
+        # Скользящее среднее по последним window визитам с пропуском NaN
+        n = len(values)
+        if not n:
+            return np.empty(0)
+        present = ~np.isnan(values)
+        sums   = np.concatenate(([0.0], np.cumsum(np.where(present, values, 0.0))))
+        counts = np.concatenate(([0], np.cumsum(present)))
+        hi = np.arange(1, n + 1)
+        lo = np.maximum(hi - window, 0)
+        total, count = sums[hi] - sums[lo], counts[hi] - counts[lo]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(count > 0, total / count, np.nan)
+
+    def slope(self, values):
+        # Наклон МНК в единицах за неделю; NaN, если точек меньше двух
+        present = ~np.isnan(values)
+        if present.sum() < 2:
+            return np.nan
+        x = self.t[present]
+        y = values[present]
+        x = x - x.mean()
+        denom = (x * x).sum()
+        if denom == 0:
+            return np.nan
+        return float((x * (y - y.mean())).sum() / denom * 7)
+
+    def summary(self, values, window=5):
+        # Для угла и боли «меньше» — значит лучше
+        present = values[~np.isnan(values)]
+        if not len(present):
+            return None
+        steps = np.diff(present)
+        return {
+            "count":       int(len(present)),
+            "last":        float(present[-1]),
+            "change":      float(steps[-1]) if len(steps) else None,
+            "min":         float(present.min()),
+            "max":         float(present.max()),
+            "mean":        float(present.mean()),
+            "rolling":     float(self.rolling_mean(values, window)[-1]),
+            "slope":       self.slope(values),
+            "improvement": float((steps < 0).mean()) if len(steps) else None,
+        }
@@ -0,0 +1,144 @@
+from collections import deque
+from datetime import datetime
+
+# ─── СВОДКА ВСЕЙ ИСТОРИИ ВИЗИТОВ ───────────────────────────────────
+# Для каждого показателя (угол, боль) хранятся только суммы для наклона
+# по МНК, первое/последнее значение и лучший/худший визит, плюс риск
+# последних визитов. Новый визит добавляется за O(1), а блок для промпта
+# имеет одинаковый размер при любой длине истории. Без numpy — сводка
+# нужна при каждом анализе, в том числе в пакетном режиме.
+
+LAST_RISKS = 5
+TS_FORMAT  = "%Y-%m-%d %H:%M"
+EPOCH      = datetime(1970, 1, 1)
+
+
+def _days(ts):
+    return (datetime.strptime(ts, TS_FORMAT) - EPOCH).total_seconds() / 86400
+
+
+def _short_date(ts):
+    return f"{ts[8:10]}.{ts[5:7]}.{ts[0:4]}" if ts else "--"
+
+
+def _fmt(value):
+    return f"{value:g}" if isinstance(value, float) else str(value)
+
+
+class MetricTrend:
+    # Меньше — лучше (и для угла, и для боли)
+    FIELDS = ("n", "t0", "st", "sy", "stt", "sty", "first", "last", "best", "best_ts",
+              "worst", "worst_ts")
+
+    def __init__(self):
+        self.n = 0
+        self.t0 = None                      # день первой точки — суммы считаются от него
+        self.st = self.sy = self.stt = self.sty = 0.0
+        self.first = self.last = None
+        self.best = self.worst = None
+        self.best_ts = self.worst_ts = None
+
+    def add(self, ts, value):
+        t = _days(ts)
+        if self.t0 is None:
+            self.t0, self.first = t, value
+        t -= self.t0
+        self.n   += 1
+        self.st  += t
+        self.sy  += value
+        self.stt += t * t
+        self.sty += t * value
+        self.last = value
+        if self.best is None or value <= self.best:
+            self.best, self.best_ts = value, ts
+        if self.worst is None or value >= self.worst:
+            self.worst, self.worst_ts = value, ts
+
+    def slope(self):
+        # Наклон линии МНК в единицах за неделю; None, если точек мало или все в один день
+        d = self.n * self.stt - self.st * self.st
+        if self.n < 2 or abs(d) < 1e-9:
+            return None
+        return (self.n * self.sty - self.st * self.sy) / d * 7
+
+    def describe(self, unit, slope_unit=None):
+        if not self.n:
+            return "нет данных"
+        parts = [f"первый {_fmt(self.first)}{unit}", f"последний {_fmt(self.last)}{unit}",
+                 f"лучший {_fmt(self.best)}{unit} ({_short_date(self.best_ts)})",
+                 f"худший {_fmt(self.worst)}{unit} ({_short_date(self.worst_ts)})"]
+        slope = self.slope()
+        if slope is not None:
+            slope_unit = unit if slope_unit is None else slope_unit
+            parts.append(f"тренд {slope:+.2f}{slope_unit} в неделю")
+        return ", ".join(parts)
+
+    def to_dict(self):
+        return {f: getattr(self, f) for f in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        metric = cls()
+        for f in cls.FIELDS:
+            setattr(metric, f, data.get(f, getattr(metric, f)))
+        return metric
+
+
+class TrendSummary:
+    def __init__(self):
+        self.count    = 0
+        self.urgent   = 0
+        self.first_ts = None
+        self.last_ts  = None
+        self.angle    = MetricTrend()
+        self.pain     = MetricTrend()
+        self.risks    = deque(maxlen=LAST_RISKS)
+
+    def add(self, point, risk=None, urgent=False):
+        # point — (ts, угол, боль) из chart_point() или None
+        self.count += 1
+        if urgent:
+            self.urgent += 1
+        if risk:
+            self.risks.append(risk)
+        if point is None:
+            return
+        ts, angle, pain = point
+        self.first_ts = self.first_ts or ts
+        self.last_ts  = ts
+        if angle is not None:
+            self.angle.add(ts, angle)
+        if pain is not None:
+            self.pain.add(ts, pain)
+
+    def prompt_block(self):
+        if self.count < 2:
+            return ""
+        lines = [f"\nСводка всей истории (визитов: {self.count}, "
+                 f"с {_short_date(self.first_ts)} по {_short_date(self.last_ts)}):",
+                 f"  Угол искривления: {self.angle.describe('°')}",
+                 f"  Уровень боли: {self.pain.describe('/10', '')}"]
+        if self.risks:
+            lines.append(f"  Риск последних визитов: {' → '.join(self.risks)}")
+        lines.append(f"  Визитов со срочным направлением к врачу: {self.urgent}")
+        return "\n".join(lines) + "\n"
+
+    def copy(self):
+        return TrendSummary.from_dict(self.to_dict())
+
+    def to_dict(self):
+        return {"count": self.count, "urgent": self.urgent, "first_ts": self.first_ts,
+                "last_ts": self.last_ts, "angle": self.angle.to_dict(),
+                "pain": self.pain.to_dict(), "risks": list(self.risks)}
+
+    @classmethod
+    def from_dict(cls, data):
+        summary = cls()
+        summary.count    = data.get("count", 0)
+        summary.urgent   = data.get("urgent", 0)
+        summary.first_ts = data.get("first_ts")
+        summary.last_ts  = data.get("last_ts")
+        summary.angle    = MetricTrend.from_dict(data.get("angle", {}))
+        summary.pain     = MetricTrend.from_dict(data.get("pain", {}))
+        summary.risks.extend(data.get("risks", []))
+        return summary
@@ -0,0 +1,66 @@
+import pytest
+
+from spine_core.context import ContextBlock, estimate_tokens, fit_blocks, shorten
+
+
+def blocks():
+    # Оценки заданы явно: text только показывает, что попало в промпт
+    return [ContextBlock("instr",   "I", priority=0, required=True, tokens=100),
+            ContextBlock("profile", "P", priority=1, tokens=20),
+            ContextBlock("history", "H", priority=2, tokens=40),
+            ContextBlock("trend",   "T", priority=3, tokens=30)]
+
+
+def test_everything_fits():
+    text, stats = fit_blocks(blocks(), 190)
+    assert text == "IPHT" and stats.tokens == 190
+    assert stats.short == stats.dropped == []
+    # Нулевой бюджет — без ограничения
+    assert fit_blocks(blocks(), 0)[0] == "IPHT"
+
+
+@pytest.mark.parametrize("budget, text, dropped", [
+    (189, "IPH", ["trend"]),            # на токен больше бюджета — уходит наименее важный
+    (160, "IPH", ["trend"]),            # ровно в бюджет после первого шага
+    (159, "IP",  ["history", "trend"]),
+    (120, "IP",  ["history", "trend"]),
+    (119, "I",   ["profile", "history", "trend"]),
+    (10,  "I",   ["profile", "history", "trend"]),   # обязательный блок остается всегда
+])
+def test_optional_blocks_are_dropped_by_priority(budget, text, dropped):
+    got, stats = fit_blocks(blocks(), budget)
+    assert got == text and stats.dropped == dropped
+    assert stats.original == 190
+    assert stats.tokens <= budget or stats.dropped == ["profile", "history", "trend"]
+
+
+def test_blocks_are_shortened_before_dropped_and_keep_their_order():
+    long_text = "\nжалоба " * 60
+    history = ContextBlock("history", long_text, priority=2, max_chars=60)
+    trend   = ContextBlock("trend", "\nсводка " * 30, priority=1)
+    instr   = ContextBlock("instr", "Инструкция.", required=True)
+    budget  = instr.tokens + trend.tokens + 25
+
+    text, stats = fit_blocks([instr, history, trend], budget)
+    assert stats.short == ["history"] and stats.dropped == []
+    assert text.startswith("Инструкция.\n") and text.endswith(trend.text)
+    # Пробелы по краям блока остаются на месте
+    assert history.text.startswith("\nжалоба") and history.text.endswith("… ")
+    assert len(history.text.strip()) <= 61
+    assert stats.tokens <= budget
+
+
+def test_required_block_is_only_shortened():
+    instr = ContextBlock("instr", "слово " * 100, required=True, max_chars=30)
+    extra = ContextBlock("extra", "x" * 30, priority=5)
+    text, stats = fit_blocks([instr, extra], 5)
+    assert stats.short == ["instr"] and stats.dropped == ["extra"]
+    assert text == instr.text and len(text) <= 31
+
+
+def test_empty_blocks_are_skipped_and_helpers():
+    text, stats = fit_blocks([ContextBlock("empty", ""), ContextBlock("a", "abc")], 10)
+    assert text == "abc" and stats.tokens == estimate_tokens("abc") == 2
+    assert estimate_tokens("") == 0
+    assert shorten("  боль   в\nшее ", 100) == "боль в шее"
+    assert shorten("боль в шее, пояснице", 12) == "боль в шее…"
@@ -0,0 +1,77 @@
+import os
+import re
+import stat
+
+import pytest
+
+from spine_core import export
+from spine_core.export import ExportRequest, bulk_tasks, run_export, write_atomic
+from spine_core.records import VisitRecord
+
+VISITS = [VisitRecord.from_dict({"date": f"0{day}.01.2026 10:00", "symptoms": "Боль в пояснице",
+                                 "pain_level": day + 2, "angle": 10 + day,
+                                 "comment": "Заключение"}) for day in (1, 2)]
+
+
+def check_pdf(data):
+    # Структура файла: заголовок, таблица xref указывает на начала объектов, трейлер
+    assert data.startswith(b"%PDF-1.") and data.rstrip().endswith(b"%%EOF")
+    xref = int(re.search(rb"startxref\s+(\d+)\s+%%EOF\s*$", data).group(1))
+    assert data[xref:xref + 4] == b"xref"
+    first, count = map(int, re.match(rb"xref\s+(\d+) (\d+)\s+", data[xref:]).groups())
+    entries = re.findall(rb"(\d{10}) (\d{5}) ([nf])", data[xref:])[:count]
+    assert len(entries) == count
+    for number, (offset, _, kind) in enumerate(entries, first):
+        if kind == b"n":
+            assert data[int(offset):].startswith(b"%d 0 obj" % number)
+    trailer = data[xref:]
+    assert re.search(rb"/Size %d\b" % (first + count), trailer)
+    root = int(re.search(rb"/Root (\d+) 0 R", trailer).group(1))
+    assert b"/Type /Catalog" in data[int(entries[root - first][0]):][:200]
+
+
+@pytest.fixture
+def umask():
+    # Маска процесса на время теста и сброс закэшированного значения
+    old = os.umask(0o027)
+    export._umask = None
+    yield 0o027
+    os.umask(old)
+    export._umask = None
+
+
+def test_exported_files_get_umask_mode_and_pdf_parses(tmp_path, umask):
+    tasks = bulk_tasks(VISITS, {"name": "Иван"}, str(tmp_path), "pdf")
+    progress = []
+    written = run_export(ExportRequest(tasks), progress.append)
+
+    assert len(written) == 3 and [p[:2] for p in progress] == [(1, 3), (2, 3), (3, 3)]
+    for path in written:
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o666 & ~umask
+        with open(path, "rb") as f:
+            check_pdf(f.read())
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(p) for p in written)
+
+
+def test_html_export(tmp_path, umask):
+    tasks = bulk_tasks(VISITS[:1], {"name": "Иван"}, str(tmp_path), "html")
+    [path] = run_export(ExportRequest(tasks))
+    with open(path, encoding="utf-8") as f:
+        assert "Заключение" in f.read()
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o640
+
+
+def test_umask_is_read_once_and_restored(umask):
+    assert export.process_umask() == umask
+    os.umask(0o022)
+    assert export.process_umask() == umask     # закэшировано при первом чтении
+    assert os.umask(0o022) == 0o022            # маску процесса чтение не изменило
+
+
+def test_failed_write_keeps_old_file_and_leaves_no_temp(tmp_path):
+    path = tmp_path / "report.html"
+    path.write_text("старый отчет", encoding="utf-8")
+    with pytest.raises(TypeError):
+        write_atomic(str(path), 12345)
+    assert path.read_text(encoding="utf-8") == "старый отчет"
+    assert os.listdir(tmp_path) == ["report.html"]
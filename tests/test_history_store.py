@@ -0,0 +1,65 @@
+import json
+import logging
+
+from spine_core.history_store import HistoryStore
+from spine_core.records import VisitRecord
+from spine_core.repository import PatientRepository
+
+
+def line(day, pain):
+    return json.dumps({"date": f"{day:02d}.01.2026 10:00", "symptoms": "Боль",
+                       "pain_level": pain}, ensure_ascii=False)
+
+
+def read_lines(path):
+    return path.read_text(encoding="utf-8").splitlines() if path.exists() else []
+
+
+def test_torn_last_line_is_dropped_without_rejecting(tmp_path):
+    path = tmp_path / "history.jsonl"
+    path.write_text(line(1, 3) + "\n" + line(2, 4)[:25] + "\n", encoding="utf-8")
+    store = HistoryStore(str(path))
+    assert [r.pain_level for r in store.records()] == [3]
+    assert read_lines(path) == [VisitRecord.from_json(line(1, 3)).to_json()]
+    assert not (tmp_path / "history.jsonl.rejected").exists()
+
+
+def test_unreadable_middle_lines_are_rejected_not_lost(tmp_path, caplog):
+    path = tmp_path / "history.jsonl"
+    broken, invalid = line(2, 4)[:25], line(3, "сильная")
+    path.write_text("\n".join([line(1, 3), broken, invalid, line(4, 5)]) + "\n",
+                    encoding="utf-8")
+    with caplog.at_level(logging.WARNING, "spine_core.history_store"):
+        records = HistoryStore(str(path)).records()
+
+    assert [r.pain_level for r in records] == [3, 5]
+    assert read_lines(tmp_path / "history.jsonl.rejected") == [broken, invalid]
+    assert "строка 2" in caplog.text and "строка 3" in caplog.text
+    # Повторное чтение уже исправленного файла ничего не переносит
+    assert len(HistoryStore(str(path)).records()) == 2
+    assert len(read_lines(tmp_path / "history.jsonl.rejected")) == 2
+
+
+def test_invalid_legacy_entries_are_rejected(tmp_path):
+    legacy = tmp_path / "history.json"
+    entries = [json.loads(line(1, 3)), {"date": "02.01.2026", "pain_level": 42}, "не объект"]
+    legacy.write_text(json.dumps(entries, ensure_ascii=False), encoding="utf-8")
+    path = tmp_path / "history.jsonl"
+
+    store = HistoryStore(str(path), legacy_path=str(legacy))
+    assert [r.pain_level for r in store.records()] == [3]
+    rejected = [json.loads(l) for l in read_lines(tmp_path / "history.jsonl.rejected")]
+    assert rejected == entries[1:]
+    assert len(read_lines(path)) == 1
+
+
+def test_migration_keeps_readable_visits_and_rejects_the_rest(tmp_path):
+    # Единственный путь чтения этого файла в приложении — миграция в SQLite
+    path = tmp_path / "history.jsonl"
+    path.write_text("\n".join([line(1, 3), "{мусор}", line(2, 6), line(3, 7)[:20]]),
+                    encoding="utf-8")
+    repo = PatientRepository(str(tmp_path / "patients.db"))
+    pid = repo.migrate_from_json(str(tmp_path / "profile.json"), HistoryStore(str(path)))
+    assert [r.pain_level for r in repo.history(pid).records()] == [3, 6]
+    assert read_lines(tmp_path / "history.jsonl.rejected") == ["{мусор}"]
+    repo.close()
@@ -0,0 +1,124 @@
+import threading
+import time
+
+import pytest
+
+from spine_core.persistence import WriteBehind
+from spine_core.records import VisitRecord
+from spine_core.repository import PatientRepository
+
+
+def visit(day, pain):
+    return VisitRecord.from_dict({"date": f"{day:02d}.01.2026 10:00", "symptoms": "Боль",
+                                  "pain_level": pain})
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = PatientRepository(str(tmp_path / "patients.db"))
+    yield repo
+    repo.close()
+
+
+def fail():
+    raise ValueError("операция не прошла")
+
+
+def test_failed_operation_does_not_roll_back_the_batch(repo):
+    pid = repo.create_patient({"name": "Иван"})
+    history = repo.history(pid)
+    errors = []
+    writer = WriteBehind(repo.batch, flush_delay=0.2, on_error=errors.append,
+                         savepoint=repo.savepoint)
+    before  = writer.submit(None, history.append, visit(1, 3))
+    profile = writer.submit(("profile", pid), repo.save_profile, pid, {"name": "Петр"})
+    broken  = writer.submit(None, lambda: (history.append(visit(2, 9)), fail()))
+    meta    = writer.submit(("meta", "last_patient"), repo.set_meta, "last_patient", pid)
+    assert writer.flush(5)
+    writer.close()
+
+    assert writer.flushes == 1 and writer.written == 3
+    assert before.result() is None and profile.result() is None and meta.result() is None
+    with pytest.raises(ValueError):
+        broken.result()
+    assert [str(e) for e in errors] == ["операция не прошла"]
+
+    # Визит из неудачной операции откатился, остальное записано
+    assert [r.pain_level for r in history.records()] == [3]
+    assert history.trend().to_dict()["count"] == 1
+    assert repo.get_profile(pid) == {"name": "Петр"}
+    assert repo.get_meta("last_patient") == str(pid)
+
+
+def test_savepoint_outside_batch_commits_or_rolls_back(repo):
+    pid = repo.create_patient({})
+    history = repo.history(pid)
+    with repo.savepoint():
+        history.append(visit(1, 4))
+    revision = history.revision()
+    with pytest.raises(ValueError):
+        with repo.savepoint():
+            history.append(visit(2, 5))
+            fail()
+    assert not repo._conn.in_transaction
+    assert history.count() == 1
+    # Откаченный визит никто не видел — ревизия прежняя
+    assert history.revision() == revision
+
+
+def test_without_savepoints_a_failure_rolls_back_everything(repo):
+    pid = repo.create_patient({})
+    history = repo.history(pid)
+    writer = WriteBehind(repo.batch, flush_delay=0.2)
+    first  = writer.submit(None, history.append, visit(1, 3))
+    broken = writer.submit(None, fail)
+    writer.flush(5)
+    writer.close()
+    for future in (first, broken):
+        with pytest.raises(ValueError):
+            future.result()
+    assert history.count() == 0
+
+
+def test_reads_do_not_wait_for_an_open_batch(repo):
+    pid = repo.create_patient({"name": "Иван"})
+    history = repo.history(pid)
+    history.append(visit(1, 3))
+    opened, release = threading.Event(), threading.Event()
+
+    def slow_batch():
+        with repo.batch():
+            history.append(visit(2, 7))
+            repo.save_profile(pid, {"name": "Петр"})
+            opened.set()
+            release.wait(5)
+
+    writer = threading.Thread(target=slow_batch)
+    writer.start()
+    try:
+        assert opened.wait(5)
+        started = time.monotonic()
+        # Чтение видит последнее зафиксированное состояние, а не половину пачки
+        assert [r.pain_level for r in history.page(0, 10)] == [3]
+        assert history.count() == 1
+        assert [r.pain_level for r in history.search("боль")] == [3]
+        assert history.chart_snapshot() == (1, [("2026-01-01 10:00", None, 3)])
+        assert repo.get_profile(pid) == {"name": "Иван"}
+        assert repo.list_patients() == [(pid, "Иван")]
+        assert time.monotonic() - started < 1.0
+    finally:
+        release.set()
+        writer.join()
+    assert history.chart_snapshot()[0] == 2 and history.count() == 2
+    assert repo.get_profile(pid) == {"name": "Петр"}
+
+
+def test_close_reports_unfinished_queue_and_finishes_on_retry():
+    release = threading.Event()
+    writer = WriteBehind(flush_delay=0)
+    slow = writer.submit(None, release.wait, 5)
+    later = writer.submit(None, lambda: "записано")
+    assert writer.close(timeout=0.1) is False
+    release.set()
+    assert writer.close() is True
+    assert slow.result() is True and later.result() == "записано"
@@ -0,0 +1,35 @@
+import pytest
+
+from spine_core.presentation import URGENT_ANSWERS, result_text
+
+PENDING = "…"
+
+
+def line(text, prefix):
+    return next(l for l in text.splitlines() if l.startswith(prefix))
+
+
+@pytest.mark.parametrize("angle, shown", [
+    (12.5, "12.5°"), (12, "12°"), ("12.5", "12.5°"), ("около 15°", "15°"), ("12,5", "12.5°"),
+    (None, "Не определен"), ("не определен", "Не определен"), (True, "Не определен"),
+    ({"value": 3}, "Не определен"),
+])
+def test_angle_from_streamed_or_parsed_value(angle, shown):
+    text = result_text({"ugol_iskrivleniya": angle}, 5, PENDING)
+    assert line(text, "📐").endswith(f"  {shown}")
+    assert line(result_text({"ugol_iskrivleniya": angle}, 5), "📐").endswith(f"  {shown}")
+
+
+@pytest.mark.parametrize("urgent, answer", [
+    (True, True), ("да", True), ("true", True), (False, False), ("нет", False),
+    ("false", False), (None, False), ("непонятно", False),
+])
+def test_urgent_from_streamed_value(urgent, answer):
+    text = result_text({"srochno_k_vrachu": urgent}, 0, PENDING)
+    assert line(text, "🚑").endswith(URGENT_ANSWERS[answer])
+
+
+def test_fields_not_yet_streamed_show_placeholder():
+    text = result_text({"ugol_iskrivleniya": PENDING, "srochno_k_vrachu": PENDING}, 0, PENDING)
+    assert line(text, "📐").endswith(PENDING) and line(text, "🚑").endswith(PENDING)
+    assert text.startswith("⏳")
@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+from spine_core import records
+from spine_core.records import (AnalysisResult, RecordError, VisitRecord, to_angle, to_bool,
+                                to_list, to_pain)
+
+FULL_VISIT = {"date": "05.03.2026 09:30", "symptoms": "Боль в пояснице", "pain_level": "7/10",
+              "risk": "Средний", "angle": "около 12,5 градусов", "stiffness": "Средняя",
+              "zone": "L4-L5", "urgent": "да", "exercises": "• Планка\n• Кошка\n",
+              "comment": "Без ухудшения", "dynamics": "uluchshenie",
+              "dynamics_comment": "Боль меньше", "warning": "", "image": "ab" * 32}
+
+
+# ─── Приведение типов ──────────────────────────────────────────────
+@pytest.mark.parametrize("value, angle", [
+    (12, 12.0), (12.5, 12.5), ("12.5", 12.5), ("12,5°", 12.5), ("около 15 градусов", 15.0),
+    ("-3", -3.0), (None, None), (True, None), ("--", None), ("Не определен", None),
+    ("нет данных", None),
+])
+def test_angle_from_numbers_and_strings(value, angle):
+    assert to_angle(value) == angle
+
+
+@pytest.mark.parametrize("value, pain", [
+    (7, 7), ("7", 7), ("7/10", 7), ("6,6", 7), (0, None), ("--", None), (None, None),
+])
+def test_pain_from_numbers_and_strings(value, pain):
+    assert to_pain(value) == pain
+
+
+@pytest.mark.parametrize("coerce, value", [
+    (to_pain, "сильная"), (to_pain, 11), (to_pain, -1), (to_pain, [7]),
+    (to_angle, {"value": 12}), (to_bool, "может быть"), (to_list, 5),
+])
+def test_garbage_values_raise_record_error(coerce, value):
+    with pytest.raises(RecordError) as info:
+        coerce(value, "field")
+    assert info.value.field == "field" and info.value.value == value
+
+
+def test_bool_and_list_coercion():
+    assert [to_bool(v, "urgent") for v in ("да", "false", 1, None, "")] == \
+        [True, False, True, False, False]
+    assert to_list("• Планка\n- Кошка\n\n", "exercises") == ["Планка", "Кошка"]
+    assert to_list(["Планка", None, " "], "exercises") == ["Планка"]
+
+
+# ─── Записи ────────────────────────────────────────────────────────
+def test_visit_record_fields_are_coerced():
+    record = VisitRecord.from_dict(FULL_VISIT)
+    assert (record.pain_level, record.angle, record.urgent) == (7, 12.5, True)
+    assert record.risk == "средний" and record.exercises == ["Планка", "Кошка"]
+
+
+def test_missing_fields_get_defaults_and_bad_fields_raise():
+    record = VisitRecord.from_dict({})
+    assert (record.date, record.pain_level, record.angle, record.urgent) == ("--", None, None,
+                                                                            False)
+    assert record.dynamics == "pervichnyy_osmotr" and record.exercises == []
+    with pytest.raises(RecordError) as info:
+        VisitRecord.from_dict({"date": "05.03.2026 09:30", "pain_level": "сильная"})
+    assert info.value.field == "pain_level"
+    with pytest.raises(RecordError):
+        VisitRecord.from_dict(["не", "объект"])
+
+
+def test_visit_record_round_trips():
+    record = VisitRecord.from_dict(FULL_VISIT)
+    assert VisitRecord.from_json(record.to_json()) == record
+    assert VisitRecord.from_dict(record.to_dict()) == record
+    assert VisitRecord.from_dict(record) is record
+    other = VisitRecord.from_dict({**FULL_VISIT, "comment": "Другое"})
+    assert other != record
+    with pytest.raises(TypeError):
+        hash(record)
+
+
+def test_analysis_result_from_fenced_response():
+    result = AnalysisResult.parse('Ответ:\n```json\n{"ugol_iskrivleniya": "12.5", '
+                                  '"stepen_riska": "Высокая", "srochno_k_vrachu": "нет"}\n```')
+    assert (result.angle, result.risk, result.urgent) == (12.5, "высокая", False)
+    for raw in ("", "без JSON", "{не json}", "[1, 2]"):
+        with pytest.raises(RecordError):
+            AnalysisResult.parse(raw)
+
+
+# ─── orjson и json ─────────────────────────────────────────────────
+def test_json_backends_give_the_same_records(monkeypatch):
+    record = VisitRecord.from_dict(FULL_VISIT)
+    text = record.to_json()
+    parsed = AnalysisResult.parse(json.dumps({"ugol_iskrivleniya": 7, "uprazhneniya": ["Кошка"]}))
+
+    # Тот же путь через стандартный json — как без установленного orjson
+    monkeypatch.setattr(records, "loads", json.loads)
+    monkeypatch.setattr(records, "dumps", lambda obj: json.dumps(obj, ensure_ascii=False))
+    assert json.loads(text) == json.loads(record.to_json())
+    assert VisitRecord.from_json(text) == record
+    again = AnalysisResult.parse(json.dumps({"ugol_iskrivleniya": 7, "uprazhneniya": ["Кошка"]}))
+    assert again.to_dict() == parsed.to_dict()
@@ -0,0 +1,113 @@
+import json
+
+import pytest
+
+from spine_core.history_store import HistoryStore
+from spine_core.records import VisitRecord
+from spine_core.repository import PatientRepository
+
+
+def visit(day, pain, **fields):
+    return VisitRecord.from_dict({"date": f"{day:02d}.01.2026 10:00", "symptoms": "Боль в шее",
+                                  "pain_level": pain, **fields})
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = PatientRepository(str(tmp_path / "patients.db"))
+    yield repo
+    repo.close()
+
+
+# ─── Миграция со старых JSON-файлов ────────────────────────────────
+def test_migrates_profile_and_legacy_history_json(repo, tmp_path):
+    profile = tmp_path / "profile.json"
+    profile.write_text(json.dumps({"name": "Иван", "age": "40"}), encoding="utf-8")
+    legacy = tmp_path / "history.json"
+    legacy.write_text(json.dumps([
+        {"date": "01.01.2026 10:00", "symptoms": "Боль в шее", "pain_level": "--",
+         "angle": "12°", "risk": "Средний"},
+        {"date": "02.01.2026 10:00", "symptoms": "Онемение", "pain_level": 6, "urgent": "да"},
+    ], ensure_ascii=False), encoding="utf-8")
+
+    store = HistoryStore(str(tmp_path / "history.jsonl"), legacy_path=str(legacy))
+    pid = repo.migrate_from_json(str(profile), store)
+
+    assert repo.list_patients() == [(pid, "Иван")]
+    assert repo.get_profile(pid) == {"name": "Иван", "age": "40"}
+    history = repo.history(pid)
+    records = history.records()
+    assert [(r.pain_level, r.angle, r.risk, r.urgent) for r in records] == [
+        (None, 12.0, "средний", False), (6, None, "", True)]
+    # Сводка пересчитывается по перенесенным визитам, поиск видит их сразу
+    assert history.trend().to_dict()["count"] == 2
+    assert [r.symptoms for r in history.search("шея")] == ["Боль в шее"]
+
+
+def test_migrates_history_store_without_profile(repo, tmp_path):
+    store = HistoryStore(str(tmp_path / "history.jsonl"))
+    store.append(visit(1, 3))
+    store.append(visit(2, 5))
+
+    pid = repo.migrate_from_json(str(tmp_path / "missing.json"), store)
+    assert repo.get_profile(pid) == {}
+    assert repo.history(pid).records() == store.records()
+
+
+def test_nothing_to_migrate(repo, tmp_path):
+    store = HistoryStore(str(tmp_path / "history.jsonl"))
+    assert repo.migrate_from_json(str(tmp_path / "profile.json"), store) is None
+    assert repo.is_empty()
+
+
+# ─── Добавление визита ─────────────────────────────────────────────
+def test_add_visit_stores_record_columns_index_and_trend(repo):
+    pid = repo.create_patient({})
+    record = visit(5, 7, angle="14,5", risk="Высокий", urgent=True, zone="C5-C6")
+    visit_id = repo.add_visit(pid, record)
+
+    row = repo._query("SELECT patient_id, ts, risk, urgent, angle, pain, data FROM visits "
+                      "WHERE id = ?", (visit_id,))[0]
+    assert row[:6] == (pid, "2026-01-05 10:00", "высокий", 1, 14.5, 7)
+    assert VisitRecord.from_json(row[6]) == record
+    assert repo.revision(pid) == 1
+    assert repo.search_visits(pid, "шее") == [record]
+    assert repo.trend(pid).to_dict() == repo._trend(pid).to_dict()
+    assert repo.trend(pid).to_dict()["count"] == 1
+
+
+def test_failed_add_visit_leaves_database_and_trend_untouched(repo, monkeypatch):
+    pid = repo.create_patient({})
+    repo.add_visit(pid, visit(1, 3))
+    before = repo.trend(pid).to_dict()
+
+    def broken_index(*args):
+        raise RuntimeError("индекс недоступен")
+
+    monkeypatch.setattr(repo, "_index_visit", broken_index)
+    with pytest.raises(RuntimeError):
+        repo.add_visit(pid, visit(2, 9))
+    assert not repo._conn.in_transaction
+    assert repo.count_visits(pid) == 1 and repo.revision(pid) == 1
+    assert repo.trend(pid).to_dict() == before
+
+
+def test_trend_in_memory_follows_only_committed_batches(repo):
+    pid = repo.create_patient({})
+    repo.add_visit(pid, visit(1, 3))
+    committed = repo._trends[pid]
+
+    with pytest.raises(ValueError):
+        with repo.batch():
+            repo.add_visit(pid, visit(2, 9))
+            # Внутри пачки видна новая сводка, в общей копии — еще прежняя
+            assert repo.trend(pid).to_dict()["count"] == 2
+            assert repo._trends[pid] is committed
+            raise ValueError("пачка не прошла")
+    assert repo.trend(pid).to_dict()["count"] == 1
+
+    with repo.batch():
+        repo.add_visit(pid, visit(3, 4))
+        repo.add_visit(pid, visit(4, 5))
+    assert repo._trends[pid].to_dict()["count"] == 3
+    assert repo.count_visits(pid) == 3
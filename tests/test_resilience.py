@@ -0,0 +1,216 @@
+import pytest
+
+from spine_core.analysis import AnalysisRequest, run_analysis
+from spine_core.backends import FAKE_RESPONSE, BackendError, FakeBackend
+from spine_core.repository import PatientRepository
+from spine_core.resilience import CircuitOpenError, ResilienceConfig, ResilientBackend
+from spine_core.response_cache import ResponseCache
+
+
+class FakeClock:
+    # Время для MinuteBudget и CircuitBreaker; sleep только сдвигает его
+    def __init__(self):
+        self.now    = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FlakyBackend(FakeBackend):
+    # Первые failures вызовов завершаются ошибкой error, дальше — обычный ответ
+    def __init__(self, failures, error=None, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = failures
+        self.error    = error or BackendError("503 Service Unavailable")
+
+    def generate_content(self, contents, stream=False):
+        if self.calls < self.failures:
+            self.calls += 1
+            raise self.error
+        return super().generate_content(contents, stream)
+
+
+class BrokenStream(FakeBackend):
+    # Поток обрывается после first_chunks кусков
+    def __init__(self, first_chunks, **kwargs):
+        super().__init__(**kwargs)
+        self.first_chunks = first_chunks
+
+    def generate_content(self, contents, stream=False):
+        response = super().generate_content(contents, stream)
+        if not stream:
+            return response
+
+        def chunks():
+            for i, chunk in enumerate(response):
+                if i == self.first_chunks:
+                    raise ConnectionError("обрыв соединения")
+                yield chunk
+        return chunks()
+
+
+def make_backend(backend, clock, **config):
+    options = dict(attempts=4, base_delay=1.0, max_delay=30.0, requests_per_minute=0,
+                   tokens_per_minute=0, breaker_threshold=0, breaker_cooldown=30.0)
+    options.update(config)
+    return ResilientBackend(backend, ResilienceConfig(**options), sleep=clock.sleep,
+                            clock=clock, seed=1)
+
+
+# ─── Повторы ───────────────────────────────────────────────────────
+def test_retries_transient_errors_then_succeeds():
+    clock = FakeClock()
+    inner = FlakyBackend(failures=2)
+    backend = make_backend(inner, clock)
+
+    assert backend.generate_content("prompt").text == FakeBackend().text
+    assert inner.calls == 3
+    m = backend.metrics()
+    assert (m["retries"], m["succeeded"], m["failed"]) == (2, 1, 0)
+    # Полный разброс: задержка попытки n — не больше base_delay * 2**n
+    assert len(clock.sleeps) == 2
+    assert 0 <= clock.sleeps[0] <= 1.0 and 0 <= clock.sleeps[1] <= 2.0
+
+
+def test_retry_after_hint_is_used_as_delay():
+    clock = FakeClock()
+    backend = make_backend(FlakyBackend(1, BackendError("429", retry_after=2.5)), clock)
+    backend.generate_content("prompt")
+    assert clock.sleeps == [2.5]
+
+
+def test_gives_up_after_configured_attempts():
+    clock = FakeClock()
+    inner = FlakyBackend(failures=10)
+    backend = make_backend(inner, clock, attempts=3)
+    with pytest.raises(BackendError):
+        backend.generate_content("prompt")
+    assert inner.calls == 3
+    assert backend.metrics()["failed"] == 1
+
+
+def test_non_retryable_error_is_raised_at_once():
+    clock = FakeClock()
+    inner = FlakyBackend(1, BackendError("400 Bad Request", retryable=False))
+    backend = make_backend(inner, clock)
+    with pytest.raises(BackendError, match="400"):
+        backend.generate_content("prompt")
+    assert inner.calls == 1 and clock.sleeps == []
+
+
+def test_non_retryable_errors_do_not_open_breaker():
+    clock = FakeClock()
+    inner = FlakyBackend(10, BackendError("400 Bad Request", retryable=False))
+    backend = make_backend(inner, clock, breaker_threshold=2)
+    for _ in range(5):
+        with pytest.raises(BackendError, match="400"):
+            backend.generate_content("prompt")
+    m = backend.metrics()
+    assert (m["breaker"], m["breaker_opens"], m["rejected"]) == ("closed", 0, 0)
+    assert inner.calls == 5
+
+
+def test_non_retryable_probe_closes_half_open_breaker():
+    clock = FakeClock()
+    inner = FlakyBackend(2)
+    backend = make_backend(inner, clock, attempts=1, breaker_threshold=2)
+    for _ in range(2):
+        with pytest.raises(BackendError):
+            backend.generate_content("prompt")
+    clock.now += 30.0
+    inner.failures, inner.error = 3, BackendError("400 Bad Request", retryable=False)
+    with pytest.raises(BackendError, match="400"):
+        backend.generate_content("prompt")
+    assert backend.metrics()["breaker"] == "closed"
+
+
+def test_stream_error_before_first_chunk_is_retried():
+    clock = FakeClock()
+    inner = BrokenStream(first_chunks=0)
+    backend = make_backend(inner, clock, attempts=2)
+    with pytest.raises(ConnectionError):
+        list(backend.generate_content("prompt", stream=True))
+    assert inner.calls == 2
+
+
+def test_stream_error_mid_response_is_not_retried():
+    clock = FakeClock()
+    inner = BrokenStream(first_chunks=2)
+    backend = make_backend(inner, clock)
+    chunks = iter(backend.generate_content("prompt", stream=True))
+    next(chunks), next(chunks)
+    with pytest.raises(ConnectionError):
+        next(chunks)
+    assert inner.calls == 1
+
+
+# ─── Квота ─────────────────────────────────────────────────────────
+def test_request_budget_waits_for_the_window():
+    clock = FakeClock()
+    backend = make_backend(FakeBackend(), clock, requests_per_minute=2)
+    for _ in range(3):
+        backend.generate_content("prompt")
+    assert clock.sleeps == [60.0]
+    assert backend.metrics()["throttled_sec"] == 60.0
+
+
+# ─── Предохранитель ────────────────────────────────────────────────
+def test_breaker_opens_rejects_and_recovers_after_cooldown():
+    clock = FakeClock()
+    inner = FlakyBackend(failures=2)
+    backend = make_backend(inner, clock, attempts=1, breaker_threshold=2)
+
+    for _ in range(2):
+        with pytest.raises(BackendError):
+            backend.generate_content("prompt")
+    assert backend.metrics()["breaker"] == "open"
+
+    # Пока разомкнут — запрос не доходит до бэкенда
+    with pytest.raises(CircuitOpenError):
+        backend.generate_content("prompt")
+    assert inner.calls == 2 and backend.metrics()["rejected"] == 1
+
+    # После cooldown проходит пробный запрос и замыкает цепь
+    clock.now += 30.0
+    backend.generate_content("prompt")
+    m = backend.metrics()
+    assert (m["breaker"], m["breaker_opens"], inner.calls) == ("closed", 1, 3)
+
+
+def test_failed_probe_opens_breaker_again():
+    clock = FakeClock()
+    inner = FlakyBackend(failures=3)
+    backend = make_backend(inner, clock, attempts=1, breaker_threshold=2)
+    for _ in range(2):
+        with pytest.raises(BackendError):
+            backend.generate_content("prompt")
+    clock.now += 30.0
+    with pytest.raises(BackendError):
+        backend.generate_content("prompt")
+    with pytest.raises(CircuitOpenError):
+        backend.generate_content("prompt")
+    assert backend.metrics()["breaker_opens"] == 2
+
+
+# ─── Ответ из кэша при недоступной модели ──────────────────────────
+def test_cached_response_is_replayed_without_backend(tmp_path):
+    repo  = PatientRepository(str(tmp_path / "patients.db"))
+    cache = ResponseCache(str(tmp_path / "cache.db"))
+    history = repo.history(repo.create_patient({}))
+    request = lambda: AnalysisRequest("Боль в пояснице", 5, {}, None, history)
+
+    first = run_analysis(request(), FakeBackend(), cache)
+
+    clock = FakeClock()
+    down = make_backend(FlakyBackend(failures=100), clock, attempts=1)
+    fields = {}
+    text = run_analysis(request(), down, cache, on_field=fields.__setitem__)
+    assert text == first
+    assert fields == FAKE_RESPONSE
+    assert down.metrics()["requests"] == 0
+    repo.close()
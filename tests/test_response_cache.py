@@ -0,0 +1,74 @@
+import pytest
+
+from spine_core.response_cache import ResponseCache, request_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return ResponseCache(str(tmp_path / "cache.db"), max_entries=3, ttl_seconds=60, clock=clock)
+
+
+def test_key_depends_on_prompt_and_image():
+    keys = {request_key("боль"), request_key("боль", b"png"), request_key("боль ", None),
+            request_key("боль", b"png2")}
+    assert len(keys) == 4 and request_key("боль", b"") == request_key("боль")
+
+
+def test_entry_expires_after_ttl(cache, clock):
+    cache.put("a", "ответ")
+    clock.now += 60
+    assert cache.get("a") == "ответ"
+    clock.now += 1
+    assert cache.get("a") is None
+    # Просроченная запись удалена, а не только пропущена
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 0}
+
+
+def test_reading_does_not_extend_ttl(cache, clock):
+    cache.put("a", "ответ")
+    clock.now += 50
+    assert cache.get("a") == "ответ"
+    clock.now += 20
+    assert cache.get("a") is None
+
+
+def test_size_limit_evicts_least_recently_used(cache, clock):
+    for key in "abc":
+        cache.put(key, key.upper())
+        clock.now += 1
+    cache.put("d", "D")
+    assert cache.get("a") is None
+    assert [cache.get(k) for k in "bcd"] == ["B", "C", "D"]
+    assert cache.stats()["entries"] == 3
+
+
+def test_get_refreshes_recency(cache, clock):
+    for key in "abc":
+        cache.put(key, key.upper())
+        clock.now += 1
+    assert cache.get("a") == "A"       # «a» теперь самая свежая, вытесняется «b»
+    clock.now += 1
+    cache.put("d", "D")
+    assert cache.get("b") is None
+    assert [cache.get(k) for k in "acd"] == ["A", "C", "D"]
+
+
+def test_put_replaces_and_clear_empties(cache):
+    cache.put("a", "старый")
+    cache.put("a", "новый")
+    assert cache.get("a") == "новый" and cache.stats()["entries"] == 1
+    cache.clear()
+    assert cache.get("a") is None and cache.stats()["entries"] == 0
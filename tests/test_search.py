@@ -0,0 +1,83 @@
+import pytest
+
+from spine_core.records import VisitRecord
+from spine_core.repository import PatientRepository
+from spine_core.search import bm25, query_slots, slot_matches, stem, tokenize
+
+
+# ─── Стеммер и разбор текста ───────────────────────────────────────
+@pytest.mark.parametrize("words, base", [
+    (("болит", "боли", "болью"), "бол"),
+    (("шея", "шее", "шеи"), "ше"),
+    (("поясница", "пояснице"), "поясниц"),
+    (("онемение", "онемением"), "онемен"),
+])
+def test_word_forms_share_a_stem(words, base):
+    assert {stem(w) for w in words} == {base}
+
+
+def test_tokenize_drops_stop_words_and_keeps_latin_and_numbers():
+    assert tokenize("Боль в шее и L4-L5, 5 раз") == ["бол", "ше", "l4", "l5", "5"]
+    assert stem("ёлка") == stem("елка")
+
+
+def test_unfinished_last_word_is_also_a_prefix():
+    slots = query_slots("боль в поясн")
+    assert slots == [("бол", None), ("поясн", "поясн")]
+    assert slot_matches(slots[1], "поясниц") and not slot_matches(slots[0], "болезн")
+    # После пробела слово считается дописанным
+    assert query_slots("боль ") == [("бол", None)]
+
+
+# ─── BM25 ──────────────────────────────────────────────────────────
+def test_bm25_ranks_by_frequency_rarity_and_length():
+    # Частое в документе слово весит больше
+    scores = bm25({"бол": {1: 1, 2: 3}}, {1: 10, 2: 10}, 3, 10)
+    assert scores[2] > scores[1]
+    # Редкое слово весит больше частого
+    scores = bm25({"бол": {1: 1, 2: 1}, "онемен": {3: 1}}, {1: 10, 2: 10, 3: 10}, 3, 10)
+    assert scores[3] > scores[1] == scores[2]
+    # При равной частоте короткий документ выше длинного
+    scores = bm25({"бол": {1: 1, 2: 1}}, {1: 5, 2: 50}, 2, 27.5)
+    assert scores[1] > scores[2]
+
+
+# ─── Поиск в репозитории ───────────────────────────────────────────
+@pytest.fixture
+def history(tmp_path):
+    repo = PatientRepository(str(tmp_path / "patients.db"))
+    history = repo.history(repo.create_patient({}))
+    yield history
+    repo.close()
+
+
+def add(history, day, symptoms, **fields):
+    history.append(VisitRecord.from_dict({"date": f"{day:02d}.01.2026 10:00",
+                                          "symptoms": symptoms, "pain_level": 5, **fields}))
+
+
+def test_search_ranks_matches_and_finds_other_word_forms(history):
+    add(history, 1, "Болит шея")
+    add(history, 2, "Шея, шея и снова шея")
+    add(history, 3, "Онемение пальцев")
+    assert [r.date[:2] for r in history.search("шеи")] == ["02", "01"]
+    assert [r.date[:2] for r in history.search("онемением")] == ["03"]
+    assert history.search("колено") == []
+    # Без текста — все визиты, новые сверху
+    assert [r.date[:2] for r in history.search()] == ["03", "02", "01"]
+
+
+def test_search_page_counts_all_matches_and_pages(history):
+    for day in range(1, 8):
+        add(history, day, f"Боль в пояснице, визит {day}", zone="Поясничный отдел")
+    add(history, 8, "Онемение пальцев", zone="Шейный отдел")
+
+    total, records = history.search_page("поясн", offset=2, limit=3)
+    assert total == 7 and len(records) == 3
+    total, records = history.search_page("поясница", offset=6, limit=3)
+    assert total == 7 and len(records) == 1
+    total, records = history.search_page(offset=0, limit=2)
+    assert total == 8 and [r.date[:2] for r in records] == ["08", "07"]
+    total, records = history.search_page(zone="шейн")
+    assert total == 1 and records[0].symptoms == "Онемение пальцев"
+    assert history.search_page("колено") == (0, [])
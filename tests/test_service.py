@@ -0,0 +1,217 @@
+import asyncio
+import base64
+import io
+import json
+from urllib.parse import quote
+
+import pytest
+
+from spine_core.backends import FakeBackend
+from spine_core.image_store import ImageStore
+from spine_core.repository import PatientRepository
+from spine_core.resilience import ResilienceConfig, ResilientBackend
+from spine_core.service import AnalysisService
+
+
+class Client:
+    # Минимальный HTTP/1.1-клиент поверх одного keep-alive соединения
+    def __init__(self, port):
+        self.port   = port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None, raw=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        data = raw if raw is not None else (json.dumps(body).encode() if body is not None else b"")
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: test\r\n"
+                          f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        payload = await self.reader.readexactly(int(headers["content-length"]))
+        if headers["content-type"].startswith("application/json"):
+            payload = json.loads(payload)
+        return status, headers, payload
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+@pytest.fixture
+def service(tmp_path):
+    repo = PatientRepository(str(tmp_path / "patients.db"))
+    backend = ResilientBackend(FakeBackend(), ResilienceConfig(requests_per_minute=0,
+                                                               tokens_per_minute=0))
+    images = ImageStore(str(tmp_path / "images"))
+    yield AnalysisService(repo, backend, images=images, workers=2)
+    images.shutdown()
+    repo.close()
+
+
+def run(service, scenario):
+    # Сервис на свободном порту, сценарий с клиентом, корректное закрытие
+    async def main():
+        await service.start("127.0.0.1", 0)
+        client = Client(service.port)
+        try:
+            return await scenario(client)
+        finally:
+            client.close()
+            await service.close()
+    return asyncio.run(main())
+
+
+async def new_patient(client, **profile):
+    status, _, data = await client.request("POST", "/patients", profile)
+    assert status == 201
+    return data["id"]
+
+
+async def analyze(client, pid, symptoms, pain_level=5, **extra):
+    return await client.request("POST", f"/patients/{pid}/analyze",
+                                {"symptoms": symptoms, "pain_level": pain_level, **extra})
+
+
+# ─── Анализ и история ──────────────────────────────────────────────
+def test_analyze_saves_visit_to_history(service):
+    async def scenario(client):
+        pid = await new_patient(client, name="Иван", age="40")
+        status, _, data = await analyze(client, pid, "Боль в пояснице", 6)
+        assert status == 201
+        assert data["record"]["pain_level"] == 6
+        assert data["result"]["zona_davleniya"] == "Поясничный отдел (L4-L5)"
+
+        status, _, history = await client.request("GET", f"/patients/{pid}/history")
+        assert status == 200 and history["total"] == 1
+        assert history["records"][0]["symptoms"] == "Боль в пояснице"
+    run(service, scenario)
+
+
+def test_history_pages_and_search_total(service):
+    async def scenario(client):
+        pid = await new_patient(client)
+        for i in range(5):
+            await analyze(client, pid, f"Боль в шее, визит {i}", i + 1)
+        await analyze(client, pid, "Онемение пальцев", 2)
+
+        _, _, page = await client.request("GET", f"/patients/{pid}/history?offset=1&limit=2")
+        assert page["total"] == 6 and len(page["records"]) == 2
+        assert page["records"][0]["symptoms"] == "Боль в шее, визит 4"
+
+        # total — все совпадения, а не только попавшие в страницу
+        _, _, found = await client.request(
+            "GET", f"/patients/{pid}/history?q={quote('шея')}&offset=0&limit=2")
+        assert found["total"] == 5 and len(found["records"]) == 2
+
+        status, _, _ = await client.request("DELETE", f"/patients/{pid}/history")
+        assert status == 200
+        _, _, empty = await client.request("GET", f"/patients/{pid}/history")
+        assert empty["total"] == 0
+    run(service, scenario)
+
+
+def test_dynamics(service):
+    async def scenario(client):
+        pid = await new_patient(client)
+        status, _, empty = await client.request("GET", f"/patients/{pid}/dynamics")
+        assert status == 200 and empty["points"] == []
+
+        await analyze(client, pid, "Боль", 7)
+        _, _, data = await client.request("GET", f"/patients/{pid}/dynamics")
+        assert len(data["points"]) == 1 and data["points"][0]["pain"] == 7
+        # Наклон по одной точке не определен — в JSON это null, а не NaN
+        assert data["pain"]["slope"] is None
+    run(service, scenario)
+
+
+def test_export_pdf_and_html(service):
+    async def scenario(client):
+        pid = await new_patient(client, name="Иван")
+        await analyze(client, pid, "Боль в пояснице")
+        status, headers, pdf = await client.request("GET", f"/patients/{pid}/export?format=pdf")
+        assert status == 200 and headers["content-type"] == "application/pdf"
+        assert pdf.startswith(b"%PDF")
+        assert f"spine_report_{pid}_history.pdf" in headers["content-disposition"]
+
+        status, headers, html = await client.request(
+            "GET", f"/patients/{pid}/export?format=html&scope=last")
+        assert status == 200 and headers["content-type"].startswith("text/html")
+        assert "Тестовый ответ локального бэкенда." in html.decode("utf-8")
+    run(service, scenario)
+
+
+def test_analyze_with_uploaded_and_stored_image(service):
+    Image = pytest.importorskip("PIL.Image")
+
+    async def scenario(client):
+        pid = await new_patient(client)
+        buf = io.BytesIO()
+        Image.new("L", (64, 64), 128).save(buf, "PNG")
+        image = base64.b64encode(buf.getvalue()).decode()
+        status, _, first = await analyze(client, pid, "Снимок", image=image, image_name="x.png")
+        assert status == 201
+        digest = first["record"]["image"]
+        assert len(digest) == 64
+
+        status, _, second = await analyze(client, pid, "Повтор", image_id=digest)
+        assert status == 201 and second["record"]["image"] == digest
+
+        # Только полный хэш: префикс не должен находить чужой снимок
+        for image_id in (digest[:8], digest[:2], digest.upper(), digest + ".png"):
+            status, _, _ = await analyze(client, pid, "Префикс", image_id=image_id)
+            assert status == 404
+    run(service, scenario)
+
+
+# ─── Ошибки запроса ────────────────────────────────────────────────
+@pytest.mark.parametrize("method, path, body, status", [
+    ("GET",    "/patients/999/history",          None,                         404),
+    ("GET",    "/patients/999/dynamics",         None,                         404),
+    ("POST",   "/patients/999/analyze",          {"symptoms": "Боль"},         404),
+    ("GET",    "/nowhere",                       None,                         404),
+    ("PATCH",  "/patients/{pid}",                None,                         405),
+    ("POST",   "/patients/{pid}/analyze",        {},                           422),
+    ("POST",   "/patients/{pid}/analyze",        {"symptoms": "x", "pain_level": "abc"}, 422),
+    ("POST",   "/patients/{pid}/analyze",        {"symptoms": "x", "pain_level": 11},    422),
+    ("POST",   "/patients/{pid}/analyze",        {"symptoms": "x", "image": "%%%"},      400),
+    ("POST",   "/patients/{pid}/analyze",        {"symptoms": "x", "image_id": "ab"},    404),
+    ("POST",   "/patients/{pid}/analyze",        {"symptoms": "x", "image_id": "0" * 64}, 404),
+    ("GET",    "/patients/{pid}/history?limit=x", None,                        400),
+    ("GET",    "/patients/{pid}/export?format=doc", None,                      400),
+    ("GET",    "/patients/{pid}/export?scope=all",  None,                      400),
+    ("GET",    "/patients/{pid}/export",         None,                         404),
+])
+def test_request_errors(service, method, path, body, status):
+    async def scenario(client):
+        pid = await new_patient(client)
+        got, _, data = await client.request(method, path.format(pid=pid), body)
+        assert got == status, data
+        assert data["error"]
+    run(service, scenario)
+
+
+def test_body_that_is_not_json_object(service):
+    async def scenario(client):
+        pid = await new_patient(client)
+        for raw in (b"{not json", b"[1, 2]"):
+            status, _, data = await client.request("PUT", f"/patients/{pid}", raw=raw)
+            assert status == 400, data
+    run(service, scenario)
+
+
+def test_malformed_request_line_closes_connection(service):
+    async def scenario(client):
+        reader, writer = await asyncio.open_connection("127.0.0.1", service.port)
+        writer.write(b"garbage\r\n\r\n")
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        assert response.startswith(b"HTTP/1.1 400")
+    run(service, scenario)
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from spine_core.analysis import call_model
+from spine_core.backends import FAKE_RESPONSE, FakeBackend
+from spine_core.streaming import IncrementalJSONParser, MockStreamingModel
+
+FENCED = "```json\n" + json.dumps(FAKE_RESPONSE, ensure_ascii=False, indent=2) + "\n```"
+
+
+def feed_all(text, size):
+    parser, fields = IncrementalJSONParser(), []
+    for i in range(0, len(text), size):
+        fields += parser.feed(text[i:i + size])
+    return parser, fields
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 64, len(FENCED)])
+def test_fields_arrive_in_order_for_any_chunking(size):
+    parser, fields = feed_all(FENCED, size)
+    assert fields == list(FAKE_RESPONSE.items())
+    assert parser.fields == FAKE_RESPONSE
+    assert parser.done
+
+
+def test_field_is_reported_as_soon_as_it_is_complete():
+    parser = IncrementalJSONParser()
+    assert parser.feed('```json\n{"stepen_riska": "Выс') == []
+    assert parser.feed('окая", "uprazhneniya": ["a", ') == [("stepen_riska", "Высокая")]
+    assert parser.feed('"b"]}') == [("uprazhneniya", ["a", "b"])]
+    assert parser.done
+
+
+def test_delimiters_inside_strings_and_nested_values():
+    text = '{"a": "x, } ] \\" y", "b": {"c": [1, {"d": "}"}]}, "e": null}'
+    _, fields = feed_all(text, 3)
+    assert fields == list(json.loads(text).items())
+
+
+def test_text_after_the_object_is_ignored():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"a": 1}\n```\n{"b": 2}') == [("a", 1)]
+    assert parser.feed('{"c": 3}') == []
+
+
+def test_malformed_value_is_skipped():
+    _, fields = feed_all('{"a": tru, "b": 2}', 4)
+    assert fields == [("b", 2)]
+
+
+def test_call_model_streams_fields_and_returns_full_text():
+    model = MockStreamingModel(FENCED, chunk_size=5)
+    fields = []
+    text = call_model(model, "prompt", on_field=lambda k, v: fields.append((k, v)))
+    assert text == FENCED
+    assert fields == list(FAKE_RESPONSE.items())
+
+
+def test_call_model_without_callback_reads_whole_response():
+    assert call_model(FakeBackend(chunk_size=3), "prompt") == FENCED
@@ -0,0 +1,77 @@
+import random
+from datetime import datetime
+
+import pytest
+
+from spine_core.records import VisitRecord
+from spine_core.repository import PatientRepository
+from spine_core.trend import TrendSummary
+
+
+def points(n, seed=1):
+    rnd = random.Random(seed)
+    return [(f"2026-{1 + i // 28:02d}-{1 + i % 28:02d} 10:00",
+             rnd.choice([None, round(rnd.uniform(5, 30), 1)]),
+             rnd.choice([None, rnd.randint(1, 10)])) for i in range(n)]
+
+
+def full_slope(series):
+    # МНК по всем точкам заново — наклон в единицах за неделю
+    days = [datetime.strptime(ts, "%Y-%m-%d %H:%M").timestamp() / 86400 for ts, _ in series]
+    values = [v for _, v in series]
+    n = len(series)
+    mt, mv = sum(days) / n, sum(values) / n
+    d = sum((t - mt) ** 2 for t in days)
+    return sum((t - mt) * (v - mv) for t, v in zip(days, values)) / d * 7
+
+
+def test_incremental_summary_matches_full_recompute():
+    data = points(60)
+    summary = TrendSummary()
+    for i, point in enumerate(data):
+        summary.add(point, risk=f"риск {i}", urgent=i % 7 == 0)
+        # Сериализация в базу и обратно не меняет накопленные суммы
+        summary = TrendSummary.from_dict(summary.to_dict())
+
+    for name, index in (("angle", 1), ("pain", 2)):
+        series = [(p[0], p[index]) for p in data if p[index] is not None]
+        values = [v for _, v in series]
+        metric = getattr(summary, name)
+        assert metric.n == len(series)
+        assert (metric.first, metric.last) == (values[0], values[-1])
+        assert (metric.best, metric.worst) == (min(values), max(values))
+        assert metric.slope() == pytest.approx(full_slope(series))
+
+    assert summary.count == 60 and summary.urgent == len(range(0, 60, 7))
+    assert (summary.first_ts, summary.last_ts) == (data[0][0], data[-1][0])
+    assert list(summary.risks) == [f"риск {i}" for i in range(55, 60)]
+
+
+def test_slope_needs_two_days():
+    summary = TrendSummary()
+    summary.add(("2026-01-01 10:00", 10.0, 5))
+    summary.add(("2026-01-01 18:00", 12.0, None))
+    assert summary.pain.slope() is None and summary.angle.slope() is not None
+    assert TrendSummary().prompt_block() == ""
+
+
+def test_stored_summary_matches_recompute_from_visits(tmp_path):
+    repo = PatientRepository(str(tmp_path / "patients.db"))
+    pid = repo.create_patient({})
+    for ts, angle, pain in points(30, seed=2):
+        date = f"{ts[8:10]}.{ts[5:7]}.{ts[0:4]} {ts[11:]}"
+        repo.add_visit(pid, VisitRecord.from_dict({"date": date, "angle": angle,
+                                                   "pain_level": pain, "risk": "Низкий"}))
+    incremental = repo.trend(pid).to_dict()
+
+    # Без сохраненной сводки репозиторий пересчитывает ее по визитам
+    repo._execute("DELETE FROM trends")
+    repo._trends.clear()
+    recomputed = repo.trend(pid).to_dict()
+    for name in ("angle", "pain"):
+        a, b = incremental.pop(name), recomputed.pop(name)
+        assert a.keys() == b.keys()
+        for key in a:
+            assert a[key] == pytest.approx(b[key]), (name, key)
+    assert incremental == recomputed
+    repo.close()
@@ -0,0 +1,151 @@
+import customtkinter as ctk
+
+# ─── ВИРТУАЛИЗИРОВАННЫЙ СПИСОК ─────────────────────────────────────
+# Виджеты создаются только под видимые строки (плюс небольшой запас) и
+# переиспользуются при прокрутке: строке просто назначается другая запись.
+# Данные берутся из источника с методами count() и get(index).
+
+
+class PagedSource:
+    # Ленивая постраничная подгрузка записей (новые сверху)
+    def __init__(self, fetch_page, total, page_size=50):
+        self.fetch_page = fetch_page
+        self.total      = total
+        self.page_size  = page_size
+        self._rows      = []
+
+    def count(self):
+        return self.total
+
+    def get(self, index):
+        while index >= len(self._rows) and len(self._rows) < self.total:
+            page = self.fetch_page(len(self._rows), self.page_size)
+            if not page:
+                self.total = len(self._rows)
+                break
+            self._rows.extend(page)
+        return self._rows[index] if index < len(self._rows) else None
+
+    def prepend(self, item):
+        # Запись уже в источнике и стоит первой. Подгруженные страницы могли быть
+        # прочитаны до или после ее появления — сбрасываем их, дальше читаем заново
+        self._rows  = [item]
+        self.total += 1
+
+
+class VirtualList(ctk.CTkFrame):
+    def __init__(self, master, row_height, make_row, bind_row, empty_text="", **kwargs):
+        super().__init__(master, **kwargs)
+        self.row_height = row_height
+        self.make_row   = make_row
+        self.bind_row   = bind_row
+        self.source     = None
+        self.offset     = 0          # прокрутка в пикселях
+        self.pool       = []
+        self.bound      = {}         # строка пула -> индекс записи
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+
+        self.viewport = ctk.CTkFrame(self, fg_color="transparent")
+        self.viewport.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.on_scrollbar)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+
+        self.empty_label = ctk.CTkLabel(self.viewport, text=empty_text,
+            text_color="gray", font=("Roboto", 14))
+
+        self.viewport.bind("<Configure>", lambda e: self.render())
+        self.bind_wheel(self.viewport)
+
+    def bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self.on_wheel, add="+")
+        widget.bind("<Button-4>",   lambda e: self.scroll_by(-self.row_height), add="+")
+        widget.bind("<Button-5>",   lambda e: self.scroll_by(self.row_height), add="+")
+        for child in widget.winfo_children():
+            self.bind_wheel(child)
+
+    # ─── Данные ────────────────────────────────────────────────────
+    def set_source(self, source):
+        self.source = source
+        self.offset = 0
+        self.bound.clear()
+        self.render()
+
+    def insert_front(self, item):
+        # Новая запись сверху: сдвигаем прокрутку, чтобы видимые строки не прыгали
+        if self.source is None:
+            return
+        self.source.prepend(item)
+        if self.offset > 0:
+            self.offset += self.row_height
+        self.bound.clear()
+        self.render()
+
+    # ─── Прокрутка ─────────────────────────────────────────────────
+    def content_height(self):
+        return (self.source.count() if self.source else 0) * self.row_height
+
+    def max_offset(self):
+        return max(0, self.content_height() - self.viewport.winfo_height())
+
+    def scroll_by(self, pixels):
+        self.offset = min(max(0, self.offset + pixels), self.max_offset())
+        self.render()
+
+    def on_wheel(self, event):
+        self.scroll_by(-int(event.delta / 120 * self.row_height) if abs(event.delta) >= 120
+                       else -event.delta * 10)
+
+    def on_scrollbar(self, action, value, unit=None):
+        height = self.viewport.winfo_height()
+        if action == "moveto":
+            self.offset = min(max(0, int(float(value) * self.content_height())), self.max_offset())
+            self.render()
+        elif action == "scroll":
+            step = height if unit == "pages" else self.row_height
+            self.scroll_by(int(value) * step)
+
+    # ─── Отрисовка ─────────────────────────────────────────────────
+    def render(self):
+        height = max(self.viewport.winfo_height(), 1)
+        total  = self.source.count() if self.source else 0
+
+        if not total:
+            for row in self.pool:
+                row.place_forget()
+            self.bound.clear()
+            self.empty_label.place(relx=0.5, y=60, anchor="center")
+            self.scrollbar.set(0, 1)
+            return
+        self.empty_label.place_forget()
+
+        self.offset = min(self.offset, self.max_offset())
+        first   = self.offset // self.row_height
+        visible = height // self.row_height + 2
+        last    = min(total, first + visible)
+
+        # Пул растет только до числа видимых строк
+        while len(self.pool) < last - first:
+            row = self.make_row(self.viewport)
+            self.bind_wheel(row)
+            self.pool.append(row)
+
+        # Строка закреплена за слотом index % размер_пула: при прокрутке на одну
+        # позицию перепривязывается только одна строка, остальные лишь сдвигаются
+        used = set()
+        for index in range(first, last):
+            row = self.pool[index % len(self.pool)]
+            used.add(row)
+            if self.bound.get(row) != index:
+                self.bind_row(row, self.source.get(index))
+                self.bound[row] = index
+            row.place(x=0, y=index * self.row_height - self.offset,
+                      relwidth=1.0, height=self.row_height)
+        for row in self.pool:
+            if row not in used:
+                row.place_forget()
+                self.bound.pop(row, None)
+
+        content = self.content_height()
+        self.scrollbar.set(self.offset / content, min(1.0, (self.offset + height) / content))